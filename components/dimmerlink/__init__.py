@@ -1,7 +1,7 @@
 import esphome.codegen as cg
 import esphome.config_validation as cv
 from esphome.components import i2c
-from esphome.const import CONF_ID
+from esphome.const import CONF_ID, CONF_UPDATE_INTERVAL
 
 CODEOWNERS = ["@dev-rbdimmer"]
 DEPENDENCIES = ["i2c"]
@@ -9,18 +9,41 @@ MULTI_CONF = True
 AUTO_LOAD = ["sensor", "binary_sensor", "select", "button"]
 
 CONF_DIMMERLINK_ID = "dimmerlink_id"
+CONF_FAST_UPDATE_INTERVAL = "fast_update_interval"
+CONF_MAX_UPDATE_INTERVAL = "max_update_interval"
 
 dimmerlink_ns = cg.esphome_ns.namespace("dimmerlink")
 DimmerLinkHub = dimmerlink_ns.class_("DimmerLinkHub", cg.Component, i2c.I2CDevice)
 
-CONFIG_SCHEMA = (
+
+def validate_intervals(config):
+    fast = config[CONF_FAST_UPDATE_INTERVAL]
+    normal = config[CONF_UPDATE_INTERVAL]
+    slow = config[CONF_MAX_UPDATE_INTERVAL]
+    if not fast <= normal <= slow:
+        raise cv.Invalid(
+            f"{CONF_FAST_UPDATE_INTERVAL} <= {CONF_UPDATE_INTERVAL} <= "
+            f"{CONF_MAX_UPDATE_INTERVAL} is required"
+        )
+    return config
+
+
+CONFIG_SCHEMA = cv.All(
     cv.Schema(
         {
             cv.GenerateID(): cv.declare_id(DimmerLinkHub),
+            cv.Optional(
+                CONF_FAST_UPDATE_INTERVAL, default="100ms"
+            ): cv.positive_not_null_time_period,
+            cv.Optional(CONF_UPDATE_INTERVAL, default="1s"): cv.positive_not_null_time_period,
+            cv.Optional(
+                CONF_MAX_UPDATE_INTERVAL, default="30s"
+            ): cv.positive_not_null_time_period,
         }
     )
     .extend(cv.COMPONENT_SCHEMA)
-    .extend(i2c.i2c_device_schema(0x50))
+    .extend(i2c.i2c_device_schema(0x50)),
+    validate_intervals,
 )
 
 
@@ -28,3 +51,6 @@ async def to_code(config):
     var = cg.new_Pvariable(config[CONF_ID])
     await cg.register_component(var, config)
     await i2c.register_i2c_device(var, config)
+    cg.add(var.set_fast_update_interval(config[CONF_FAST_UPDATE_INTERVAL].total_milliseconds))
+    cg.add(var.set_update_interval(config[CONF_UPDATE_INTERVAL].total_milliseconds))
+    cg.add(var.set_max_update_interval(config[CONF_MAX_UPDATE_INTERVAL].total_milliseconds))
@@ -16,18 +16,20 @@ class DimmerLinkBinarySensor : public PollingComponent {
   void set_error_sensor(binary_sensor::BinarySensor *sens) { this->error_sensor_ = sens; }
   void set_calibration_done_sensor(binary_sensor::BinarySensor *sens) { this->calibration_done_sensor_ = sens; }
 
-  void update() override {
-    if (this->ready_sensor_ != nullptr) {
-      this->ready_sensor_->publish_state(this->parent_->is_ready());
-    }
+  // Publish whenever the hub refreshes its cache, so faults show up as
+  // fast as the hub's adaptive schedule sees them
+  void setup() override {
+    this->parent_->add_on_state_callback([this]() { this->update(); });
+  }
 
-    if (this->error_sensor_ != nullptr) {
-      this->error_sensor_->publish_state(this->parent_->has_error());
-    }
+  // Publishes from the hub's register cache; never touches the bus
+  void update() override {
+    if (!this->parent_->has_data())
+      return;
 
-    if (this->calibration_done_sensor_ != nullptr) {
-      this->calibration_done_sensor_->publish_state(this->parent_->is_calibration_done());
-    }
+    publish_if_changed_(this->ready_sensor_, this->parent_->is_ready());
+    publish_if_changed_(this->error_sensor_, this->parent_->has_error());
+    publish_if_changed_(this->calibration_done_sensor_, this->parent_->is_calibration_done());
   }
 
   void dump_config() override {
@@ -41,6 +43,12 @@ class DimmerLinkBinarySensor : public PollingComponent {
   }
 
  protected:
+  // Status bits rarely change: only state changes are published
+  static void publish_if_changed_(binary_sensor::BinarySensor *sens, bool state) {
+    if (sens != nullptr && (!sens->has_state() || sens->state != state))
+      sens->publish_state(state);
+  }
+
   DimmerLinkHub *parent_{nullptr};
   binary_sensor::BinarySensor *ready_sensor_{nullptr};
   binary_sensor::BinarySensor *error_sensor_{nullptr};
@@ -2,59 +2,125 @@
 #include "esphome/core/log.h"
 #include "esphome/core/hal.h"
 
+#include <algorithm>
+#include <cinttypes>
+#include <cstring>
+
 namespace esphome {
 namespace dimmerlink {
 
 static const char *const TAG = "dimmerlink";
-static const uint32_t STARTUP_DELAY_MS = 2000;
-static const uint32_t STATUS_UPDATE_INTERVAL_MS = 1000;
+// Startup: poll status/calibration with a doubling backoff until the
+// device is ready
+static const uint32_t STARTUP_PROBE_MIN_MS = 50;
+static const uint32_t STARTUP_PROBE_MAX_MS = 2000;
+static const uint32_t STARTUP_WARN_MS = 5000;
+// Failed refreshes in a row before a live device counts as lost
+static const uint8_t OFFLINE_AFTER_FAILURES = 3;
 
 void DimmerLinkHub::setup() {
   ESP_LOGCONFIG(TAG, "Setting up DimmerLink Hub...");
   this->startup_time_ = millis();
+  this->probe_interval_ = STARTUP_PROBE_MIN_MS;
+  // First probe right away: a dimmer that is already up goes live at once
+  this->last_status_update_ = this->startup_time_ - this->probe_interval_;
 }
 
 void DimmerLinkHub::loop() {
-  // Wait for startup delay (device calibration)
   if (!this->initialized_) {
-    if (millis() - this->startup_time_ < STARTUP_DELAY_MS) {
+    if (millis() - this->last_status_update_ < this->probe_interval_)
+      return;
+    bool responding = this->refresh();
+    uint32_t waited = millis() - this->startup_time_;
+    // No mains, no calibration: go live on READY alone after a while
+    if (responding && this->is_ready() && (this->cached_calibration_ || waited >= STARTUP_WARN_MS)) {
+      if (!this->cached_calibration_)
+        ESP_LOGW(TAG, "AC calibration not done, check the mains connection");
+      this->go_live_();
       return;
     }
+    this->probe_interval_ = std::min(this->probe_interval_ * 2, STARTUP_PROBE_MAX_MS);
+    if (waited >= STARTUP_WARN_MS && !this->status_has_warning()) {
+      // Keep trying: the dimmer may be powered later than the ESP
+      ESP_LOGW(TAG, "DimmerLink %s after %" PRIu32 " ms, still waiting",
+               responding ? "not ready" : "not responding", waited);
+      this->status_set_warning();
+    }
+    return;
+  }
 
-    // Try to read firmware version to verify communication
-    uint8_t version;
-    if (!this->read_register(REG_VERSION, &version, 1)) {
-      ESP_LOGE(TAG, "Failed to communicate with DimmerLink device");
-      this->mark_failed();
-      return;
+  // Refresh the register cache on the adaptive schedule
+  if (millis() - this->last_status_update_ >= this->interval_) {
+    if (!this->refresh()) {
+      // A single NACK is not a lost device
+      if (++this->refresh_failures_ >= OFFLINE_AFTER_FAILURES)
+        this->go_offline_();
+    } else if (!this->is_ready()) {
+      // Rebooting (reset, power cycle)
+      this->go_offline_();
+    } else {
+      this->refresh_failures_ = 0;
     }
+  }
+}
 
-    this->cached_version_ = version;
-    this->initialized_ = true;
-    ESP_LOGI(TAG, "DimmerLink initialized, firmware version: %d", version);
+void DimmerLinkHub::go_live_() {
+  this->initialized_ = true;
+  this->status_clear_warning();
+  ESP_LOGI(TAG, "DimmerLink ready after %" PRIu32 " ms, firmware version: %d", millis() - this->startup_time_,
+           this->cached_version_);
 
-    // Read initial state
-    this->get_level();
-    this->get_curve();
-    this->get_ac_frequency();
+  // Apply what was set while waiting (e.g. the light's restored state)
+  if (this->pending_fade_time_.has_value()) {
+    this->set_fade_time(*this->pending_fade_time_);
+    this->pending_fade_time_.reset();
+  }
+  if (this->pending_level_.has_value()) {
+    this->set_level(*this->pending_level_);
+    this->pending_level_.reset();
   }
+  this->live_callback_.call();
+}
 
-  // Periodically update status cache
-  if (millis() - this->last_status_update_ >= STATUS_UPDATE_INTERVAL_MS) {
-    this->update_status_cache_();
-    this->last_status_update_ = millis();
+void DimmerLinkHub::go_offline_() {
+  // Back to startup polling until the device answers and is ready
+  ESP_LOGW(TAG, "DimmerLink %s, waiting for it", this->cache_valid_ && !this->is_ready() ? "not ready" : "lost");
+  this->initialized_ = false;
+  this->refresh_failures_ = 0;
+  this->startup_time_ = millis();
+  this->probe_interval_ = STARTUP_PROBE_MIN_MS;
+}
+
+void DimmerLinkHub::poll_fast_for(uint32_t ms) {
+  uint32_t until = millis() + ms;
+  if (static_cast<int32_t>(until - this->fast_until_) > 0)
+    this->fast_until_ = until;
+  this->interval_ = this->fast_interval_;
+}
+
+uint32_t DimmerLinkHub::next_interval_(bool changed) {
+  // Calibrating, faulty or in a transition: watch closely
+  if (!this->is_ready() || this->has_error() || !this->cached_calibration_ ||
+      static_cast<int32_t>(this->fast_until_ - millis()) > 0) {
+    return this->fast_interval_;
   }
+  if (changed || this->interval_ < this->update_interval_)
+    return this->update_interval_;
+  // Stable: back off
+  return std::min(this->interval_ * 2, this->max_interval_);
 }
 
 void DimmerLinkHub::dump_config() {
   ESP_LOGCONFIG(TAG, "DimmerLink Hub:");
   LOG_I2C_DEVICE(this);
-  if (this->is_failed()) {
-    ESP_LOGE(TAG, "  Communication failed!");
+  if (!this->initialized_) {
+    ESP_LOGCONFIG(TAG, "  Waiting for the device to become ready");
   } else {
     ESP_LOGCONFIG(TAG, "  Firmware Version: %d", this->cached_version_);
     ESP_LOGCONFIG(TAG, "  AC Frequency: %d Hz", this->cached_ac_freq_);
   }
+  ESP_LOGCONFIG(TAG, "  Update Interval: %" PRIu32 " ms (fast %" PRIu32 " ms, max %" PRIu32 " ms)",
+                this->update_interval_, this->fast_interval_, this->max_interval_);
 }
 
 bool DimmerLinkHub::read_register(uint8_t reg, uint8_t *data, size_t len) {
@@ -68,8 +134,16 @@ bool DimmerLinkHub::write_register(uint8_t reg, uint8_t value) {
 bool DimmerLinkHub::set_level(uint8_t level) {
   if (level > 100)
     level = 100;
+  if (!this->initialized_) {
+    // Not ready yet: written by go_live_()
+    this->pending_level_ = level;
+    ESP_LOGD(TAG, "Device not ready, level %d%% queued", level);
+    return true;
+  }
   if (this->write_register(REG_DIM0_LEVEL, level)) {
     this->cached_level_ = level;
+    // Follow the (hardware) transition closely
+    this->poll_fast_for(this->cached_fade_time_ * 100 + this->fast_interval_);
     ESP_LOGD(TAG, "Set level to %d%%", level);
     return true;
   }
@@ -78,10 +152,8 @@ bool DimmerLinkHub::set_level(uint8_t level) {
 }
 
 uint8_t DimmerLinkHub::get_level() {
-  uint8_t level;
-  if (this->read_register(REG_DIM0_LEVEL, &level, 1)) {
-    this->cached_level_ = level;
-  }
+  if (this->pending_level_.has_value())
+    return *this->pending_level_;
   return this->cached_level_;
 }
 
@@ -97,18 +169,24 @@ bool DimmerLinkHub::set_curve(DimmingCurve curve) {
 }
 
 DimmingCurve DimmerLinkHub::get_curve() {
-  uint8_t curve;
-  if (this->read_register(REG_DIM0_CURVE, &curve, 1)) {
-    this->cached_curve_ = curve;
-  }
   return static_cast<DimmingCurve>(this->cached_curve_);
 }
 
 bool DimmerLinkHub::set_fade_time(uint8_t time_100ms) {
-  return this->write_register(REG_DIM0_FADE_TIME, time_100ms);
+  if (!this->initialized_) {
+    this->pending_fade_time_ = time_100ms;
+    this->cached_fade_time_ = time_100ms;
+    return true;
+  }
+  if (!this->write_register(REG_DIM0_FADE_TIME, time_100ms))
+    return false;
+  this->cached_fade_time_ = time_100ms;
+  return true;
 }
 
 uint8_t DimmerLinkHub::get_fade_time() {
+  if (this->pending_fade_time_.has_value())
+    return *this->pending_fade_time_;
   uint8_t time;
   if (this->read_register(REG_DIM0_FADE_TIME, &time, 1)) {
     return time;
@@ -130,10 +208,6 @@ bool DimmerLinkHub::has_error() {
 }
 
 uint8_t DimmerLinkHub::get_error_code() {
-  uint8_t error;
-  if (this->read_register(REG_ERROR, &error, 1)) {
-    this->cached_error_ = error;
-  }
   return this->cached_error_;
 }
 
@@ -142,34 +216,76 @@ uint8_t DimmerLinkHub::get_firmware_version() {
 }
 
 uint8_t DimmerLinkHub::get_ac_frequency() {
-  uint8_t freq;
-  if (this->read_register(REG_AC_FREQ, &freq, 1)) {
-    this->cached_ac_freq_ = freq;
-  }
   return this->cached_ac_freq_;
 }
 
 uint16_t DimmerLinkHub::get_ac_period() {
-  uint8_t data[2];
-  if (this->read_register(REG_AC_PERIOD_L, data, 2)) {
-    this->cached_ac_period_ = data[0] | (data[1] << 8);  // Little-endian
-  }
   return this->cached_ac_period_;
 }
 
 bool DimmerLinkHub::is_calibration_done() {
-  uint8_t cal;
-  if (this->read_register(REG_CALIBRATION, &cal, 1)) {
-    this->cached_calibration_ = (cal == 1);
-  }
   return this->cached_calibration_;
 }
 
-void DimmerLinkHub::update_status_cache_() {
-  uint8_t status;
-  if (this->read_register(REG_STATUS, &status, 1)) {
-    this->cached_status_ = status;
+bool DimmerLinkHub::refresh() {
+  this->last_status_update_ = millis();
+
+  // Three block reads instead of one transaction per register
+  uint8_t info[BLOCK_INFO_LEN];
+  uint8_t dim[BLOCK_DIM0_LEN];
+  uint8_t ac[BLOCK_AC_LEN];
+  bool ok = true;
+
+  // The AC period jitters by a few µs and is left out
+  const uint8_t before[] = {this->cached_status_, this->cached_error_, this->cached_level_, this->cached_curve_,
+                            this->cached_ac_freq_, this->cached_calibration_};
+
+  if (this->read_register(REG_STATUS, info, sizeof(info))) {
+    this->cached_status_ = info[0];
+    this->cached_error_ = info[REG_ERROR - REG_STATUS];
+    this->cached_version_ = info[REG_VERSION - REG_STATUS];
+  } else {
+    ok = false;
   }
+
+  if (this->read_register(REG_DIM0_LEVEL, dim, sizeof(dim))) {
+    this->cached_level_ = dim[0];
+    this->cached_curve_ = dim[REG_DIM0_CURVE - REG_DIM0_LEVEL];
+  } else {
+    ok = false;
+  }
+
+  if (this->read_register(REG_AC_FREQ, ac, sizeof(ac))) {
+    this->cached_ac_freq_ = ac[0];
+    this->cached_ac_period_ = ac[REG_AC_PERIOD_L - REG_AC_FREQ] | (ac[REG_AC_PERIOD_H - REG_AC_FREQ] << 8);  // Little-endian
+    this->cached_calibration_ = (ac[REG_CALIBRATION - REG_AC_FREQ] == 1);
+  } else {
+    ok = false;
+  }
+
+  if (!ok) {
+    // While starting up loop() reports instead
+    if (!this->initialized_)
+      return false;
+    if (!this->status_has_warning())
+      ESP_LOGW(TAG, "Failed to refresh registers");
+    this->status_set_warning();
+    this->interval_ = this->update_interval_;
+    return false;
+  }
+
+  const uint8_t after[] = {this->cached_status_, this->cached_error_, this->cached_level_, this->cached_curve_,
+                           this->cached_ac_freq_, this->cached_calibration_};
+  uint32_t interval = this->next_interval_(memcmp(before, after, sizeof(before)) != 0);
+  if (interval != this->interval_)
+    ESP_LOGV(TAG, "Refresh interval %" PRIu32 " ms", interval);
+  this->interval_ = interval;
+
+  if (this->initialized_)
+    this->status_clear_warning();
+  this->cache_valid_ = true;
+  this->state_callback_.call();
+  return true;
 }
 
 }  // namespace dimmerlink
@@ -1,6 +1,8 @@
 #pragma once
 
 #include "esphome/core/component.h"
+#include "esphome/core/helpers.h"
+#include "esphome/core/optional.h"
 #include "esphome/components/i2c/i2c.h"
 
 namespace esphome {
@@ -26,6 +28,11 @@ static const uint8_t CMD_RESET = 0x01;
 static const uint8_t CMD_RECALIBRATE = 0x02;
 static const uint8_t CMD_SWITCH_UART = 0x03;
 
+// Register blocks refreshed together by the hub (contiguous ranges)
+static const uint8_t BLOCK_INFO_LEN = 4;  // REG_STATUS .. REG_VERSION
+static const uint8_t BLOCK_DIM0_LEN = 2;  // REG_DIM0_LEVEL .. REG_DIM0_CURVE
+static const uint8_t BLOCK_AC_LEN = 4;    // REG_AC_FREQ .. REG_CALIBRATION
+
 // Status bits
 static const uint8_t STATUS_READY = 0x01;
 static const uint8_t STATUS_ERROR = 0x02;
@@ -51,6 +58,21 @@ class DimmerLinkHub : public Component, public i2c::I2CDevice {
   void dump_config() override;
   float get_setup_priority() const override { return setup_priority::DATA; }
 
+  // Adaptive refresh: fast while the device is busy or faulty, slowing
+  // down (doubling) from update_interval to max_update_interval while
+  // nothing changes
+  void set_fast_update_interval(uint32_t ms) { this->fast_interval_ = ms; }
+  void set_update_interval(uint32_t ms) { this->update_interval_ = this->interval_ = ms; }
+  void set_max_update_interval(uint32_t ms) { this->max_interval_ = ms; }
+  void poll_fast_for(uint32_t ms);
+
+  // False until the device has reported ready and calibrated, and again
+  // while it does not answer or is not ready (e.g. rebooting after a
+  // reset); level and fade time set meanwhile are written once it is live
+  bool is_live() const { return this->initialized_; }
+  // Called whenever the device (re)enters the live state
+  void add_on_live_callback(std::function<void()> &&callback) { this->live_callback_.add(std::move(callback)); }
+
   // I2C register access methods
   bool read_register(uint8_t reg, uint8_t *data, size_t len);
   bool write_register(uint8_t reg, uint8_t value);
@@ -64,6 +86,14 @@ class DimmerLinkHub : public Component, public i2c::I2CDevice {
   uint8_t get_fade_time();
   bool send_command(uint8_t cmd);
 
+  // Register cache: refreshed in three block reads per update interval.
+  // The getters below return cached values and never touch the bus.
+  bool refresh();
+  bool has_data() const { return this->cache_valid_; }
+  void add_on_state_callback(std::function<void()> &&callback) {
+    this->state_callback_.add(std::move(callback));
+  }
+
   // Status methods
   bool is_ready();
   bool has_error();
@@ -76,6 +106,13 @@ class DimmerLinkHub : public Component, public i2c::I2CDevice {
  protected:
   bool initialized_{false};
   uint32_t startup_time_{0};
+  uint32_t probe_interval_{0};  // Startup polling backoff
+  uint8_t refresh_failures_{0};  // Consecutive failed refreshes while live
+  optional<uint8_t> pending_level_;
+  optional<uint8_t> pending_fade_time_;
+  void go_live_();
+  void go_offline_();
+  CallbackManager<void()> live_callback_;
 
   // Cached state
   uint8_t cached_status_{0};
@@ -87,8 +124,17 @@ class DimmerLinkHub : public Component, public i2c::I2CDevice {
   uint16_t cached_ac_period_{0};
   bool cached_calibration_{false};
 
+  uint8_t cached_fade_time_{0};
+  bool cache_valid_{false};
+  CallbackManager<void()> state_callback_;
+
+  uint32_t fast_interval_{100};
+  uint32_t update_interval_{1000};
+  uint32_t max_interval_{30000};
+  uint32_t interval_{1000};   // Current refresh interval
+  uint32_t fast_until_{0};    // Poll fast until this time (transitions)
   uint32_t last_status_update_{0};
-  void update_status_cache_();
+  uint32_t next_interval_(bool changed);
 };
 
 }  // namespace dimmerlink
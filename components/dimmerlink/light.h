@@ -1,14 +1,24 @@
 #pragma once
 
+#include "esphome/core/log.h"
 #include "esphome/components/light/light_output.h"
+#include "esphome/components/light/light_state.h"
+#include "esphome/components/light/transformers.h"
 #include "dimmerlink.h"
 
 namespace esphome {
 namespace dimmerlink {
 
+// REG_DIM0_FADE_TIME range: 100 ms units, one byte
+static const uint32_t FADE_UNIT_MS = 100;
+static const uint32_t FADE_MAX_MS = 255 * FADE_UNIT_MS;
+
+class DimmerLinkTransitionTransformer;
+
 class DimmerLinkLight : public light::LightOutput {
  public:
   void set_parent(DimmerLinkHub *parent) { this->parent_ = parent; }
+  void set_hardware_transitions(bool hardware) { this->hardware_transitions_ = hardware; }
 
   light::LightTraits get_traits() override {
     auto traits = light::LightTraits();
@@ -16,18 +26,126 @@ class DimmerLinkLight : public light::LightOutput {
     return traits;
   }
 
+  void setup_state(light::LightState *state) override {
+    this->state_ = state;
+    // After a reset or power cycle the device is back at its power-on
+    // level with fade time 0 (and has dropped any hardware fade): forget
+    // what was programmed and write the current state again
+    this->parent_->add_on_live_callback([this]() {
+      this->fade_units_ = UINT32_MAX;
+      this->last_level_ = UINT16_MAX;
+      this->hardware_fade_ = nullptr;
+      this->write_state(this->state_);
+    });
+  }
+
+  std::unique_ptr<light::LightTransformer> create_default_transition() override;
+
   void write_state(light::LightState *state) override {
+    // The device is fading on its own: the intermediate values
+    // LightState computes are only bookkeeping
+    if (this->hardware_fade_ != nullptr)
+      return;
+
     float brightness;
     state->current_values_as_brightness(&brightness);
 
-    // Convert 0.0-1.0 to 0-100
-    uint8_t level = static_cast<uint8_t>(brightness * 100.0f);
-    this->parent_->set_level(level);
+    // Host-stepped or instant change: every write must take effect at once
+    this->program_fade_(0);
+    this->write_level_(to_level(brightness));
   }
 
+  // Convert 0.0-1.0 to 0-100
+  static uint8_t to_level(float brightness) { return static_cast<uint8_t>(brightness * 100.0f); }
+
  protected:
+  friend class DimmerLinkTransitionTransformer;
+
+  // Start a hardware fade to brightness over length_ms; false if the
+  // length does not fit REG_DIM0_FADE_TIME or the firmware lacks it
+  bool start_hardware_fade_(DimmerLinkTransitionTransformer *fade, float brightness, uint32_t length_ms) {
+    if (!this->hardware_transitions_ || this->hw_fade_supported_ == 0)
+      return false;
+    uint32_t units = (length_ms + FADE_UNIT_MS / 2) / FADE_UNIT_MS;
+    if (units == 0 || length_ms > FADE_MAX_MS)
+      return false;
+    if (!this->program_fade_(units))
+      return false;
+    this->hardware_fade_ = fade;
+    this->write_level_(to_level(brightness));
+    return true;
+  }
+
+  void end_hardware_fade_(DimmerLinkTransitionTransformer *fade) {
+    if (this->hardware_fade_ == fade)
+      this->hardware_fade_ = nullptr;
+  }
+
+  bool program_fade_(uint32_t units) {
+    if (units == this->fade_units_)
+      return true;
+    if (!this->parent_->set_fade_time(static_cast<uint8_t>(units)))
+      return false;
+    this->fade_units_ = units;
+    if (units != 0 && this->hw_fade_supported_ < 0 && this->parent_->is_live()) {
+      // First use: older firmware ignores the register. Only a read that
+      // succeeds decides; after a failed one the check runs again next time
+      uint8_t readback;
+      if (!this->parent_->read_register(REG_DIM0_FADE_TIME, &readback, 1)) {
+        this->fade_units_ = UINT32_MAX;
+        return false;
+      }
+      this->hw_fade_supported_ = readback == units;
+      if (!this->hw_fade_supported_) {
+        ESP_LOGW("dimmerlink.light", "Hardware fade not supported by firmware, using host transitions");
+        return false;
+      }
+    }
+    return true;
+  }
+
+  void write_level_(uint8_t level) {
+    // Skip rewriting the level the device already has (e.g. the final
+    // write_state of a hardware fade)
+    if (level == this->last_level_ && level == this->parent_->get_level())
+      return;
+    if (this->parent_->set_level(level))
+      this->last_level_ = level;
+  }
+
   DimmerLinkHub *parent_{nullptr};
+  light::LightState *state_{nullptr};
+  bool hardware_transitions_{true};
+  int8_t hw_fade_supported_{-1};            // -1 = unknown
+  uint32_t fade_units_{UINT32_MAX};         // Programmed fade time (unknown at boot)
+  uint16_t last_level_{UINT16_MAX};         // Last level written (none at boot)
+  DimmerLinkTransitionTransformer *hardware_fade_{nullptr};
 };
 
+// Default transition: one fade time and one level write, the device
+// fades; falls back to host-stepped interpolation when the length does
+// not fit the fade register (100 ms - 25.5 s)
+class DimmerLinkTransitionTransformer : public light::LightTransitionTransformer {
+ public:
+  explicit DimmerLinkTransitionTransformer(DimmerLinkLight *light) : light_(light) {}
+  ~DimmerLinkTransitionTransformer() override { this->light_->end_hardware_fade_(this); }
+
+  void start() override {
+    light::LightTransitionTransformer::start();
+    float brightness;
+    this->target_values_.as_brightness(&brightness, this->light_->state_->get_gamma_correct());
+    this->light_->start_hardware_fade_(this, brightness, this->length_);
+  }
+
+  void stop() override { this->light_->end_hardware_fade_(this); }
+
+ protected:
+  DimmerLinkLight *light_;
+};
+
+inline std::unique_ptr<light::LightTransformer> DimmerLinkLight::create_default_transition() {
+  return make_unique<DimmerLinkTransitionTransformer>(this);
+}
+
 }  // namespace dimmerlink
 }  // namespace esphome
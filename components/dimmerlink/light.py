@@ -7,6 +7,8 @@ from . import dimmerlink_ns, DimmerLinkHub, CONF_DIMMERLINK_ID
 
 DEPENDENCIES = ["dimmerlink"]
 
+CONF_HARDWARE_TRANSITIONS = "hardware_transitions"
+
 DimmerLinkLight = dimmerlink_ns.class_("DimmerLinkLight", light.LightOutput)
 
 CONFIG_SCHEMA = light.BRIGHTNESS_ONLY_LIGHT_SCHEMA.extend(
@@ -17,6 +19,7 @@ CONFIG_SCHEMA = light.BRIGHTNESS_ONLY_LIGHT_SCHEMA.extend(
         cv.Optional(
             CONF_DEFAULT_TRANSITION_LENGTH, default="1s"
         ): cv.positive_time_period_milliseconds,
+        cv.Optional(CONF_HARDWARE_TRANSITIONS, default=True): cv.boolean,
     }
 )
 
@@ -26,3 +29,4 @@ async def to_code(config):
     var = cg.new_Pvariable(config[CONF_OUTPUT_ID])
     await light.register_light(var, config)
     cg.add(var.set_parent(hub))
+    cg.add(var.set_hardware_transitions(config[CONF_HARDWARE_TRANSITIONS]))
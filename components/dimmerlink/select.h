@@ -13,19 +13,26 @@ class DimmerLinkCurveSelect : public select::Select, public Component {
   void set_parent(DimmerLinkHub *parent) { this->parent_ = parent; }
 
   void setup() override {
-    // Read current curve from device and publish initial state
-    DimmingCurve curve = this->parent_->get_curve();
-    switch (curve) {
-      case DimmingCurve::LINEAR:
-        this->publish_state("LINEAR");
-        break;
-      case DimmingCurve::RMS:
-        this->publish_state("RMS");
-        break;
-      case DimmingCurve::LOG:
-        this->publish_state("LOG");
-        break;
-    }
+    // Publish the device's curve once the hub has read it, and again
+    // whenever it changes (e.g. set through a lambda)
+    this->parent_->add_on_state_callback([this]() {
+      const char *option;
+      switch (this->parent_->get_curve()) {
+        case DimmingCurve::LINEAR:
+          option = "LINEAR";
+          break;
+        case DimmingCurve::RMS:
+          option = "RMS";
+          break;
+        case DimmingCurve::LOG:
+          option = "LOG";
+          break;
+        default:
+          return;
+      }
+      if (!this->has_state() || this->state != option)
+        this->publish_state(option);
+    });
   }
 
   void dump_config() override {
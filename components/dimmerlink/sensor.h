@@ -1,6 +1,11 @@
 #pragma once
 
+#include <cinttypes>
+#include <cmath>
+
 #include "esphome/core/log.h"
+#include "esphome/core/hal.h"
+#include "esphome/core/helpers.h"
 #include "esphome/core/component.h"
 #include "esphome/components/sensor/sensor.h"
 #include "dimmerlink.h"
@@ -8,54 +13,97 @@
 namespace esphome {
 namespace dimmerlink {
 
+// One sensor with its publish-on-change settings
+struct DimmerLinkSensorChannel {
+  sensor::Sensor *sensor{nullptr};
+  float deadband{0.0f};       // Minimum change to publish
+  uint32_t max_silence{0};    // Republish unchanged values after this (ms, 0 = never)
+  float last_value{NAN};      // Last published value
+  uint32_t last_publish{0};
+
+  void publish(float value, bool on_change, uint32_t now) {
+    if (on_change && !std::isnan(this->last_value) && std::fabs(value - this->last_value) <= this->deadband &&
+        (this->max_silence == 0 || now - this->last_publish < this->max_silence)) {
+      return;
+    }
+    this->sensor->publish_state(value);
+    this->last_value = value;
+    this->last_publish = now;
+  }
+};
+
 class DimmerLinkSensor : public PollingComponent {
  public:
   void set_parent(DimmerLinkHub *parent) { this->parent_ = parent; }
+  void set_publish_on_change(bool on_change) { this->publish_on_change_ = on_change; }
 
-  void set_ac_frequency_sensor(sensor::Sensor *sens) { this->ac_frequency_sensor_ = sens; }
-  void set_level_sensor(sensor::Sensor *sens) { this->level_sensor_ = sens; }
-  void set_firmware_version_sensor(sensor::Sensor *sens) { this->firmware_version_sensor_ = sens; }
-  void set_ac_period_sensor(sensor::Sensor *sens) { this->ac_period_sensor_ = sens; }
+  void set_ac_frequency_sensor(sensor::Sensor *sens, float deadband = 0.0f, uint32_t max_silence = 0) {
+    this->ac_frequency_ = {sens, deadband, max_silence};
+  }
+  void set_level_sensor(sensor::Sensor *sens, float deadband = 0.0f, uint32_t max_silence = 0) {
+    this->level_ = {sens, deadband, max_silence};
+  }
+  void set_firmware_version_sensor(sensor::Sensor *sens, float deadband = 0.0f, uint32_t max_silence = 0) {
+    this->firmware_version_ = {sens, deadband, max_silence};
+  }
+  void set_ac_period_sensor(sensor::Sensor *sens, float deadband = 0.0f, uint32_t max_silence = 0) {
+    this->ac_period_ = {sens, deadband, max_silence};
+  }
 
+  // Publishes from the hub's register cache; never touches the bus
   void update() override {
-    if (this->ac_frequency_sensor_ != nullptr) {
+    if (!this->parent_->has_data())
+      return;
+
+    const uint32_t now = millis();
+    const bool on_change = this->publish_on_change_;
+
+    if (this->ac_frequency_.sensor != nullptr) {
       uint8_t freq = this->parent_->get_ac_frequency();
       if (freq == 50 || freq == 60) {
-        this->ac_frequency_sensor_->publish_state(freq);
+        this->ac_frequency_.publish(freq, on_change, now);
       }
     }
 
-    if (this->level_sensor_ != nullptr) {
-      this->level_sensor_->publish_state(this->parent_->get_level());
+    if (this->level_.sensor != nullptr) {
+      this->level_.publish(this->parent_->get_level(), on_change, now);
     }
 
-    if (this->firmware_version_sensor_ != nullptr) {
-      this->firmware_version_sensor_->publish_state(this->parent_->get_firmware_version());
+    if (this->firmware_version_.sensor != nullptr) {
+      this->firmware_version_.publish(this->parent_->get_firmware_version(), on_change, now);
     }
 
-    if (this->ac_period_sensor_ != nullptr) {
-      this->ac_period_sensor_->publish_state(this->parent_->get_ac_period());
+    if (this->ac_period_.sensor != nullptr) {
+      this->ac_period_.publish(this->parent_->get_ac_period(), on_change, now);
     }
   }
 
   void dump_config() override {
     ESP_LOGCONFIG("dimmerlink.sensor", "DimmerLink Sensors:");
-    if (this->ac_frequency_sensor_)
-      ESP_LOGCONFIG("dimmerlink.sensor", "  AC Frequency: %s", this->ac_frequency_sensor_->get_name().c_str());
-    if (this->level_sensor_)
-      ESP_LOGCONFIG("dimmerlink.sensor", "  Level: %s", this->level_sensor_->get_name().c_str());
-    if (this->firmware_version_sensor_)
-      ESP_LOGCONFIG("dimmerlink.sensor", "  Firmware Version: %s", this->firmware_version_sensor_->get_name().c_str());
-    if (this->ac_period_sensor_)
-      ESP_LOGCONFIG("dimmerlink.sensor", "  AC Period: %s", this->ac_period_sensor_->get_name().c_str());
+    ESP_LOGCONFIG("dimmerlink.sensor", "  Publish on change: %s", YESNO(this->publish_on_change_));
+    this->dump_channel_("AC Frequency", this->ac_frequency_);
+    this->dump_channel_("Level", this->level_);
+    this->dump_channel_("Firmware Version", this->firmware_version_);
+    this->dump_channel_("AC Period", this->ac_period_);
   }
 
  protected:
+  void dump_channel_(const char *label, const DimmerLinkSensorChannel &channel) {
+    if (channel.sensor == nullptr)
+      return;
+    ESP_LOGCONFIG("dimmerlink.sensor", "  %s: %s", label, channel.sensor->get_name().c_str());
+    if (this->publish_on_change_) {
+      ESP_LOGCONFIG("dimmerlink.sensor", "    Deadband: %.1f, Max silence: %" PRIu32 " ms", channel.deadband,
+                    channel.max_silence);
+    }
+  }
+
   DimmerLinkHub *parent_{nullptr};
-  sensor::Sensor *ac_frequency_sensor_{nullptr};
-  sensor::Sensor *level_sensor_{nullptr};
-  sensor::Sensor *firmware_version_sensor_{nullptr};
-  sensor::Sensor *ac_period_sensor_{nullptr};
+  bool publish_on_change_{false};
+  DimmerLinkSensorChannel ac_frequency_;
+  DimmerLinkSensorChannel level_;
+  DimmerLinkSensorChannel firmware_version_;
+  DimmerLinkSensorChannel ac_period_;
 };
 
 }  // namespace dimmerlink
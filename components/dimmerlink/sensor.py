@@ -20,6 +20,9 @@ CONF_AC_FREQUENCY = "ac_frequency"
 CONF_LEVEL = "level"
 CONF_FIRMWARE_VERSION = "firmware_version"
 CONF_AC_PERIOD = "ac_period"
+CONF_PUBLISH_ON_CHANGE = "publish_on_change"
+CONF_DEADBAND = "deadband"
+CONF_MAX_SILENCE = "max_silence"
 
 ICON_SINE_WAVE = "mdi:sine-wave"
 ICON_BRIGHTNESS = "mdi:brightness-percent"
@@ -29,60 +32,78 @@ DimmerLinkSensor = dimmerlink_ns.class_(
     "DimmerLinkSensor", cg.PollingComponent
 )
 
+# Publish-on-change settings, per sensor
+CHANGE_SCHEMA = cv.Schema(
+    {
+        cv.Optional(CONF_DEADBAND, default=0): cv.positive_float,
+        cv.Optional(CONF_MAX_SILENCE): cv.positive_time_period_milliseconds,
+    }
+)
+
 CONFIG_SCHEMA = (
     cv.Schema(
         {
             cv.GenerateID(): cv.declare_id(DimmerLinkSensor),
             cv.Required(CONF_DIMMERLINK_ID): cv.use_id(DimmerLinkHub),
+            cv.Optional(CONF_PUBLISH_ON_CHANGE, default=False): cv.boolean,
+            cv.Optional(CONF_MAX_SILENCE, default="0s"): cv.positive_time_period_milliseconds,
             cv.Optional(CONF_AC_FREQUENCY): sensor.sensor_schema(
                 unit_of_measurement=UNIT_HERTZ,
                 accuracy_decimals=0,
                 device_class=DEVICE_CLASS_FREQUENCY,
                 state_class=STATE_CLASS_MEASUREMENT,
                 icon=ICON_SINE_WAVE,
-            ),
+            ).extend(CHANGE_SCHEMA),
             cv.Optional(CONF_LEVEL): sensor.sensor_schema(
                 unit_of_measurement=UNIT_PERCENT,
                 accuracy_decimals=0,
                 state_class=STATE_CLASS_MEASUREMENT,
                 icon=ICON_BRIGHTNESS,
-            ),
+            ).extend(CHANGE_SCHEMA),
             cv.Optional(CONF_FIRMWARE_VERSION): sensor.sensor_schema(
                 unit_of_measurement=UNIT_EMPTY,
                 accuracy_decimals=0,
                 icon=ICON_CHIP,
                 entity_category=ENTITY_CATEGORY_DIAGNOSTIC,
-            ),
+            ).extend(CHANGE_SCHEMA),
             cv.Optional(CONF_AC_PERIOD): sensor.sensor_schema(
                 unit_of_measurement="μs",
                 accuracy_decimals=0,
                 icon=ICON_TIMER,
                 entity_category=ENTITY_CATEGORY_DIAGNOSTIC,
-            ),
+            ).extend(CHANGE_SCHEMA),
         }
     )
     .extend(cv.polling_component_schema("60s"))
 )
 
 
+def _change_args(config, key):
+    """deadband and max_silence (ms) of one sensor"""
+    conf = config[key]
+    max_silence = conf.get(CONF_MAX_SILENCE, config[CONF_MAX_SILENCE])
+    return conf[CONF_DEADBAND], max_silence.total_milliseconds
+
+
 async def to_code(config):
     hub = await cg.get_variable(config[CONF_DIMMERLINK_ID])
     var = cg.new_Pvariable(config[CONF_ID])
     await cg.register_component(var, config)
     cg.add(var.set_parent(hub))
+    cg.add(var.set_publish_on_change(config[CONF_PUBLISH_ON_CHANGE]))
 
     if CONF_AC_FREQUENCY in config:
         sens = await sensor.new_sensor(config[CONF_AC_FREQUENCY])
-        cg.add(var.set_ac_frequency_sensor(sens))
+        cg.add(var.set_ac_frequency_sensor(sens, *_change_args(config, CONF_AC_FREQUENCY)))
 
     if CONF_LEVEL in config:
         sens = await sensor.new_sensor(config[CONF_LEVEL])
-        cg.add(var.set_level_sensor(sens))
+        cg.add(var.set_level_sensor(sens, *_change_args(config, CONF_LEVEL)))
 
     if CONF_FIRMWARE_VERSION in config:
         sens = await sensor.new_sensor(config[CONF_FIRMWARE_VERSION])
-        cg.add(var.set_firmware_version_sensor(sens))
+        cg.add(var.set_firmware_version_sensor(sens, *_change_args(config, CONF_FIRMWARE_VERSION)))
 
     if CONF_AC_PERIOD in config:
         sens = await sensor.new_sensor(config[CONF_AC_PERIOD])
-        cg.add(var.set_ac_period_sensor(sens))
+        cg.add(var.set_ac_period_sensor(sens, *_change_args(config, CONF_AC_PERIOD)))
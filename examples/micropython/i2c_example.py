@@ -20,28 +20,22 @@ Wiring Raspberry Pi Pico:
 Pull-up resistors: 4.7kΩ on SDA and SCL to VCC
 (Pico doesn't have built-in pull-ups — external ones are required!)
 
+Setup:
+    Copy the shared protocol module to the board first:
+    mpremote cp ../python/dimmerlink_protocol.py :
+
 Documentation: https://rbdimmer.com/docs/
 """
 
 from machine import I2C, Pin
 import time
 
-# I2C address of DimmerLink (default 0x50, can be changed)
-DIMMER_ADDR = 0x50
-
-# Registers
-REG_STATUS   = 0x00   # Device status (R)
-REG_COMMAND  = 0x01   # Control commands (W)
-REG_ERROR    = 0x02   # Last error code (R)
-REG_LEVEL    = 0x10   # Brightness 0-100% (R/W)
-REG_CURVE    = 0x11   # Dimming curve (R/W)
-REG_FREQ     = 0x20   # Mains frequency Hz (R)
-REG_I2C_ADDR = 0x30   # Device I2C address (R/W)
-
-# Dimming curve types
-CURVE_LINEAR = 0      # Linear (universal)
-CURVE_RMS    = 1      # RMS (incandescent, halogen)
-CURVE_LOG    = 2      # Logarithmic (LED)
+# Shared protocol core: copy examples/python/dimmerlink_protocol.py to the
+# board next to this file (mpremote cp dimmerlink_protocol.py :)
+from dimmerlink_protocol import (
+    DIMMER_ADDR, REG_ERROR, REG_LEVEL, REG_CURVE, REG_FREQ,
+    CURVE_LINEAR, CURVE_RMS, CURVE_LOG, check_level, check_curve,
+)
 
 
 class DimmerLink:
@@ -60,6 +54,7 @@ class DimmerLink:
         """
         self.i2c = I2C(i2c_id, scl=Pin(scl_pin), sda=Pin(sda_pin), freq=freq)
         self.addr = addr
+        self._byte = bytearray(1)     # Reused for every register write
 
         # Check device presence on bus
         devices = self.i2c.scan()
@@ -86,12 +81,14 @@ class DimmerLink:
         Note:
             I2C is fast — can be called frequently for smooth transitions
         """
-        if not 0 <= level <= 100:
-            print(f"Error: level must be 0-100, got {level}")
+        try:
+            self._byte[0] = check_level(level)
+        except ValueError as e:
+            print("Error:", e)
             return False
 
         try:
-            self.i2c.writeto_mem(self.addr, REG_LEVEL, bytes([level]))
+            self.i2c.writeto_mem(self.addr, REG_LEVEL, self._byte)
             return True
         except OSError as e:
             print(f"I2C Error: {e}")
@@ -121,12 +118,14 @@ class DimmerLink:
         Returns:
             bool: True if successful
         """
-        if curve_type not in (0, 1, 2):
-            print(f"Error: curve must be 0, 1, or 2, got {curve_type}")
+        try:
+            self._byte[0] = check_curve(curve_type)
+        except ValueError as e:
+            print("Error:", e)
             return False
 
         try:
-            self.i2c.writeto_mem(self.addr, REG_CURVE, bytes([curve_type]))
+            self.i2c.writeto_mem(self.addr, REG_CURVE, self._byte)
             return True
         except OSError as e:
             print(f"I2C Error: {e}")
@@ -186,8 +185,10 @@ class DimmerLink:
             print("Error: cannot read current level")
             return
 
-        if not 0 <= target <= 100:
-            print(f"Error: target must be 0-100, got {target}")
+        try:
+            check_level(target)
+        except ValueError as e:
+            print("Error:", e)
             return
 
         steps = abs(target - current)
@@ -20,42 +20,24 @@ Wiring Raspberry Pi Pico:
 ⚠️ UART is slower than I2C — don't send commands more than 5-10 times/sec!
    For smooth transitions we recommend I2C (see i2c_example.py)
 
+Setup:
+    Copy the shared protocol module to the board first:
+    mpremote cp ../python/dimmerlink_protocol.py :
+
 Documentation: https://rbdimmer.com/docs/
 """
 
 from machine import UART, Pin
 import time
 
-# UART commands (all start with 0x02)
-CMD_START       = 0x02    # Start byte (required!)
-CMD_SET         = 0x53    # 'S' - set brightness
-CMD_GET         = 0x47    # 'G' - get brightness
-CMD_CURVE       = 0x43    # 'C' - set curve
-CMD_GETCURVE    = 0x51    # 'Q' - get curve
-CMD_FREQ        = 0x52    # 'R' - get mains frequency
-CMD_RESET       = 0x58    # 'X' - device reset
-CMD_SWITCH_I2C  = 0x5B    # '[' - switch to I2C
-
-# Response codes
-RESP_OK         = 0x00    # Success
-RESP_ERR_SYNTAX = 0xF9    # Invalid command format
-RESP_ERR_EEPROM = 0xFC    # EEPROM write error
-RESP_ERR_INDEX  = 0xFD    # Invalid dimmer index
-RESP_ERR_PARAM  = 0xFE    # Invalid parameter
-
-# Curve types
-CURVE_LINEAR = 0
-CURVE_RMS    = 1
-CURVE_LOG    = 2
-
-# Error descriptions
-ERROR_MESSAGES = {
-    RESP_OK: "OK",
-    RESP_ERR_SYNTAX: "Invalid command format",
-    RESP_ERR_EEPROM: "EEPROM write error",
-    RESP_ERR_INDEX: "Invalid dimmer index (use 0)",
-    RESP_ERR_PARAM: "Invalid parameter value",
-}
+# Shared protocol core: copy examples/python/dimmerlink_protocol.py to the
+# board next to this file (mpremote cp dimmerlink_protocol.py :)
+from dimmerlink_protocol import (
+    CMD_SET, CMD_GET, CMD_CURVE, CMD_GETCURVE, CMD_FREQ, CMD_SWITCH_I2C,
+    RESP_OK, ResponseDecoder,
+    error_message, encode_set, encode_curve,
+    FRAME_GET, FRAME_GETCURVE, FRAME_FREQ, FRAME_RESET, FRAME_SWITCH_I2C,
+)
 
 
 class DimmerLink:
@@ -72,35 +54,60 @@ class DimmerLink:
             baudrate: Speed (always 115200 for DimmerLink)
         """
         self.uart = UART(uart_id, baudrate=baudrate, tx=Pin(tx_pin), rx=Pin(rx_pin))
+        self._decoder = ResponseDecoder()
+        self._rx = bytearray(16)              # Reused for every read
+        self._rx_view = memoryview(self._rx)
         print(f"UART{uart_id} initialized: TX=GPIO{tx_pin}, RX=GPIO{rx_pin}, {baudrate} baud")
 
-    def _clear_buffer(self):
-        """Clear input buffer from old data"""
-        while self.uart.any():
-            self.uart.read()
-
-    def _read_response(self, expected_bytes=1, timeout_ms=100):
+    def _transact(self, cmd, frame, timeout_ms=100):
         """
-        Read response with timeout
+        Send a command frame and wait for its reply
+
+        Replies are matched to commands by the protocol decoder, so a
+        late reply to an earlier command is absorbed instead of being
+        taken for this one, and error replies (1 byte) end the wait
+        immediately.
 
         Args:
-            expected_bytes: Expected number of bytes
+            cmd: Command byte (CMD_SET, CMD_GET, ...)
+            frame: Frame to send (from dimmerlink_protocol)
             timeout_ms: Timeout in milliseconds
 
         Returns:
-            bytes or None
+            tuple: (status, value), or None on timeout
         """
+        decoder = self._decoder
+        # Give late replies already in the RX FIFO to the commands they
+        # belong to before giving up on those commands
+        n = self.uart.any()
+        while n:
+            n = self.uart.readinto(self._rx, min(n, len(self._rx)))
+            if not n:
+                break
+            decoder.feed(self._rx_view[:n])
+            n = self.uart.any()
+        decoder.discard_stale()
+        token = decoder.expect(cmd)
+        self.uart.write(frame)
+
         start = time.ticks_ms()
-        while self.uart.any() < expected_bytes:
-            if time.ticks_diff(time.ticks_ms(), start) > timeout_ms:
+        while True:
+            n = self.uart.any()
+            if n:
+                n = self.uart.readinto(self._rx, min(n, len(self._rx)))
+            if n:
+                for tok, status, value in decoder.feed(self._rx_view[:n]):
+                    if tok == token:
+                        return status, value
+            elif time.ticks_diff(time.ticks_ms(), start) > timeout_ms:
+                decoder.expire(token)
                 return None
-            time.sleep_ms(1)
-        return self.uart.read(expected_bytes)
+            else:
+                time.sleep_ms(1)
 
     def _print_error(self, code):
         """Print error description"""
-        msg = ERROR_MESSAGES.get(code, f"Unknown error 0x{code:02X}")
-        print(f"Error: {msg}")
+        print("Error:", error_message(code))
 
     def set_level(self, level):
         """
@@ -115,15 +122,13 @@ class DimmerLink:
         Note:
             ⚠️ Don't call more than 5-10 times per second!
         """
-        if not 0 <= level <= 100:
-            print(f"Error: level must be 0-100, got {level}")
+        try:
+            frame = encode_set(level)
+        except ValueError as e:
+            print("Error:", e)
             return False
 
-        self._clear_buffer()
-        cmd = bytes([CMD_START, CMD_SET, 0x00, level])
-        self.uart.write(cmd)
-
-        resp = self._read_response(1)
+        resp = self._transact(CMD_SET, frame)
         if resp is None:
             print("Error: No response (check TX→RX connection)")
             return False
@@ -141,11 +146,7 @@ class DimmerLink:
         Returns:
             int: Brightness 0-100%, or None on error
         """
-        self._clear_buffer()
-        cmd = bytes([CMD_START, CMD_GET, 0x00])
-        self.uart.write(cmd)
-
-        resp = self._read_response(2)
+        resp = self._transact(CMD_GET, FRAME_GET)
         if resp is None:
             print("Error: No response")
             return None
@@ -166,15 +167,13 @@ class DimmerLink:
         Returns:
             bool: True if successful
         """
-        if curve_type not in (0, 1, 2):
-            print(f"Error: curve must be 0, 1, or 2, got {curve_type}")
+        try:
+            frame = encode_curve(curve_type)
+        except ValueError as e:
+            print("Error:", e)
             return False
 
-        self._clear_buffer()
-        cmd = bytes([CMD_START, CMD_CURVE, 0x00, curve_type])
-        self.uart.write(cmd)
-
-        resp = self._read_response(1)
+        resp = self._transact(CMD_CURVE, frame)
         if resp is None:
             print("Error: No response")
             return False
@@ -192,11 +191,7 @@ class DimmerLink:
         Returns:
             int: 0=LINEAR, 1=RMS, 2=LOG, or None on error
         """
-        self._clear_buffer()
-        cmd = bytes([CMD_START, CMD_GETCURVE, 0x00])
-        self.uart.write(cmd)
-
-        resp = self._read_response(2)
+        resp = self._transact(CMD_GETCURVE, FRAME_GETCURVE)
         if resp is None:
             return None
 
@@ -211,11 +206,7 @@ class DimmerLink:
         Returns:
             int: 50 or 60 Hz, or None on error
         """
-        self._clear_buffer()
-        cmd = bytes([CMD_START, CMD_FREQ])
-        self.uart.write(cmd)
-
-        resp = self._read_response(2)
+        resp = self._transact(CMD_FREQ, FRAME_FREQ)
         if resp is None:
             return None
 
@@ -229,9 +220,8 @@ class DimmerLink:
 
         ⚠️ After reset, device will reboot!
         """
-        self._clear_buffer()
-        cmd = bytes([CMD_START, CMD_RESET])
-        self.uart.write(cmd)
+        self.uart.write(FRAME_RESET)
+        self._decoder.reset()
         print("Device reset command sent")
 
     def switch_to_i2c(self):
@@ -241,11 +231,7 @@ class DimmerLink:
         ⚠️ After switching, UART will no longer work!
            Use I2C at address 0x50.
         """
-        self._clear_buffer()
-        cmd = bytes([CMD_START, CMD_SWITCH_I2C])
-        self.uart.write(cmd)
-
-        resp = self._read_response(1)
+        resp = self._transact(CMD_SWITCH_I2C, FRAME_SWITCH_I2C)
         if resp and resp[0] == RESP_OK:
             print("Switched to I2C mode")
             print("UART is now disabled, use I2C at address 0x50")
@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+"""
+DimmerLink - asyncio UART client (Python + pyserial)
+
+Non-blocking counterpart of the DimmerLink class in uart_example.py.
+The serial port is registered with the event loop, so many coroutines
+can issue commands at the same time: frames are written immediately
+(pipelined) and replies are matched to requests in the order they were
+sent by the ResponseDecoder from dimmerlink_protocol.py. One event loop
+can drive dozens of UART dimmers without a thread per port.
+
+Installation:
+    pip install pyserial
+
+Usage:
+    import asyncio
+    from dimmerlink_async import AsyncDimmerLink
+
+    async def main():
+        async with AsyncDimmerLink('/dev/ttyUSB0') as dimmer:
+            await dimmer.set_level(50)
+            print(await dimmer.get_level())
+
+    asyncio.run(main())
+
+⚠️ Requires an event loop with add_reader() support for serial ports
+   (Linux, macOS). On Windows use uart_example.py.
+
+Documentation: https://rbdimmer.com/docs/
+"""
+
+import asyncio
+import os
+import time
+
+import serial
+
+from dimmerlink_protocol import (
+    RESP_OK, COMMAND_NAMES, ResponseDecoder, RttEstimator, error_message,
+    encode_set, encode_curve, FRAME_GET, FRAME_GETCURVE, FRAME_FREQ,
+    FRAME_RESET, FRAME_SWITCH_I2C,
+)
+from dimmerlink_metrics import (
+    Transaction, chain_hooks, unchain_hooks, inspect_uart,
+)
+
+
+class AsyncDimmerLink:
+    """Class for controlling DimmerLink via UART from asyncio"""
+
+    def __init__(self, port, baudrate=115200, timeout=0.5, max_in_flight=8,
+                 adaptive=True):
+        """
+        Prepare UART connection (opened by open() or `async with`)
+
+        Args:
+            port: Serial port ('/dev/ttyUSB0', '/dev/serial0', ...)
+            baudrate: Speed (always 115200 for DimmerLink)
+            timeout: Per-command reply timeout in seconds (adaptive:
+                     until the first round trip was measured)
+            max_in_flight: Maximum commands awaiting a reply at once
+            adaptive: Derive reply timeouts from measured round-trip
+                      times (see RttEstimator in dimmerlink_protocol.py)
+        """
+        self.port = port
+        self.baudrate = baudrate
+        self.timeout = timeout
+        self.rtt = RttEstimator(initial=timeout, max_timeout=max(2.0, 4 * timeout)) if adaptive else None
+        self.ser = None
+        self._loop = None
+        self._decoder = ResponseDecoder()
+        self._waiters = {}                    # token -> (future, time sent)
+        self._last_reply = 0.0                # Loop time of the latest reply
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._rx = bytearray(256)             # Reused receive buffer
+        self._rx_view = memoryview(self._rx)
+        self._hook = None                     # see dimmerlink_metrics.py
+
+    def add_hook(self, hook):
+        """
+        Report every command round trip to a hook
+
+        Hooks are called on the event loop thread; elapsed_ns includes
+        time spent waiting for an in-flight slot.
+
+        Args:
+            hook: Object with before(txn)/after(txn) (see dimmerlink_metrics.Hook)
+        """
+        self._hook = chain_hooks(self._hook, hook)
+
+    def remove_hook(self, hook):
+        """
+        Stop reporting to a hook
+
+        Raises:
+            ValueError: If the hook is not registered
+        """
+        self._hook = unchain_hooks(self._hook, hook)
+
+    async def open(self):
+        """
+        Open the port and attach it to the running event loop
+
+        Raises:
+            serial.SerialException: If unable to open port
+        """
+        self._loop = asyncio.get_running_loop()
+        self.ser = serial.Serial(self.port, self.baudrate, timeout=0)
+        self.ser.reset_input_buffer()
+        self.ser.reset_output_buffer()
+        self._loop.add_reader(self.ser.fileno(), self._on_readable)
+        return self
+
+    def close(self):
+        """Detach from the event loop, fail pending commands and close the port"""
+        if self.ser is None:
+            return
+        self._loop.remove_reader(self.ser.fileno())
+        self.ser.close()
+        self.ser = None
+        self._fail_all(serial.SerialException("Port closed"))
+
+    def _fail_all(self, exc):
+        """Fail every command still waiting for a reply"""
+        for fut, _ in self._waiters.values():
+            if not fut.done():
+                fut.set_exception(exc)
+        self._waiters.clear()
+        self._decoder.reset()
+
+    async def __aenter__(self):
+        """Support for async context manager (async with statement)"""
+        return await self.open()
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """Automatic close on exit from async with"""
+        self.close()
+
+    def _on_readable(self):
+        """Event loop callback: consume available bytes and resolve replies"""
+        try:
+            data = self._read()
+        except serial.SerialException as e:
+            self._fail_all(e)
+            return
+
+        # Late replies are only waited for during one more timeout period
+        self._decoder.discard_stale(self._loop.time() - self._timeout())
+        self._consume(data)
+
+    def _read(self):
+        """
+        Read the bytes that have arrived into the reused buffer
+
+        Returns:
+            memoryview: Valid until the next read
+        """
+        try:
+            n = os.readv(self.ser.fileno(), (self._rx,))
+        except BlockingIOError:
+            return b""
+        except OSError as e:
+            raise serial.SerialException(f"read failed: {e}")
+        if not n:
+            raise serial.SerialException("device reports readiness to read but returned no data")
+        return self._rx_view[:n]
+
+    def _consume(self, data):
+        """Feed received bytes to the decoder and resolve completed replies"""
+        decoder = self._decoder
+        late = decoder.late
+        now = self._loop.time()
+        for token, status, value in decoder.feed(data):
+            waiter = self._waiters.pop(token, None)
+            if waiter is not None and not waiter[0].done():
+                # The device answers in order: a pipelined command only
+                # starts its round trip once the reply ahead of it is in,
+                # time queued behind it is not part of the sample
+                if self.rtt is not None:
+                    self.rtt.sample(now - max(waiter[1], self._last_reply))
+                waiter[0].set_result((status, value))
+            self._last_reply = now
+        if decoder.late != late:
+            self._last_reply = now
+            if self.rtt is not None:
+                self.rtt.late_reply()
+
+    def _timeout(self):
+        """Reply timeout for the next command"""
+        return self.timeout if self.rtt is None else self.rtt.timeout
+
+    async def _command(self, frame):
+        """
+        Send a frame and wait for its reply
+
+        Args:
+            frame: Command bytes (starting with CMD_START)
+
+        Returns:
+            tuple: (status, value) of the reply, or None on timeout or
+                   for commands without a reply
+        """
+        if self.ser is None:
+            raise serial.SerialException("Port is not open")
+        hook = self._hook
+        if hook is None:
+            return await self._exchange(frame)
+
+        txn = Transaction("uart", self.port, COMMAND_NAMES.get(frame[1]), frame[1],
+                          bytes(frame[2:]))
+        hook.before(txn)
+        clock = time.perf_counter_ns
+        start = txn.start_ns = clock()
+        try:
+            resp = await self._exchange(frame)
+        except BaseException as e:
+            txn.error = e
+            raise
+        else:
+            inspect_uart(txn, resp)
+            return resp
+        finally:
+            txn.elapsed_ns = clock() - start
+            hook.after(txn)
+
+    async def _exchange(self, frame):
+        """Write a frame and wait for its reply (see _command)"""
+        async with self._slots:
+            # No await between queueing and writing: order on the wire
+            # always matches order in the decoder.
+            if self._decoder.has_stale:
+                # Like the blocking driver: a late reply gets until the
+                # next command is sent, otherwise the replies to new
+                # commands would be taken for late ones.
+                if self.ser.in_waiting:
+                    self._consume(self._read())
+                self._decoder.discard_stale()
+            token = self._decoder.expect(frame[1])
+            self.ser.write(frame)
+            if token is None:
+                return None
+
+            fut = self._loop.create_future()
+            self._waiters[token] = (fut, self._loop.time())
+            # Every command ahead of this one is answered first
+            timeout = self._timeout() * self._decoder.pending
+            try:
+                return await asyncio.wait_for(fut, timeout)
+            except asyncio.TimeoutError:
+                self._waiters.pop(token, None)
+                self._decoder.expire(token, self._loop.time())
+                if self.rtt is not None:
+                    self.rtt.timed_out()
+                return None
+
+    def _get_error_message(self, code):
+        """Get error description by code"""
+        return error_message(code)
+
+    async def _simple(self, frame):
+        """Send a command with a 1-byte status reply"""
+        resp = await self._command(frame)
+        if resp is None:
+            print(f"Error: No response from {self.port}")
+            return False
+        if resp[0] != RESP_OK:
+            print(f"Error: {self._get_error_message(resp[0])}")
+            return False
+        return True
+
+    async def _query(self, frame):
+        """Send a command with a status + value reply"""
+        resp = await self._command(frame)
+        if resp is not None and resp[0] == RESP_OK:
+            return resp[1]
+        if resp is not None:
+            print(f"Error: {self._get_error_message(resp[0])}")
+        return None
+
+    async def set_level(self, level):
+        """
+        Set brightness
+
+        Args:
+            level: Brightness 0-100%
+
+        Returns:
+            bool: True if successful
+
+        Raises:
+            ValueError: If level not in range 0-100
+        """
+        return await self._simple(encode_set(level))
+
+    async def get_level(self):
+        """
+        Get current brightness
+
+        Returns:
+            int: Brightness 0-100%, or None on error
+        """
+        return await self._query(FRAME_GET)
+
+    async def set_curve(self, curve_type):
+        """
+        Set dimming curve
+
+        Args:
+            curve_type: CURVE_LINEAR (0), CURVE_RMS (1), CURVE_LOG (2)
+
+        Returns:
+            bool: True if successful
+
+        Raises:
+            ValueError: If curve_type not 0, 1 or 2
+        """
+        return await self._simple(encode_curve(curve_type))
+
+    async def get_curve(self):
+        """
+        Get curve type
+
+        Returns:
+            int: 0=LINEAR, 1=RMS, 2=LOG, or None on error
+        """
+        return await self._query(FRAME_GETCURVE)
+
+    async def get_frequency(self):
+        """
+        Get mains frequency
+
+        Returns:
+            int: 50 or 60 Hz, or None on error
+        """
+        return await self._query(FRAME_FREQ)
+
+    async def reset(self):
+        """
+        Software device reset
+
+        ⚠️ After reset, device will reboot (~3 sec)
+        """
+        await self._command(FRAME_RESET)
+        # Replies to commands sent before the reset will never come:
+        # forget them and any partial frame, as the blocking driver does
+        self._fail_all(serial.SerialException("Device reset"))
+        if self.rtt is not None:
+            self.rtt.reset()
+
+    async def switch_to_i2c(self):
+        """
+        Switch interface to I2C
+
+        Returns:
+            bool: True if successful
+
+        ⚠️ After switching, UART will no longer work!
+        """
+        return await self._simple(FRAME_SWITCH_I2C)
+
+
+# =============================================================
+# Usage example
+# =============================================================
+
+async def main(ports):
+    dimmers = [AsyncDimmerLink(p) for p in ports]
+    for d in dimmers:
+        await d.open()
+    try:
+        # Query every dimmer at once, then set them all to 50%
+        freqs = await asyncio.gather(*(d.get_frequency() for d in dimmers))
+        for d, freq in zip(dimmers, freqs):
+            print(f"{d.port}: AC frequency {freq} Hz")
+
+        results = await asyncio.gather(*(d.set_level(50) for d in dimmers))
+        print(f"Set 50% on {sum(results)}/{len(dimmers)} dimmers")
+    finally:
+        for d in dimmers:
+            d.close()
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) < 2:
+        print("Usage: python dimmerlink_async.py PORT [PORT ...]")
+        sys.exit(1)
+    asyncio.run(main(sys.argv[1:]))
@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+"""
+DimmerLink - Benchmark suite
+
+Measures command throughput, latency percentiles, error rate and fade
+timing accuracy (I2C targets only: an unthrottled host fade would
+overrun the 5-10 commands/s a UART DimmerLink takes) of the Python
+drivers, against the emulator (default)
+or real hardware, and saves the results as JSON so versions can be
+compared.
+
+Targets:
+    uart        uart_example.DimmerLink, one command at a time
+    uart-async  dimmerlink_async.AsyncDimmerLink, pipelined
+    i2c         i2c_example.DimmerLink
+    i2c-fleet   dimmerlink_fleet.DimmerLinkFleet, batched set_levels
+
+Usage:
+    python dimmerlink_bench.py                          # all, emulated
+    python dimmerlink_bench.py uart --port /dev/ttyUSB0 # real UART
+    python dimmerlink_bench.py i2c --bus 1 --addr 0x50  # real I2C
+    python dimmerlink_bench.py -o new.json --compare old.json
+
+⚠️ Benchmarks on real hardware send hundreds of commands and sweep the
+   brightness: don't run them with a load you care about connected.
+
+Documentation: https://rbdimmer.com/docs/
+"""
+
+import argparse
+import contextlib
+import json
+import platform
+import sys
+import time
+
+from dimmerlink_fade import FadeEngine
+
+
+# =============================================================
+# Statistics
+# =============================================================
+
+def percentile(sorted_samples, p):
+    """
+    Nearest-rank percentile
+
+    Args:
+        sorted_samples: Ascending list of numbers
+        p: Percentile 0-100
+
+    Returns:
+        Sample value, or None for an empty list
+
+    Check with python -m doctest dimmerlink_bench.py:
+
+    >>> percentile(list(range(1, 11)), 50)
+    5
+    >>> [percentile(list(range(1, 101)), p) for p in (50, 95, 99, 100)]
+    [50, 95, 99, 100]
+    """
+    if not sorted_samples:
+        return None
+    n = len(sorted_samples)
+    # Same ceiling as LatencyHistogram.percentile (dimmerlink_metrics.py)
+    rank = max(1, -(-n * p // 100))
+    return sorted_samples[min(int(rank), n) - 1]
+
+
+def summarize(samples_ns, errors, elapsed):
+    """
+    Turn raw latencies into a result record
+
+    Args:
+        samples_ns: Latency of every command in ns (errors included)
+        errors: Number of failed commands
+        elapsed: Wall time of the whole run in seconds
+
+    Returns:
+        dict: ops, ops_per_s, p50/p95/p99/max latency in µs, errors, error_rate
+    """
+    samples = sorted(samples_ns)
+    ops = len(samples)
+
+    def us(v):
+        return None if v is None else round(v / 1000, 1)
+
+    return {
+        "ops": ops,
+        "seconds": round(elapsed, 4),
+        "ops_per_s": round(ops / elapsed, 1) if elapsed > 0 else None,
+        "p50_us": us(percentile(samples, 50)),
+        "p95_us": us(percentile(samples, 95)),
+        "p99_us": us(percentile(samples, 99)),
+        "max_us": us(samples[-1] if samples else None),
+        "errors": errors,
+        "error_rate": round(errors / ops, 4) if ops else None,
+    }
+
+
+# =============================================================
+# Scenarios
+# =============================================================
+
+def succeeded(result):
+    """Driver convention: False (UART) or an exception means failure"""
+    return result is not False
+
+
+def returned_value(result):
+    """Driver convention for reads: None means failure"""
+    return result is not None
+
+
+def bench_calls(call, args_list, ok=succeeded):
+    """
+    Time a blocking driver call once per argument tuple
+
+    Args:
+        call: Driver method
+        args_list: List of argument tuples
+        ok: Predicate on the return value (exceptions always fail)
+
+    Returns:
+        dict: summarize() record
+    """
+    samples = []
+    errors = 0
+    clock = time.perf_counter_ns
+    start = time.perf_counter()
+    for args in args_list:
+        t0 = clock()
+        try:
+            good = ok(call(*args))
+        except OSError:
+            good = False
+        samples.append(clock() - t0)
+        errors += not good
+    return summarize(samples, errors, time.perf_counter() - start)
+
+
+def bench_fade(dimmer, duration):
+    """
+    Measure how close a 0 -> 100% software fade ends to its deadline
+
+    Returns:
+        dict: requested_s, actual_s, error_ms, writes, skipped
+    """
+    dimmer.set_level(0)
+    engine = FadeEngine(dimmer)
+    start = time.perf_counter()
+    engine.run(100, duration, start=0)
+    actual = time.perf_counter() - start
+    return {
+        "requested_s": duration,
+        "actual_s": round(actual, 4),
+        "error_ms": round((actual - duration) * 1000, 2),
+        "writes": engine.writes,
+        "skipped": engine.skipped,
+    }
+
+
+def bench_driver(dimmer, count, fade):
+    """Standard scenario set for a blocking DimmerLink"""
+    levels = [(i % 101,) for i in range(count)]
+    results = {
+        "set_level": bench_calls(dimmer.set_level, levels),
+        "get_level": bench_calls(dimmer.get_level, [()] * count, returned_value),
+    }
+    if fade:
+        results["fade"] = bench_fade(dimmer, fade)
+    return results
+
+
+# =============================================================
+# Targets
+# =============================================================
+
+@contextlib.contextmanager
+def quiet():
+    """Keep driver chatter out of the benchmark output"""
+    with contextlib.redirect_stdout(sys.stderr):
+        yield
+
+
+@contextlib.contextmanager
+def uart_port(args):
+    """Real port, or a UART emulator for the duration of the run"""
+    if args.port:
+        yield args.port
+        return
+    from dimmerlink_emulator import UartEmulator
+
+    with UartEmulator(latency=args.latency_ms / 1000, jitter=args.jitter_ms / 1000,
+                      drop_rate=args.drop / 100, seed=args.seed) as emu:
+        yield emu.port
+
+
+def i2c_bus(args, addrs):
+    """Real bus number, or a FakeSMBus factory with devices at addrs"""
+    if args.bus is not None:
+        return None
+    from dimmerlink_emulator import FakeSMBus, DeviceModel
+
+    def factory(bus_number=1):
+        return FakeSMBus(devices=[DeviceModel(i2c_addr=a) for a in addrs],
+                         latency=args.latency_ms / 1000, jitter=args.jitter_ms / 1000,
+                         nack_rate=args.drop / 100, seed=args.seed)
+    return factory
+
+
+def target_uart(args):
+    from uart_example import DimmerLink
+
+    with uart_port(args) as port, quiet(), DimmerLink(port, timeout=args.timeout) as dimmer:
+        # No fade scenario: the device takes 5-10 commands/s over UART
+        return bench_driver(dimmer, args.count, 0)
+
+
+def target_uart_async(args):
+    import asyncio
+    from dimmerlink_async import AsyncDimmerLink
+
+    async def run(port):
+        async with AsyncDimmerLink(port, timeout=args.timeout,
+                                   max_in_flight=args.concurrency) as dimmer:
+            samples = []
+            errors = 0
+            clock = time.perf_counter_ns
+
+            async def worker(first):
+                # `concurrency` workers keep that many commands in flight
+                nonlocal errors
+                for i in range(first, args.count, args.concurrency):
+                    t0 = clock()
+                    ok = await dimmer.set_level(i % 101)
+                    samples.append(clock() - t0)
+                    errors += not ok
+
+            start = time.perf_counter()
+            await asyncio.gather(*(worker(w) for w in range(args.concurrency)))
+            return {"set_level": summarize(samples, errors, time.perf_counter() - start)}
+
+    with uart_port(args) as port, quiet():
+        result = asyncio.run(run(port))
+    result["set_level"]["concurrency"] = args.concurrency
+    return result
+
+
+def target_i2c(args):
+    from i2c_example import DimmerLink
+
+    factory = i2c_bus(args, [args.addr])
+    with quiet():
+        bus = factory() if factory else None
+        with DimmerLink(args.bus or 1, args.addr, bus=bus) as dimmer:
+            result = bench_driver(dimmer, args.count, args.fade)
+            result["snapshot"] = bench_calls(dimmer.snapshot, [()] * args.count, returned_value)
+            return result
+
+
+def target_i2c_fleet(args):
+    from dimmerlink_fleet import DimmerLinkFleet
+
+    addrs = list(range(args.addr, min(args.addr + args.devices, 0x78)))
+    factory = i2c_bus(args, addrs)
+    with quiet(), DimmerLinkFleet(**({"bus_factory": factory} if factory else {})) as fleet:
+        for addr in addrs:
+            fleet.add(addr, bus=args.bus or 1)
+        passes = max(1, args.count // len(addrs))
+        result = bench_calls(
+            lambda level: not fleet.set_levels({a: level for a in addrs}),
+            [(i % 101,) for i in range(passes)],
+        )
+    result["devices"] = len(addrs)
+    result["levels_per_s"] = round(result["ops_per_s"] * len(addrs), 1)
+    return {"set_levels": result}
+
+
+TARGETS = {
+    "uart": target_uart,
+    "uart-async": target_uart_async,
+    "i2c": target_i2c,
+    "i2c-fleet": target_i2c_fleet,
+}
+
+
+# =============================================================
+# Reporting
+# =============================================================
+
+# Metrics where lower is better (everything else: higher is better)
+LOWER_IS_BETTER = ("_us", "errors", "error_rate", "error_ms", "seconds", "actual_s", "skipped")
+
+
+def compare(current, baseline):
+    """
+    Relative change of every numeric metric present in both runs
+
+    Returns:
+        list: Lines "target.scenario.metric: old -> new (+x.x%)" with
+              a "!" suffix for regressions
+    """
+    lines = []
+    for target, scenarios in current["results"].items():
+        for scenario, metrics in scenarios.items():
+            old = baseline.get("results", {}).get(target, {}).get(scenario, {})
+            for name, value in metrics.items():
+                before = old.get(name)
+                if not isinstance(value, (int, float)) or not isinstance(before, (int, float)):
+                    continue
+                if before == value:
+                    continue
+                change = (value - before) / abs(before) * 100 if before else float("inf")
+                worse = (change > 0) == name.endswith(LOWER_IS_BETTER)
+                lines.append(f"{target}.{scenario}.{name}: {before} -> {value} "
+                             f"({change:+.1f}%){' !' if worse else ''}")
+    return lines
+
+
+def print_results(results):
+    """Human-readable table of a results dict"""
+    for target, scenarios in results.items():
+        print(f"\n[{target}]")
+        for scenario, m in scenarios.items():
+            if "ops_per_s" in m:
+                print(f"  {scenario:<10} {m['ops_per_s']:>9} ops/s  "
+                      f"p50 {m['p50_us']} µs  p95 {m['p95_us']} µs  p99 {m['p99_us']} µs  "
+                      f"errors {m['errors']}/{m['ops']}")
+            else:
+                print(f"  {scenario:<10} {m['actual_s']} s for {m['requested_s']} s "
+                      f"({m['error_ms']:+} ms, {m['writes']} writes, {m['skipped']} skipped)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="DimmerLink driver benchmarks")
+    parser.add_argument("targets", nargs="*", metavar="target",
+                        help=f"{', '.join(TARGETS)} (default: all)")
+    parser.add_argument("-n", "--count", type=int, default=500, help="commands per scenario")
+    parser.add_argument("--fade", type=float, default=1.0, help="fade length, s (0 = skip; I2C targets)")
+    parser.add_argument("--port", help="real UART port instead of the emulator")
+    parser.add_argument("--bus", type=int, help="real I2C bus instead of the emulator")
+    parser.add_argument("--addr", type=lambda v: int(v, 0), default=0x50)
+    parser.add_argument("--devices", type=int, default=16, help="i2c-fleet size")
+    parser.add_argument("--concurrency", type=int, default=8, help="uart-async in-flight")
+    parser.add_argument("--timeout", type=float, default=0.5, help="UART reply timeout, s")
+    parser.add_argument("--latency-ms", type=float, default=0.5, help="emulated response time")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="emulated jitter")
+    parser.add_argument("--drop", type=float, default=0.0, help="emulated faults, %%")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("-o", "--output", help="save results as JSON")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    args = parser.parse_args(argv)
+    for name in args.targets:
+        if name not in TARGETS:
+            parser.error(f"unknown target {name!r}")
+
+    report = {
+        "meta": {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "emulated": {"uart": args.port is None, "i2c": args.bus is None},
+            "args": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+        },
+        "results": {},
+    }
+    for name in args.targets or list(TARGETS):
+        print(f"Running {name}...", file=sys.stderr)
+        report["results"][name] = TARGETS[name](args)
+
+    print_results(report["results"])
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"\nChanges vs {args.compare} (! = regression):")
+        for line in compare(report, baseline) or ["  (no changes)"]:
+            print(f"  {line}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+DimmerLink - Write-through state cache
+
+Level and curve only change when we write them, yet applications keep
+re-sending identical values and re-reading registers. CachedDimmerLink
+wraps a UART or I2C DimmerLink and:
+
+  - skips writes that match the last acknowledged value (set_curve hits
+    the device EEPROM, so this matters most there),
+  - serves get_level()/get_curve() from cache for `ttl` seconds,
+  - forgets everything on reset(), interface/address changes and errors.
+
+All other methods are passed through to the wrapped driver.
+
+Usage:
+    from i2c_example import DimmerLink
+    from dimmerlink_cache import CachedDimmerLink
+
+    with CachedDimmerLink(DimmerLink(), ttl=5.0) as dimmer:
+        dimmer.set_curve(1)     # written
+        dimmer.set_curve(1)     # suppressed, no EEPROM write
+        dimmer.get_curve()      # served from cache
+
+Documentation: https://rbdimmer.com/docs/
+"""
+
+import time
+
+LEVEL = "level"
+CURVE = "curve"
+
+
+class CachedDimmerLink:
+    """Opt-in cache in front of a DimmerLink (UART or I2C)"""
+
+    def __init__(self, dimmer, ttl=1.0, write_ttl=None, clock=time.monotonic):
+        """
+        Args:
+            dimmer: DimmerLink instance (uart_example or i2c_example)
+            ttl: Seconds a value is served to get_level()/get_curve()
+                 (None = until invalidated, 0 = always read)
+            write_ttl: Seconds a value suppresses identical writes
+                       (None = until invalidated)
+            clock: Monotonic time source in seconds
+        """
+        self.dimmer = dimmer
+        self.ttl = ttl
+        self.write_ttl = write_ttl
+        self.clock = clock
+        self._cache = {}          # LEVEL/CURVE -> (value, acknowledged at)
+
+        self.hits = 0             # Reads served from cache
+        self.misses = 0           # Reads sent to the device
+        self.suppressed = 0       # Writes skipped as redundant
+
+    def __getattr__(self, name):
+        """Pass everything not cached through to the driver"""
+        return getattr(self.dimmer, name)
+
+    def __enter__(self):
+        """Support for context manager (with statement)"""
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Automatic close on exit from with"""
+        self.dimmer.close()
+
+    def invalidate(self):
+        """Forget all cached values"""
+        self._cache.clear()
+
+    def _valid(self, key, max_age):
+        """Cached value if younger than max_age, else None"""
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        if max_age is not None and self.clock() - entry[1] > max_age:
+            return None
+        return entry[0]
+
+    def _write(self, key, method, value):
+        """Write through to the device unless the value is already there"""
+        if self._valid(key, self.write_ttl) == value:
+            self.suppressed += 1
+            return True
+        try:
+            result = method(value)
+        except Exception:
+            self.invalidate()
+            raise
+        # UART methods return False on error; I2C methods return None
+        if result is False:
+            self.invalidate()
+            return False
+        self._cache[key] = (value, self.clock())
+        return True
+
+    def _read(self, key, method):
+        """Serve a read from cache or refresh it from the device"""
+        value = self._valid(key, self.ttl)
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+        try:
+            value = method()
+        except Exception:
+            self.invalidate()
+            raise
+        if value is None:
+            self.invalidate()
+        else:
+            self._cache[key] = (value, self.clock())
+        return value
+
+    def set_level(self, level):
+        """
+        Set brightness (skipped if already acknowledged)
+
+        Returns:
+            bool: True if successful
+        """
+        return self._write(LEVEL, self.dimmer.set_level, level)
+
+    def get_level(self):
+        """
+        Get brightness, from cache if fresh
+
+        Returns:
+            int: Brightness 0-100%, or None on error
+        """
+        return self._read(LEVEL, self.dimmer.get_level)
+
+    def set_curve(self, curve_type):
+        """
+        Set dimming curve (skipped if already acknowledged)
+
+        Returns:
+            bool: True if successful
+        """
+        return self._write(CURVE, self.dimmer.set_curve, curve_type)
+
+    def get_curve(self):
+        """
+        Get curve type, from cache if fresh
+
+        Returns:
+            int: 0=LINEAR, 1=RMS, 2=LOG, or None on error
+        """
+        return self._read(CURVE, self.dimmer.get_curve)
+
+    def fade_to(self, target, *args, **kwargs):
+        """Fade via the driver; the cache then holds the target level"""
+        self._cache.pop(LEVEL, None)
+        try:
+            self.dimmer.fade_to(target, *args, **kwargs)
+        except Exception:
+            self.invalidate()
+            raise
+        self._cache[LEVEL] = (target, self.clock())
+
+    def snapshot(self):
+        """Read a full snapshot (I2C) and refresh the cache from it"""
+        state = self.dimmer.snapshot()
+        now = self.clock()
+        self._cache[LEVEL] = (state.level, now)
+        self._cache[CURVE] = (state.curve, now)
+        return state
+
+    def reset(self):
+        """Software device reset; the cache is cleared"""
+        self.invalidate()
+        return self.dimmer.reset()
+
+    def change_address(self, new_addr):
+        """Change I2C address; the cache is cleared"""
+        self.invalidate()
+        return self.dimmer.change_address(new_addr)
+
+    def switch_to_i2c(self):
+        """Switch UART device to I2C; the cache is cleared"""
+        self.invalidate()
+        return self.dimmer.switch_to_i2c()
+
+    def switch_to_uart(self):
+        """Switch I2C device to UART; the cache is cleared"""
+        self.invalidate()
+        return self.dimmer.switch_to_uart()
@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+DimmerLink - Command line tool
+
+One-shot dimmer control for cron jobs, Home Assistant shell_command
+and other scripts. Transport modules are imported only once the
+command knows which one it needs, and a port or bus given on the
+command line is opened directly (no port enumeration or probing), so a
+`set` takes little more than the interpreter start.
+
+Commands:
+    set LEVEL               Set brightness 0-100%
+    get [FIELD]             Print level (default), curve, frequency or all (JSON)
+    curve TYPE              Set curve: 0-2 or LINEAR, RMS, LOG
+    fade TARGET [-d S]      Fade to TARGET over S seconds
+    batch                   Run commands read from stdin over one connection
+    scan [--uart]           Find DimmerLinks on the I2C buses (or serial ports)
+    bench [...]             Run dimmerlink_bench.py
+
+Connection (set/get/curve/fade/batch):
+    --port PORT             UART port ($DIMMERLINK_PORT)
+    --bus N [--addr A]      I2C bus and address ($DIMMERLINK_BUS, $DIMMERLINK_ADDR)
+    neither                 Auto-detect a UART DimmerLink (dimmerlink_discovery.py)
+
+Batch mode reads one command per line (set, get, curve, fade as above,
+plus "sleep SECONDS"; blank lines and # comments are skipped) and
+prints one result line per command: the value for get, "ok" or
+"error: <message>". The exit status is 1 if any command failed.
+
+    printf 'set 20\\nsleep 1\\nset 80\\nget\\n' | dimmerlink batch --bus 1
+
+Results go to stdout; driver messages go to stderr.
+
+Installation (no packaging needed):
+    ln -s "$PWD/dimmerlink_cli.py" ~/.local/bin/dimmerlink
+
+Usage:
+    dimmerlink set 50 --port /dev/ttyUSB0
+    dimmerlink get all --bus 1
+    dimmerlink fade 0 -d 3 --bus 1 --hardware
+
+Documentation: https://rbdimmer.com/docs/
+"""
+
+import argparse
+import contextlib
+import os
+import sys
+
+# Host-stepped UART fades: the device takes 5-10 commands/s at most
+UART_FADE_INTERVAL = 0.15
+
+CURVES = {"LINEAR": 0, "RMS": 1, "LOG": 2}
+FIELDS = ("level", "curve", "frequency", "all")
+
+
+class CommandError(Exception):
+    """A command that the device rejected or did not answer"""
+
+
+# =============================================================
+# Connection
+# =============================================================
+
+def open_dimmer(args):
+    """
+    Open the DimmerLink selected by --port/--bus (or auto-detect)
+
+    Returns:
+        DimmerLink: uart_example or i2c_example instance
+
+    Raises:
+        CommandError: If no port was given and none was found
+    """
+    if args.bus is not None:
+        from i2c_example import DimmerLink
+        return DimmerLink(args.bus, args.addr)
+
+    port = args.port
+    if port is None:
+        from dimmerlink_discovery import find_dimmerlinks
+        found = find_dimmerlinks()
+        if not found:
+            raise CommandError("no DimmerLink found, use --port or --bus")
+        port = found[0].device
+    from uart_example import DimmerLink
+    return DimmerLink(port, timeout=args.timeout)
+
+
+def is_i2c(dimmer):
+    """True for an i2c_example.DimmerLink"""
+    return hasattr(dimmer, "bus")
+
+
+# =============================================================
+# Commands (shared by the command line and batch mode)
+# =============================================================
+
+def parse_curve(value):
+    """Curve type from 0-2 or a name (LINEAR, RMS, LOG)"""
+    name = value.upper()
+    if name in CURVES:
+        return CURVES[name]
+    try:
+        return int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid curve {value!r}")
+
+
+def check(result):
+    """UART setters return False on failure, I2C setters raise"""
+    if result is False:
+        raise CommandError("command failed (see stderr)")
+
+
+def value_of(result, what):
+    """UART getters return None on failure, I2C getters raise"""
+    if result is None:
+        raise CommandError(f"no {what} received")
+    return result
+
+
+def do_set(dimmer, level):
+    check(dimmer.set_level(level))
+    return "ok"
+
+
+def do_curve(dimmer, curve_type):
+    check(dimmer.set_curve(curve_type))
+    return "ok"
+
+
+def do_get(dimmer, field="level"):
+    if field == "level":
+        return value_of(dimmer.get_level(), "level")
+    if field == "curve":
+        return value_of(dimmer.get_curve(), "curve")
+    if field == "frequency":
+        return value_of(dimmer.get_frequency(), "frequency")
+
+    import json
+    if is_i2c(dimmer):
+        state = dimmer.snapshot()._asdict()
+    else:
+        state = {
+            "level": value_of(dimmer.get_level(), "level"),
+            "curve": value_of(dimmer.get_curve(), "curve"),
+            "frequency": value_of(dimmer.get_frequency(), "frequency"),
+        }
+    return json.dumps(state)
+
+
+def do_fade(dimmer, target, duration=1.0, hardware=False):
+    """
+    Fade to target
+
+    I2C fades use the driver (hardware fade if requested and supported);
+    UART fades are stepped from the host at the rate the UART allows.
+    """
+    if is_i2c(dimmer):
+        dimmer.fade_to(target, duration, hardware=hardware)
+        return "ok"
+
+    import time
+    from dimmerlink_fade import fade_level
+    from dimmerlink_protocol import check_level
+
+    check_level(target)
+    start = value_of(dimmer.get_level(), "level")
+    t0 = time.monotonic()
+    level = start
+    while level != target:
+        time.sleep(UART_FADE_INTERVAL)
+        new = fade_level(start, target, time.monotonic() - t0, duration)
+        if new != level:
+            check(dimmer.set_level(new))
+            level = new
+    return "ok"
+
+
+def run_line(dimmer, line):
+    """
+    Execute one batch command
+
+    Returns:
+        str: Result line, or None for lines without a result
+    """
+    words = line.split("#", 1)[0].split()
+    if not words:
+        return None
+    cmd, params = words[0].lower(), words[1:]
+
+    if cmd == "set" and len(params) == 1:
+        return do_set(dimmer, int(params[0]))
+    if cmd == "get" and len(params) <= 1:
+        field = params[0].lower() if params else "level"
+        if field not in FIELDS:
+            raise CommandError(f"unknown field {field!r}")
+        return do_get(dimmer, field)
+    if cmd == "curve" and len(params) == 1:
+        return do_curve(dimmer, parse_curve(params[0]))
+    if cmd == "fade" and 1 <= len(params) <= 2:
+        duration = float(params[1]) if len(params) > 1 else 1.0
+        return do_fade(dimmer, int(params[0]), duration)
+    if cmd == "sleep" and len(params) == 1:
+        import time
+        time.sleep(float(params[0]))
+        return None
+    raise CommandError(f"invalid command {line.strip()!r}")
+
+
+def run_batch(dimmer, lines, out):
+    """
+    Execute batch commands, writing one result line per command
+
+    Returns:
+        int: Number of failed commands
+    """
+    failed = 0
+    for line in lines:
+        try:
+            result = run_line(dimmer, line)
+        except (CommandError, ValueError, OSError, argparse.ArgumentTypeError) as e:
+            result = f"error: {e}"
+            failed += 1
+        if result is not None:
+            print(result, file=out, flush=True)
+    return failed
+
+
+# =============================================================
+# Command line
+# =============================================================
+
+def build_parser():
+    conn = argparse.ArgumentParser(add_help=False)
+    group = conn.add_argument_group("connection")
+    where = group.add_mutually_exclusive_group()
+    where.add_argument("--port", help="UART port (default: $DIMMERLINK_PORT or auto-detect)")
+    where.add_argument("--bus", type=int, help="I2C bus number (default: $DIMMERLINK_BUS)")
+    group.add_argument("--addr", type=lambda v: int(v, 0),
+                       default=os.environ.get("DIMMERLINK_ADDR", "0x50"),
+                       help="I2C address (default: $DIMMERLINK_ADDR or 0x50)")
+    group.add_argument("--timeout", type=float, default=0.5, help="UART reply timeout, s")
+
+    parser = argparse.ArgumentParser(prog="dimmerlink", description="DimmerLink control")
+    sub = parser.add_subparsers(dest="command", metavar="command")
+    sub.required = True
+
+    p = sub.add_parser("set", parents=[conn], help="set brightness")
+    p.add_argument("level", type=int, help="0-100")
+
+    p = sub.add_parser("get", parents=[conn], help="print level, curve, frequency or all")
+    p.add_argument("field", nargs="?", default="level", choices=FIELDS)
+
+    p = sub.add_parser("curve", parents=[conn], help="set dimming curve")
+    p.add_argument("curve_type", type=parse_curve, help="0-2 or LINEAR, RMS, LOG")
+
+    p = sub.add_parser("fade", parents=[conn], help="fade to a level")
+    p.add_argument("target", type=int, help="0-100")
+    p.add_argument("-d", "--duration", type=float, default=1.0, help="seconds")
+    p.add_argument("--hardware", action="store_true",
+                   help="let the device fade (I2C, REG_FADE_TIME firmware)")
+
+    sub.add_parser("batch", parents=[conn], help="run commands from stdin")
+
+    # Listed for --help only; main() hands their arguments to the tools
+    sub.add_parser("scan", help="find DimmerLinks on I2C buses (--uart: serial ports)")
+    sub.add_parser("bench", help="run dimmerlink_bench.py")
+    return parser
+
+
+def run_tool(command, argv):
+    """Run dimmerlink_scan, dimmerlink_discovery or dimmerlink_bench"""
+    if command == "bench":
+        from dimmerlink_bench import main as tool
+    elif "--uart" in argv:
+        argv = [a for a in argv if a != "--uart"]
+        from dimmerlink_discovery import main as tool
+    else:
+        from dimmerlink_scan import main as tool
+    sys.argv[0] = f"dimmerlink {command}"
+    tool(argv)
+    return 0
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if argv and argv[0] in ("scan", "bench"):
+        return run_tool(argv[0], argv[1:])
+
+    args = build_parser().parse_args(argv)
+    if args.port is None and args.bus is None:
+        args.port = os.environ.get("DIMMERLINK_PORT")
+        bus = os.environ.get("DIMMERLINK_BUS")
+        if args.port is None and bus:
+            try:
+                args.bus = int(bus)
+            except ValueError:
+                print(f"dimmerlink: invalid DIMMERLINK_BUS {bus!r}", file=sys.stderr)
+                return 1
+
+    out = sys.stdout
+    try:
+        # Driver messages ("Connected to ...", errors) must not mix with results
+        with contextlib.redirect_stdout(sys.stderr):
+            dimmer = open_dimmer(args)
+            try:
+                if args.command == "batch":
+                    failed = run_batch(dimmer, sys.stdin, out)
+                    return 1 if failed else 0
+                if args.command == "set":
+                    result = do_set(dimmer, args.level)
+                elif args.command == "get":
+                    result = do_get(dimmer, args.field)
+                elif args.command == "curve":
+                    result = do_curve(dimmer, args.curve_type)
+                else:
+                    result = do_fade(dimmer, args.target, args.duration, args.hardware)
+            finally:
+                dimmer.close()
+    except (CommandError, ValueError, OSError) as e:
+        print(f"dimmerlink: {e}", file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        return 130
+
+    if args.command == "get":
+        print(result, file=out)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+DimmerLink - Latest-value-wins write coalescer (UART)
+
+UART DimmerLinks must not receive more than 5-10 commands per second,
+but sliders and automations can easily produce 100 updates/s. The
+CoalescingWriter keeps only the newest pending level per dimmer and a
+single background thread sends it no faster than the configured rate.
+Levels that are overwritten before they are sent are counted as dropped.
+
+Usage:
+    from uart_example import DimmerLink
+    from dimmerlink_coalesce import CoalescingWriter
+
+    with DimmerLink('/dev/ttyUSB0') as dimmer, CoalescingWriter(rate=5) as writer:
+        for level in range(101):
+            writer.set_level(dimmer, level)   # never blocks on the port
+        writer.flush()
+        print(writer.stats())
+
+Works with any object that has a set_level(level) method.
+
+Documentation: https://rbdimmer.com/docs/
+"""
+
+import threading
+import time
+
+from dimmerlink_protocol import check_level
+
+# Safe command rate for UART, from the uart_example.py advice (5-10/s)
+DEFAULT_RATE = 5.0
+
+
+class CoalescingWriter:
+    """Rate-limited, latest-value-wins set_level queue"""
+
+    def __init__(self, rate=DEFAULT_RATE):
+        """
+        Create the writer (call start() or use `with`)
+
+        Args:
+            rate: Maximum set_level calls per second, per dimmer
+
+        Raises:
+            ValueError: If rate is not positive
+        """
+        if rate <= 0:
+            raise ValueError(f"Rate must be positive, got {rate}")
+        self.interval = 1.0 / rate
+        self._cond = threading.Condition()
+        self._pending = {}       # dimmer -> newest level not yet sent
+        self._next_send = {}     # dimmer -> earliest time of next write
+        self._busy = 0           # Writes in progress (outside the lock)
+        self._thread = None
+        self._running = False
+
+        self.submitted = 0       # set_level() calls
+        self.written = 0         # Levels sent to a device
+        self.dropped = 0         # Levels replaced before they were sent
+        self.failed = 0          # Writes that returned False or raised
+
+    def start(self):
+        """Start the flush thread"""
+        with self._cond:
+            if self._running:
+                return self
+            self._running = True
+        self._thread = threading.Thread(
+            target=self._run, name="dimmerlink-coalesce", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self, flush=True):
+        """
+        Stop the flush thread
+
+        Args:
+            flush: Send pending levels first (at the configured rate)
+        """
+        if flush:
+            self.flush()
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        """Support for context manager (with statement)"""
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Flush and stop on exit from with"""
+        self.stop(flush=exc_type is None)
+
+    def set_level(self, dimmer, level):
+        """
+        Queue a brightness change (returns immediately)
+
+        Args:
+            dimmer: DimmerLink instance
+            level: Brightness 0-100%
+
+        Raises:
+            ValueError: If level not in range 0-100
+        """
+        check_level(level)
+
+        with self._cond:
+            self.submitted += 1
+            if dimmer in self._pending:
+                self.dropped += 1
+            self._pending[dimmer] = level
+            self._cond.notify_all()
+
+    def pending(self, dimmer):
+        """
+        Get the level waiting to be sent
+
+        Returns:
+            int: Pending level, or None if nothing is queued
+        """
+        with self._cond:
+            return self._pending.get(dimmer)
+
+    def flush(self, timeout=None):
+        """
+        Wait until every queued level has been written
+
+        Without a running flush thread (start() not called) the levels
+        are written from the calling thread, at the configured rate.
+
+        Args:
+            timeout: Maximum wait in seconds (None = forever)
+
+        Returns:
+            bool: True if the queue drained
+        """
+        with self._cond:
+            if self._running:
+                return self._cond.wait_for(
+                    lambda: not self._pending and not self._busy, timeout
+                )
+        return self._drain(timeout)
+
+    def stats(self):
+        """
+        Get counters
+
+        Returns:
+            dict: submitted, written, dropped, failed, pending
+        """
+        with self._cond:
+            return {
+                "submitted": self.submitted,
+                "written": self.written,
+                "dropped": self.dropped,
+                "failed": self.failed,
+                "pending": len(self._pending),
+            }
+
+    def _take_due(self, now):
+        """Pop levels whose dimmer may be written now (lock held)"""
+        next_send = self._next_send
+        due = [(d, lvl) for d, lvl in self._pending.items()
+               if next_send.get(d, 0.0) <= now]
+        # Forget dimmers whose rate-limit window has passed with nothing
+        # pending, so memory follows the dimmers in use
+        for dimmer in [d for d, t in next_send.items() if t <= now and d not in self._pending]:
+            del next_send[dimmer]
+        for dimmer, _ in due:
+            del self._pending[dimmer]
+            next_send[dimmer] = now + self.interval
+        return due
+
+    def _write(self, due):
+        """Send levels popped by _take_due (lock not held)"""
+        for dimmer, level in due:
+            try:
+                ok = dimmer.set_level(level) is not False
+            except Exception:
+                ok = False
+            with self._cond:
+                self._busy -= 1
+                if ok:
+                    self.written += 1
+                else:
+                    self.failed += 1
+                self._cond.notify_all()
+
+    def _drain(self, timeout):
+        """Write pending levels in the calling thread (see flush)"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._cond:
+                if not self._pending:
+                    return True
+                now = time.monotonic()
+                due = self._take_due(now)
+                self._busy += len(due)
+                if not due:
+                    wake = min(self._next_send.get(d, 0.0) for d in self._pending)
+            if due:
+                self._write(due)
+                continue
+            if deadline is not None and wake > deadline:
+                return False
+            time.sleep(max(0.0, wake - now))
+
+    def _run(self):
+        """Flush thread: send due levels, sleep until the next one is due"""
+        while True:
+            with self._cond:
+                while True:
+                    if not self._running:
+                        return
+                    now = time.monotonic()
+                    due = self._take_due(now)
+                    if due:
+                        self._busy += len(due)
+                        break
+                    if self._pending:
+                        wake = min(self._next_send.get(d, 0.0) for d in self._pending)
+                        self._cond.wait(max(0.0, wake - now))
+                    elif self._next_send:
+                        # Wake once more to drop expired windows
+                        self._cond.wait(max(0.0, max(self._next_send.values()) - now))
+                    else:
+                        self._cond.wait()
+
+            # Port I/O happens outside the lock so producers never block
+            self._write(due)
+
+
+# =============================================================
+# Usage example
+# =============================================================
+
+def main():
+    import sys
+    from uart_example import DimmerLink
+
+    if len(sys.argv) < 2:
+        print("Usage: python dimmerlink_coalesce.py PORT")
+        sys.exit(1)
+
+    with DimmerLink(sys.argv[1]) as dimmer, CoalescingWriter() as writer:
+        print("Simulating a slider: 100 updates in 1 second...")
+        for level in range(101):
+            writer.set_level(dimmer, level)
+            time.sleep(0.01)
+        writer.flush()
+        print(writer.stats())
+        writer.set_level(dimmer, 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+DimmerLink - Serial port discovery
+
+Finds the serial ports that really have a DimmerLink on them instead
+of guessing from the adapter type. Every candidate port (known
+USB-UART adapters, other USB serial ports, the Raspberry Pi UART) is
+opened at the same time and sent CMD_FREQ; ports answering 50 or 60 Hz
+are DimmerLinks.
+
+Results are cached in ~/.cache/dimmerlink/ports.json ($XDG_CACHE_HOME
+is honoured), keyed by the adapter's USB serial number (or its USB
+location when the adapter has no serial number, as most CH340s). While
+the same adapters are plugged in, the next start only re-checks the
+cached DimmerLinks (they answer in milliseconds) and still finds the
+right port after /dev/ttyUSBn renumbering; other ports are only probed
+when newly plugged or when no cached DimmerLink answers any more.
+
+Usage:
+    from dimmerlink_discovery import find_dimmerlinks
+
+    for port in find_dimmerlinks():
+        print(port.device, port.frequency)
+
+Command line:
+    python dimmerlink_discovery.py              # cached if possible
+    python dimmerlink_discovery.py --refresh    # probe all ports again
+
+⚠️ Probing writes two bytes (0x02 0x52) to every candidate port. Pass
+   exclude=[...] for ports with other equipment that must not see them.
+
+Documentation: https://rbdimmer.com/docs/
+"""
+
+import json
+import os
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import serial
+import serial.tools.list_ports
+
+from dimmerlink_protocol import CMD_FREQ, FRAME_FREQ, RESP_OK, ResponseDecoder
+
+# Known USB-UART adapters (VID, PID, name), probed first
+KNOWN_ADAPTERS = [
+    (0x1A86, 0x7523, "CH340"),
+    (0x10C4, 0xEA60, "CP2102"),
+    (0x0403, 0x6001, "FT232"),     # FT232RL
+    (0x0403, 0x6015, "FT231X"),
+]
+
+# Raspberry Pi built-in UART (not listed by comports() on every image)
+PI_UART = "/dev/serial0"
+
+PROBE_TIMEOUT = 0.3           # Seconds a port gets to answer CMD_FREQ
+VALID_FREQUENCIES = (50, 60)
+
+CACHE_VERSION = 1
+
+DiscoveredPort = namedtuple("DiscoveredPort", ("device", "frequency", "key", "description"))
+
+
+def cache_path():
+    """Location of the port cache file"""
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "dimmerlink", "ports.json")
+
+
+def port_key(info):
+    """
+    Stable identity of a serial port
+
+    Returns:
+        str: "sn:<vid>:<pid>:<serial number>" for USB adapters with a
+             serial number, "loc:<usb location>" for those without,
+             "path:<device>" for everything else
+    """
+    if isinstance(info, str):
+        return f"path:{info}"
+    if info.serial_number:
+        return f"sn:{info.vid:04X}:{info.pid:04X}:{info.serial_number}"
+    if info.location:
+        return f"loc:{info.location}"
+    return f"path:{info.device}"
+
+
+def adapter_name(info):
+    """Adapter type from VID/PID, or None"""
+    for vid, pid, name in KNOWN_ADAPTERS:
+        if info.vid == vid and info.pid == pid:
+            return name
+    return None
+
+
+def candidate_ports(exclude=()):
+    """
+    Serial ports that could have a DimmerLink, most likely first
+
+    Returns:
+        list: ListPortInfo objects (the Pi UART as a bare path string)
+    """
+    ports = [p for p in serial.tools.list_ports.comports() if p.device not in exclude]
+    known = [p for p in ports if adapter_name(p)]
+    usb = [p for p in ports if p not in known and p.vid is not None]
+    other = [p for p in ports if p not in known and p not in usb
+             and ("USB" in p.device.upper() or "ACM" in p.device.upper())]
+    candidates = known + usb + other
+    if (sys.platform.startswith("linux") and os.path.exists(PI_UART)
+            and PI_UART not in exclude
+            and os.path.realpath(PI_UART) not in {os.path.realpath(p.device) for p in candidates}):
+        candidates.append(PI_UART)
+    return candidates
+
+
+def probe_port(device, timeout=PROBE_TIMEOUT):
+    """
+    Ask a port for the mains frequency
+
+    Args:
+        device: Port path ('/dev/ttyUSB0', 'COM3', ...)
+        timeout: Seconds to wait for the reply
+
+    Returns:
+        int: 50 or 60 if a DimmerLink answered, else None
+    """
+    try:
+        with serial.Serial(device, 115200, timeout=timeout, write_timeout=timeout) as ser:
+            ser.reset_input_buffer()
+            decoder = ResponseDecoder()
+            token = decoder.expect(CMD_FREQ)
+            ser.write(FRAME_FREQ)
+            deadline = time.monotonic() + timeout
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                ser.timeout = remaining
+                for tok, status, value in decoder.feed(ser.read(ser.in_waiting or 1)):
+                    if tok == token and status == RESP_OK and value in VALID_FREQUENCIES:
+                        return value
+                    return None
+    except (serial.SerialException, OSError, ValueError):
+        return None
+
+
+def probe_ports(devices, timeout=PROBE_TIMEOUT):
+    """
+    Probe many ports at the same time
+
+    Args:
+        devices: Port paths
+        timeout: Seconds each port gets to answer
+
+    Returns:
+        dict: {device: frequency} of the ports with a DimmerLink
+    """
+    devices = list(devices)
+    if not devices:
+        return {}
+    with ThreadPoolExecutor(max_workers=len(devices)) as pool:
+        results = pool.map(lambda d: probe_port(d, timeout), devices)
+        return {d: f for d, f in zip(devices, results) if f is not None}
+
+
+def load_cache(path=None):
+    """Cached {key: {"frequency": ..., "description": ...}} (empty if none)"""
+    try:
+        with open(path or cache_path()) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if data.get("version") != CACHE_VERSION:
+        return {}
+    return data.get("ports", {})
+
+
+def save_cache(ports, path=None):
+    """Write the cache atomically (errors are ignored: the cache is optional)"""
+    path = path or cache_path()
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"version": CACHE_VERSION, "ports": ports}, f, indent=2)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+def find_dimmerlinks(timeout=PROBE_TIMEOUT, refresh=False, exclude=(), cache_file=None):
+    """
+    Serial ports with a DimmerLink
+
+    Cached DimmerLinks are probed again on every call (a DimmerLink
+    answers in milliseconds) and dropped from the cache if they no
+    longer answer (dimmer unpowered or moved to another adapter). Other
+    ports are only probed if the cache knows nothing about them, or
+    when no cached DimmerLink answered.
+
+    Args:
+        timeout: Seconds each port gets to answer a probe
+        refresh: Ignore the cache and probe every candidate
+        exclude: Port paths never to open
+        cache_file: Cache location (default: cache_path())
+
+    Returns:
+        list: DiscoveredPort per DimmerLink, in candidate order
+    """
+    candidates = {getattr(c, "device", c): c for c in candidate_ports(exclude)}
+    keys = {device: port_key(info) for device, info in candidates.items()}
+
+    cache = {} if refresh else load_cache(cache_file)
+    hits = [device for device, key in keys.items() if cache.get(key, {}).get("frequency")]
+    answered = probe_ports(hits, timeout)
+    # No known DimmerLink answers: probe everything else again
+    trust = bool(answered)
+
+    unknown = [device for device, key in keys.items()
+               if device not in hits and (not trust or key not in cache)]
+    answered.update(probe_ports(unknown, timeout))
+
+    changed = False
+    for device in hits + unknown:
+        info = candidates[device]
+        entry = {
+            "frequency": answered.get(device),
+            "device": device,
+            "description": getattr(info, "description", device),
+        }
+        if cache.get(keys[device]) != entry:
+            cache[keys[device]] = entry
+            changed = True
+    if changed:
+        save_cache(cache, cache_file)
+
+    return [
+        DiscoveredPort(device, cache[key]["frequency"], key, cache[key].get("description", ""))
+        for device, key in keys.items()
+        if cache[key].get("frequency")
+    ]
+
+
+# =============================================================
+# Command line
+# =============================================================
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Find serial ports with a DimmerLink")
+    parser.add_argument("--refresh", action="store_true", help="ignore the cache")
+    parser.add_argument("--timeout", type=float, default=PROBE_TIMEOUT, help="probe timeout, s")
+    parser.add_argument("--exclude", nargs="*", default=[], help="ports not to open")
+    args = parser.parse_args(argv)
+
+    start = time.monotonic()
+    found = find_dimmerlinks(args.timeout, args.refresh, args.exclude)
+    elapsed = time.monotonic() - start
+
+    if not found:
+        print(f"No DimmerLink found ({elapsed:.2f} s)")
+        for info in candidate_ports(args.exclude):
+            print(f"  probed {getattr(info, 'device', info)}")
+        sys.exit(1)
+
+    print(f"Found {len(found)} DimmerLink(s) in {elapsed:.2f} s:")
+    for port in found:
+        print(f"  {port.device:<16} {port.frequency} Hz  {port.description}  [{port.key}]")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,479 @@
+#!/usr/bin/env python3
+"""
+DimmerLink - Firmware emulator for hardware-free testing
+
+Two halves sharing one device model:
+
+  UartEmulator  A pseudo-terminal speaking the UART protocol (0x02 start
+                byte, S/G/C/Q/R/X/[ commands, 0xF9/0xFC/0xFD/0xFE errors).
+                Point uart_example.DimmerLink at emulator.port.
+
+  FakeSMBus     Drop-in replacement for smbus2.SMBus implementing the
+                I2C register map of components/dimmerlink/dimmerlink.h.
+                Pass it as DimmerLink(bus=FakeSMBus()) or as a
+                DimmerLinkFleet bus_factory.
+
+Both accept response latency, jitter and fault injection (dropped
+replies / NACKs, corrupted bytes, EEPROM write failures), so throughput
+and latency work can be measured on any Linux box.
+
+Usage:
+    from dimmerlink_emulator import UartEmulator, FakeSMBus
+    from uart_example import DimmerLink as UartDimmer
+    from i2c_example import DimmerLink as I2CDimmer
+
+    with UartEmulator(latency=0.002, drop_rate=0.01) as emu:
+        with UartDimmer(emu.port) as dimmer:
+            dimmer.set_level(50)
+
+    dimmer = I2CDimmer(bus=FakeSMBus(latency=0.0002))
+
+Command line (UART emulator on a PTY until Ctrl+C):
+    python dimmerlink_emulator.py --latency 2 --jitter 1 --drop 1
+
+Documentation: https://rbdimmer.com/docs/
+"""
+
+import errno
+import os
+import random
+import threading
+import time
+
+from dimmerlink_protocol import (
+    CMD_START, CMD_SET, CMD_GET, CMD_CURVE, CMD_GETCURVE, CMD_FREQ,
+    CMD_RESET, CMD_SWITCH_I2C,
+    RESP_OK, RESP_ERR_SYNTAX, RESP_ERR_EEPROM, RESP_ERR_INDEX, RESP_ERR_PARAM,
+    DIMMER_ADDR, ADDR_MIN, ADDR_MAX, REG_STATUS, REG_COMMAND, REG_ERROR,
+    REG_VERSION, REG_LEVEL, REG_CURVE, REG_FADE_TIME, REG_FREQ, REG_PERIOD_L,
+    REG_PERIOD_H, REG_CALIB, REG_I2C_ADDR, STATUS_READY, STATUS_ERROR,
+    CMD_I2C_RESET, CMD_I2C_RECALIBRATE, CMD_I2C_SWITCH_UART,
+)
+
+# UART frame length (start byte included) per command
+FRAME_LENGTHS = {
+    CMD_SET: 4,
+    CMD_GET: 3,
+    CMD_CURVE: 4,
+    CMD_GETCURVE: 3,
+    CMD_FREQ: 2,
+    CMD_RESET: 2,
+    CMD_SWITCH_I2C: 2,
+}
+
+# I2C_M_RD flag of i2c_msg
+I2C_M_RD = 0x0001
+
+
+class DeviceModel:
+    """Register state and command semantics of one DimmerLink"""
+
+    def __init__(self, version=1, frequency=50, interface="i2c",
+                 i2c_addr=DIMMER_ADDR, fade_register=True):
+        """
+        Args:
+            version: Firmware version reported in REG_VERSION
+            frequency: Mains frequency (50 or 60 Hz)
+            interface: Active interface, "i2c" or "uart"
+            i2c_addr: I2C address
+            fade_register: Emulate firmware with REG_FADE_TIME support
+        """
+        self.lock = threading.RLock()
+        self.version = version
+        self.frequency = frequency
+        self.interface = interface
+        self.i2c_addr = i2c_addr
+        self.fade_register = fade_register
+        self.curve = 0            # Kept in EEPROM: survives reset
+        self.reset()
+
+    @property
+    def ac_period(self):
+        """Mains half-period in µs"""
+        return 1000000 // (2 * self.frequency)
+
+    def reset(self):
+        """Reboot: RAM state back to defaults"""
+        with self.lock:
+            self.level = 0
+            self.fade_time = 0
+            self.error = RESP_OK
+            self.calibrated = True
+            self.pointer = 0      # I2C register pointer
+
+    @property
+    def status(self):
+        """REG_STATUS value"""
+        status = STATUS_READY if self.calibrated else 0
+        if self.error != RESP_OK:
+            status |= STATUS_ERROR
+        return status
+
+    # ---- I2C register map ----
+
+    def has_register(self, reg):
+        """False for registers this firmware NACKs"""
+        return reg != REG_FADE_TIME or self.fade_register
+
+    def read_register(self, reg):
+        """Value of one register (write-only and unknown registers read 0)"""
+        with self.lock:
+            if reg == REG_STATUS:
+                return self.status
+            if reg == REG_ERROR:
+                return self.error
+            if reg == REG_VERSION:
+                return self.version
+            if reg == REG_LEVEL:
+                return self.level
+            if reg == REG_CURVE:
+                return self.curve
+            if reg == REG_FADE_TIME:
+                return self.fade_time
+            if reg == REG_FREQ:
+                return self.frequency
+            if reg == REG_PERIOD_L:
+                return self.ac_period & 0xFF
+            if reg == REG_PERIOD_H:
+                return self.ac_period >> 8
+            if reg == REG_CALIB:
+                return 1 if self.calibrated else 0
+            if reg == REG_I2C_ADDR:
+                return self.i2c_addr
+            return 0
+
+    def write_register(self, reg, value):
+        """Apply a register write; invalid values set REG_ERROR"""
+        with self.lock:
+            self.error = RESP_OK
+            if reg == REG_LEVEL:
+                if value > 100:
+                    self.error = RESP_ERR_PARAM
+                else:
+                    self.level = value
+            elif reg == REG_CURVE:
+                if value > 2:
+                    self.error = RESP_ERR_PARAM
+                else:
+                    self.curve = value
+            elif reg == REG_FADE_TIME:
+                self.fade_time = value
+            elif reg == REG_COMMAND:
+                if value == CMD_I2C_RESET:
+                    self.reset()
+                elif value == CMD_I2C_RECALIBRATE:
+                    self.calibrated = True
+                elif value == CMD_I2C_SWITCH_UART:
+                    self.interface = "uart"
+                elif value != 0:
+                    self.error = RESP_ERR_PARAM
+            elif reg == REG_I2C_ADDR:
+                if ADDR_MIN <= value <= ADDR_MAX:
+                    self.i2c_addr = value
+                else:
+                    self.error = RESP_ERR_PARAM
+            else:
+                self.error = RESP_ERR_SYNTAX   # Read-only or unknown register
+
+    # ---- UART protocol ----
+
+    def uart_command(self, frame, eeprom_ok=True):
+        """
+        Execute one complete UART frame
+
+        Args:
+            frame: Command bytes starting with CMD_START
+            eeprom_ok: False to fail a curve write with RESP_ERR_EEPROM
+
+        Returns:
+            bytes: Reply (empty for CMD_RESET)
+        """
+        cmd = frame[1]
+        with self.lock:
+            if cmd in (CMD_SET, CMD_GET, CMD_CURVE, CMD_GETCURVE) and frame[2] != 0:
+                return bytes([RESP_ERR_INDEX])
+            if cmd == CMD_SET:
+                if frame[3] > 100:
+                    return bytes([RESP_ERR_PARAM])
+                self.level = frame[3]
+                return bytes([RESP_OK])
+            if cmd == CMD_GET:
+                return bytes([RESP_OK, self.level])
+            if cmd == CMD_CURVE:
+                if frame[3] > 2:
+                    return bytes([RESP_ERR_PARAM])
+                if not eeprom_ok:
+                    return bytes([RESP_ERR_EEPROM])
+                self.curve = frame[3]
+                return bytes([RESP_OK])
+            if cmd == CMD_GETCURVE:
+                return bytes([RESP_OK, self.curve])
+            if cmd == CMD_FREQ:
+                return bytes([RESP_OK, self.frequency])
+            if cmd == CMD_RESET:
+                self.reset()
+                return b""
+            if cmd == CMD_SWITCH_I2C:
+                self.interface = "i2c"
+                return bytes([RESP_OK])
+            return bytes([RESP_ERR_SYNTAX])
+
+
+class _Faults:
+    """Latency, jitter and fault injection shared by both emulators"""
+
+    def __init__(self, latency, jitter, drop_rate, corrupt_rate, seed):
+        self.latency = latency
+        self.jitter = jitter
+        self.drop_rate = drop_rate
+        self.corrupt_rate = corrupt_rate
+        self.random = random.Random(seed)
+
+    def delay(self):
+        """Sleep for one response time"""
+        t = self.latency
+        if self.jitter:
+            t += self.random.uniform(0, self.jitter)
+        if t > 0:
+            time.sleep(t)
+
+    def hit(self, rate):
+        """True with probability `rate`"""
+        return rate > 0 and self.random.random() < rate
+
+
+class UartEmulator:
+    """DimmerLink UART firmware on a pseudo-terminal"""
+
+    def __init__(self, model=None, latency=0.0, jitter=0.0, drop_rate=0.0,
+                 corrupt_rate=0.0, eeprom_fail_rate=0.0, seed=None):
+        """
+        Args:
+            model: DeviceModel (default: new device in UART mode)
+            latency: Response time in seconds
+            jitter: Extra random response time, 0..jitter seconds
+            drop_rate: Probability that a reply is never sent
+            corrupt_rate: Probability that a reply byte is corrupted
+            eeprom_fail_rate: Probability of RESP_ERR_EEPROM on curve writes
+            seed: Random seed for reproducible faults
+        """
+        self.model = model if model is not None else DeviceModel(interface="uart")
+        self.faults = _Faults(latency, jitter, drop_rate, corrupt_rate, seed)
+        self.eeprom_fail_rate = eeprom_fail_rate
+        self.port = None
+        self._master = self._slave = None
+        self._thread = None
+        self._running = False
+
+        self.frames = 0           # Complete frames received
+        self.dropped = 0          # Replies withheld by fault injection
+
+    def start(self):
+        """Create the PTY and start answering; returns self"""
+        import tty
+
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._slave)
+        self.port = os.ttyname(self._slave)
+        self._running = True
+        self._thread = threading.Thread(
+            target=self._run, name="dimmerlink-uart-emu", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop answering and close the PTY"""
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        for fd in (self._master, self._slave):
+            if fd is not None:
+                os.close(fd)
+        self._master = self._slave = None
+
+    def __enter__(self):
+        """Support for context manager (with statement)"""
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Automatic stop on exit from with"""
+        self.stop()
+
+    def _run(self):
+        """Emulator thread: split the byte stream into frames and answer"""
+        import select
+
+        buf = bytearray()
+        while self._running:
+            ready, _, _ = select.select([self._master], [], [], 0.05)
+            if not ready:
+                continue
+            try:
+                buf += os.read(self._master, 256)
+            except OSError:
+                return
+            while buf:
+                if buf[0] != CMD_START:
+                    del buf[0]                  # Firmware waits for START
+                    continue
+                if len(buf) < 2:
+                    break
+                need = FRAME_LENGTHS.get(buf[1], 2)
+                if len(buf) < need:
+                    break
+                frame = bytes(buf[:need])
+                del buf[:need]
+                self._answer(frame)
+
+    def _answer(self, frame):
+        """Execute one frame and send its (possibly faulty) reply"""
+        self.frames += 1
+        if self.model.interface != "uart":
+            return                              # UART disabled
+        eeprom_ok = not self.faults.hit(self.eeprom_fail_rate)
+        reply = self.model.uart_command(frame, eeprom_ok)
+        if not reply:
+            return
+        self.faults.delay()
+        if self.faults.hit(self.faults.drop_rate):
+            self.dropped += 1
+            return
+        if self.faults.hit(self.faults.corrupt_rate):
+            reply = bytearray(reply)
+            i = self.faults.random.randrange(len(reply))
+            reply[i] ^= self.faults.random.randrange(1, 256)
+            reply = bytes(reply)
+        os.write(self._master, reply)
+
+
+class FakeSMBus:
+    """In-memory stand-in for smbus2.SMBus with DimmerLink devices on it"""
+
+    def __init__(self, bus=1, devices=None, latency=0.0, jitter=0.0,
+                 nack_rate=0.0, seed=None):
+        """
+        Args:
+            bus: Bus number (ignored, for SMBus signature compatibility)
+            devices: List of DeviceModel (default: one device at 0x50)
+            latency: Time per transaction in seconds
+            jitter: Extra random time per transaction, 0..jitter seconds
+            nack_rate: Probability that a transaction is NACKed
+            seed: Random seed for reproducible faults
+        """
+        self.devices = list(devices) if devices is not None else [DeviceModel()]
+        self.faults = _Faults(latency, jitter, 0.0, 0.0, seed)
+        self.nack_rate = nack_rate
+        self.fd = None
+        self.transactions = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """Nothing to release"""
+
+    def _device(self, addr, reg=None):
+        """Device answering at addr, after latency and NACK injection"""
+        self.transactions += 1
+        self.faults.delay()
+        for dev in self.devices:
+            if dev.i2c_addr == addr and dev.interface == "i2c":
+                if self.faults.hit(self.nack_rate) or (reg is not None and not dev.has_register(reg)):
+                    break
+                return dev
+        raise OSError(errno.EREMOTEIO, os.strerror(errno.EREMOTEIO))
+
+    def write_quick(self, i2c_addr, force=None):
+        self._device(i2c_addr)
+
+    def read_byte(self, i2c_addr, force=None):
+        dev = self._device(i2c_addr)
+        with dev.lock:
+            value = dev.read_register(dev.pointer)
+            dev.pointer = (dev.pointer + 1) & 0xFF
+            return value
+
+    def write_byte(self, i2c_addr, value, force=None):
+        dev = self._device(i2c_addr)
+        dev.pointer = value
+
+    def read_byte_data(self, i2c_addr, register, force=None):
+        return self._device(i2c_addr, register).read_register(register)
+
+    def write_byte_data(self, i2c_addr, register, value, force=None):
+        self._device(i2c_addr, register).write_register(register, value)
+
+    def read_i2c_block_data(self, i2c_addr, register, length, force=None):
+        dev = self._device(i2c_addr, register)
+        with dev.lock:
+            return [dev.read_register((register + i) & 0xFF) for i in range(length)]
+
+    def write_i2c_block_data(self, i2c_addr, register, data, force=None):
+        dev = self._device(i2c_addr, register)
+        with dev.lock:
+            for i, value in enumerate(data):
+                dev.write_register((register + i) & 0xFF, value)
+
+    def i2c_rdwr(self, *i2c_msgs):
+        """Combined transaction: write segments set the register pointer"""
+        import ctypes
+
+        for msg in i2c_msgs:
+            if msg.flags & I2C_M_RD:
+                dev = self._device(msg.addr)
+                with dev.lock:
+                    data = bytes(dev.read_register((dev.pointer + i) & 0xFF)
+                                 for i in range(msg.len))
+                    dev.pointer = (dev.pointer + msg.len) & 0xFF
+                ctypes.memmove(msg.buf, data, msg.len)
+            else:
+                data = bytes(msg)
+                dev = self._device(msg.addr, data[0] if data else None)
+                with dev.lock:
+                    if data:
+                        dev.pointer = data[0]
+                    for value in data[1:]:
+                        dev.write_register(dev.pointer, value)
+                        dev.pointer = (dev.pointer + 1) & 0xFF
+
+
+# =============================================================
+# Command line: run a UART emulator until Ctrl+C
+# =============================================================
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="DimmerLink UART emulator on a PTY")
+    parser.add_argument("--latency", type=float, default=1.0, help="response time, ms")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random time, ms")
+    parser.add_argument("--drop", type=float, default=0.0, help="dropped replies, %%")
+    parser.add_argument("--corrupt", type=float, default=0.0, help="corrupted replies, %%")
+    parser.add_argument("--eeprom-fail", type=float, default=0.0, help="EEPROM errors, %%")
+    parser.add_argument("--freq", type=int, default=50, choices=(50, 60))
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    emu = UartEmulator(
+        DeviceModel(frequency=args.freq, interface="uart"),
+        latency=args.latency / 1000, jitter=args.jitter / 1000,
+        drop_rate=args.drop / 100, corrupt_rate=args.corrupt / 100,
+        eeprom_fail_rate=args.eeprom_fail / 100, seed=args.seed,
+    )
+    with emu:
+        print(f"DimmerLink UART emulator on {emu.port}")
+        print(f"  python uart_example.py {emu.port}")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            print(f"\n{emu.frames} frames, {emu.dropped} replies dropped")
+
+
+if __name__ == "__main__":
+    main()
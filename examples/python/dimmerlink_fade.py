@@ -0,0 +1,496 @@
+#!/usr/bin/env python3
+"""
+DimmerLink - Deadline-scheduled software fades
+
+Host-stepped fades that end on time regardless of bus latency. The
+level is computed from a monotonic clock at every step rather than by
+sleeping a fixed delay after each write, so write latency is absorbed
+instead of accumulated: a 2 s fade takes 2 s even on a loaded Pi. When
+the host falls behind, intermediate levels are skipped.
+
+A fade running in the background can be cancelled or retargeted at any
+time; retargeting continues smoothly from the last written level.
+
+FadeEngine runs one fade per thread. FadeScheduler drives any number
+of dimmers from a single timer thread with a priority queue of
+next-step deadlines; steps that fall in the same tick are written in
+one pass.
+
+Usage:
+    from i2c_example import DimmerLink
+    from dimmerlink_fade import FadeEngine
+
+    with DimmerLink() as dimmer:
+        engine = FadeEngine(dimmer)
+        engine.start(100, duration=3.0)     # returns immediately
+        time.sleep(1)
+        engine.retarget(20, duration=1.0)   # change of plan
+        engine.wait()
+
+Works with any object that has set_level(level) and get_level().
+
+Documentation: https://rbdimmer.com/docs/
+"""
+
+import heapq
+import itertools
+import threading
+import time
+
+
+def fade_level(start, target, elapsed, duration):
+    """
+    Level a linear fade should be at
+
+    Args:
+        start: Start brightness (0-100)
+        target: Target brightness (0-100)
+        elapsed: Seconds since the fade began
+        duration: Fade length in seconds
+
+    Returns:
+        int: Brightness 0-100%
+    """
+    if elapsed >= duration:
+        return target
+    if elapsed <= 0:
+        return start
+    # Truncate towards start: level start+k is reached at k/steps of
+    # duration (the epsilon keeps exact step deadlines from rounding down)
+    done = int(abs(target - start) * elapsed / duration + 1e-9)
+    return start + done if target > start else start - done
+
+
+def next_step_time(start, target, level, duration):
+    """
+    Time (since fade start) at which the level next changes
+
+    Args:
+        start: Start brightness (0-100)
+        target: Target brightness (0-100)
+        level: Current brightness of the fade
+        duration: Fade length in seconds
+
+    Returns:
+        float: Seconds since fade start, or None if the fade is complete
+    """
+    steps = abs(target - start)
+    if level == target or steps == 0:
+        return None
+    return duration * (abs(level - start) + 1) / steps
+
+
+class FadeEngine:
+    """Drift-free software fade for one dimmer"""
+
+    def __init__(self, dimmer, clock=time.monotonic):
+        """
+        Args:
+            dimmer: DimmerLink instance (UART or I2C)
+            clock: Monotonic time source in seconds
+        """
+        self.dimmer = dimmer
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._cancelled = False
+        self._start = self._target = self._level = None
+        self._t0 = 0.0
+        self._duration = 0.0
+
+        self.writes = 0          # set_level calls made
+        self.skipped = 0         # Intermediate levels skipped to stay on time
+        self.overrun = 0.0       # How late the last fade finished (seconds)
+
+    @property
+    def active(self):
+        """True while a background fade is running"""
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def level(self):
+        """Last level written by the engine (None before the first write)"""
+        return self._level
+
+    def run(self, target, duration=1.0, start=None):
+        """
+        Fade in the calling thread (blocking)
+
+        Args:
+            target: Target brightness 0-100%
+            duration: Transition time in seconds
+            start: Start brightness (default: read from the device)
+
+        Returns:
+            bool: True if the target was reached, False if cancelled
+
+        Raises:
+            ValueError: If target or start not in range 0-100
+        """
+        if not 0 <= target <= 100:
+            raise ValueError(f"Target must be 0-100, got {target}")
+        if start is not None and not 0 <= start <= 100:
+            raise ValueError(f"Start must be 0-100, got {start}")
+
+        with self._lock:
+            self._cancelled = False
+            self._wake.clear()
+            if start is None:
+                # Device is already there: no need to write it again
+                start = self.dimmer.get_level()
+                self._level = start
+            else:
+                self._level = None
+            if start is None:
+                start = target
+            self._start = start
+            self._target = target
+            self._duration = max(0.0, duration)
+            self._t0 = self.clock()
+        return self._loop()
+
+    def start(self, target, duration=1.0, start=None):
+        """
+        Fade in a background thread (returns immediately)
+
+        A fade already running is retargeted instead.
+
+        Args:
+            target: Target brightness 0-100%
+            duration: Transition time in seconds
+            start: Start brightness (default: read from the device)
+        """
+        if self.active:
+            self.retarget(target, duration)
+            return
+        if not 0 <= target <= 100:
+            raise ValueError(f"Target must be 0-100, got {target}")
+        self._thread = threading.Thread(
+            target=self.run, args=(target, duration, start),
+            name="dimmerlink-fade", daemon=True,
+        )
+        self._thread.start()
+
+    def retarget(self, target, duration=1.0):
+        """
+        Change the target of a running fade
+
+        The fade continues from the last written level and reaches the
+        new target `duration` seconds from now.
+
+        Args:
+            target: Target brightness 0-100%
+            duration: Transition time in seconds
+        """
+        if not 0 <= target <= 100:
+            raise ValueError(f"Target must be 0-100, got {target}")
+        with self._lock:
+            if self._level is not None:
+                self._start = self._level
+            self._target = target
+            self._duration = max(0.0, duration)
+            self._t0 = self.clock()
+        self._wake.set()
+
+    def cancel(self):
+        """Stop the running fade at its current level"""
+        with self._lock:
+            self._cancelled = True
+        self._wake.set()
+
+    def wait(self, timeout=None):
+        """
+        Wait for the background fade to finish
+
+        Returns:
+            bool: True if no fade is running anymore
+        """
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        return not self.active
+
+    def _loop(self):
+        """Write levels on their deadlines until done or cancelled"""
+        while True:
+            with self._lock:
+                if self._cancelled:
+                    return False
+                self._wake.clear()
+                start, target = self._start, self._target
+                t0, duration = self._t0, self._duration
+
+            now = self.clock()
+            level = fade_level(start, target, now - t0, duration)
+            if level != self._level:
+                if self._level is not None:
+                    self.skipped += max(0, abs(level - self._level) - 1)
+                self.dimmer.set_level(level)
+                self._level = level
+                self.writes += 1
+
+            step = next_step_time(start, target, level, duration)
+            if step is None:
+                if self._wake.is_set():
+                    continue        # Retargeted while writing the last step
+                self.overrun = max(0.0, self.clock() - (t0 + duration))
+                return True
+
+            # Sleep until the next deadline, waking early on retarget/cancel
+            delay = t0 + step - self.clock()
+            if delay > 0:
+                self._wake.wait(delay)
+
+
+class _Fade:
+    """State of one scheduled fade"""
+
+    __slots__ = ("start", "target", "t0", "duration", "level", "gen")
+
+    def __init__(self, start, target, t0, duration, level, gen):
+        self.start = start
+        self.target = target
+        self.t0 = t0
+        self.duration = duration
+        self.level = level
+        self.gen = gen
+
+
+class FadeScheduler:
+    """Drift-free software fades for many dimmers on one thread"""
+
+    def __init__(self, tick=0.005, write_levels=None, clock=time.monotonic):
+        """
+        Create the scheduler (call start() or use `with`)
+
+        Args:
+            tick: Steps due within this many seconds of each other are
+                  merged into one pass
+            write_levels: Optional callable taking {dimmer: level} to
+                          write a whole pass at once (e.g. a batched bus
+                          write); default calls set_level() per dimmer
+            clock: Monotonic time source in seconds
+        """
+        self.tick = tick
+        self.clock = clock
+        self._write_levels = write_levels
+        self._cond = threading.Condition()
+        self._fades = {}          # dimmer -> _Fade (one per active fade)
+        self._heap = []           # (deadline, seq, gen, dimmer)
+        self._seq = itertools.count()
+        self._busy = False        # A pass is being written (outside the lock)
+        self._thread = None
+        self._running = False
+
+        self.writes = 0           # Levels written
+        self.passes = 0           # Write passes (one per tick with work)
+        self.skipped = 0          # Intermediate levels skipped to stay on time
+        self.errors = 0           # Failed writes
+
+    @property
+    def active(self):
+        """Number of fades in progress"""
+        with self._cond:
+            return len(self._fades)
+
+    def start(self):
+        """Start the timer thread"""
+        with self._cond:
+            if self._running:
+                return self
+            self._running = True
+        self._thread = threading.Thread(
+            target=self._run, name="dimmerlink-fades", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the timer thread; running fades stay at their current level"""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        """Support for context manager (with statement)"""
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Stop on exit from with"""
+        self.stop()
+
+    def fade(self, dimmer, target, duration=1.0, start=None):
+        """
+        Start (or retarget) a fade
+
+        Args:
+            dimmer: DimmerLink instance
+            target: Target brightness 0-100%
+            duration: Transition time in seconds
+            start: Start brightness (default: level of the running fade,
+                   else read from the device; nothing is kept per dimmer
+                   once its fade ends, so memory follows active fades).
+                   Pass it when dimmers are write_levels keys rather
+                   than DimmerLink instances.
+
+        Raises:
+            ValueError: If target or start not in range 0-100
+        """
+        if not 0 <= target <= 100:
+            raise ValueError(f"Target must be 0-100, got {target}")
+        if start is not None and not 0 <= start <= 100:
+            raise ValueError(f"Start must be 0-100, got {start}")
+
+        with self._cond:
+            running = self._fades.get(dimmer)
+            known = running.level if running is not None else None
+        if start is None and known is None:
+            known = dimmer.get_level()          # Device I/O outside the lock
+
+        with self._cond:
+            if start is None:
+                start = known if known is not None else target
+                level = known
+            else:
+                level = None                    # Start level must be written
+            gen = next(self._seq)
+            t0 = self.clock()
+            self._fades[dimmer] = _Fade(start, target, t0, max(0.0, duration), level, gen)
+            heapq.heappush(self._heap, (t0, gen, gen, dimmer))
+            self._compact()
+            self._cond.notify_all()
+
+    def cancel(self, dimmer):
+        """
+        Stop a fade at its current level
+
+        Returns:
+            bool: True if a fade was running
+        """
+        with self._cond:
+            fade = self._fades.pop(dimmer, None)
+            self._cond.notify_all()
+            return fade is not None
+
+    def cancel_all(self):
+        """Stop every fade at its current level"""
+        with self._cond:
+            self._fades.clear()
+            self._heap.clear()
+            self._cond.notify_all()
+
+    def wait(self, dimmer=None, timeout=None):
+        """
+        Wait for fades to finish
+
+        Args:
+            dimmer: Wait for this dimmer only (default: all fades)
+            timeout: Maximum wait in seconds (None = forever)
+
+        Returns:
+            bool: True if the fade(s) finished
+        """
+        if dimmer is None:
+            done = lambda: not self._fades and not self._busy
+        else:
+            done = lambda: dimmer not in self._fades and not self._busy
+        with self._cond:
+            return self._cond.wait_for(done, timeout)
+
+    def _compact(self):
+        """Drop heap entries of retargeted/cancelled fades (lock held)"""
+        if len(self._heap) > 2 * len(self._fades) + 16:
+            self._heap = [e for e in self._heap
+                          if e[3] in self._fades and self._fades[e[3]].gen == e[2]]
+            heapq.heapify(self._heap)
+
+    def _collect(self, now):
+        """Advance every fade due by now + tick (lock held)"""
+        batch = {}
+        horizon = now + self.tick
+        heap = self._heap
+        while heap and heap[0][0] <= horizon:
+            deadline, _, gen, dimmer = heapq.heappop(heap)
+            fade = self._fades.get(dimmer)
+            if fade is None or fade.gen != gen:
+                continue                        # Retargeted or cancelled
+            # Steps slightly in the future are merged into this pass;
+            # steps in the past are computed at `now` to catch up.
+            t = max(now, deadline)
+            level = fade_level(fade.start, fade.target, t - fade.t0, fade.duration)
+            if level != fade.level:
+                if fade.level is not None:
+                    self.skipped += max(0, abs(level - fade.level) - 1)
+                fade.level = level
+                batch[dimmer] = level
+            step = next_step_time(fade.start, fade.target, level, fade.duration)
+            if step is None:
+                del self._fades[dimmer]
+            else:
+                heapq.heappush(heap, (fade.t0 + step, next(self._seq), gen, dimmer))
+        return batch
+
+    def _write(self, batch):
+        """Write one pass of levels (lock not held)"""
+        if self._write_levels is not None:
+            try:
+                self._write_levels(batch)
+                return 0
+            except Exception:
+                return len(batch)
+        errors = 0
+        for dimmer, level in batch.items():
+            try:
+                if dimmer.set_level(level) is False:
+                    errors += 1
+            except Exception:
+                errors += 1
+        return errors
+
+    def _run(self):
+        """Timer thread: sleep until the earliest deadline, write due steps"""
+        while True:
+            with self._cond:
+                while True:
+                    if not self._running:
+                        return
+                    now = self.clock()
+                    if self._heap and self._heap[0][0] <= now + self.tick:
+                        batch = self._collect(now)
+                        if batch:
+                            self._busy = True
+                            break
+                        self._cond.notify_all()     # Fades may have ended
+                        continue
+                    self._cond.wait(self._heap[0][0] - now if self._heap else None)
+
+            errors = self._write(batch)
+
+            with self._cond:
+                self._busy = False
+                self.writes += len(batch) - errors
+                self.errors += errors
+                self.passes += 1
+                self._cond.notify_all()
+
+
+def run_fade(dimmer, target, duration=1.0, start=None):
+    """
+    Fade one dimmer on time (blocking)
+
+    Args:
+        dimmer: DimmerLink instance
+        target: Target brightness 0-100%
+        duration: Transition time in seconds
+        start: Start brightness (default: read from the device)
+
+    Returns:
+        FadeEngine: Engine used, for its writes/skipped/overrun counters
+    """
+    engine = FadeEngine(dimmer)
+    engine.run(target, duration, start)
+    return engine
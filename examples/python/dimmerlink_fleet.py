@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+DimmerLink - Fleet manager for many I2C dimmers
+
+One DimmerLinkFleet owns every /dev/i2c-N handle used by an
+installation. Each bus is opened once and shared by all devices on it
+behind a lock, so threads can no longer interleave transactions. Each
+bus also gets its own worker thread, so bulk updates run on all buses
+in parallel: a 50-dimmer installation is updated in one pass per bus.
+
+Within a pass, level writes are packed into combined I2C_RDWR
+transactions (write_batch): one kernel call carries up to 42 register
+writes, to one device or to many addresses on the same bus, instead of
+one write_byte_data ioctl per dimmer.
+
+Usage:
+    from dimmerlink_fleet import DimmerLinkFleet
+
+    with DimmerLinkFleet() as fleet:
+        fleet.add(0x50)                 # bus 1
+        fleet.add(0x51)
+        fleet.add(0x50, bus=3)          # same address, other bus
+        fleet.set_levels({0x51: 80, (1, 0x50): 20, (3, 0x50): 100})
+        print(fleet.get_levels())
+
+    # Fades on all dimmers, one batched pass per tick:
+    #   FadeScheduler(write_levels=fleet.set_levels)
+
+Documentation: https://rbdimmer.com/docs/
+"""
+
+import errno
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from smbus2 import SMBus, i2c_msg
+
+from dimmerlink_protocol import REG_LEVEL, check_address, check_level
+from i2c_example import DimmerLink
+
+# Kernel limit on messages per I2C_RDWR call (I2C_RDWR_IOCTL_MAX_MSGS)
+RDWR_MAX_MSGS = 42
+
+
+def write_batch(bus, writes):
+    """
+    Write many registers in as few kernel calls as possible
+
+    Each (addr, reg, value) becomes one i2c_msg segment of a combined
+    I2C_RDWR transaction (repeated START between segments).
+
+    Example - hardware fade programmed in a single call:
+        write_batch(dimmer.bus, [(dimmer.addr, REG_FADE_TIME, 20),
+                                 (dimmer.addr, REG_LEVEL, 80)])
+
+    Args:
+        bus: SMBus (or LockedBus) handle
+        writes: Iterable of (addr, reg, value)
+
+    Returns:
+        int: Number of kernel calls made
+
+    Raises:
+        OSError: If a device NACKs or the adapter lacks I2C_RDWR support;
+                 segments before the failing one may have been written
+    """
+    msgs = [i2c_msg.write(addr, (reg, value)) for addr, reg, value in writes]
+    calls = 0
+    for i in range(0, len(msgs), RDWR_MAX_MSGS):
+        bus.i2c_rdwr(*msgs[i:i + RDWR_MAX_MSGS])
+        calls += 1
+    return calls
+
+
+class LockedBus:
+    """SMBus shared between threads: every call holds the bus lock"""
+
+    def __init__(self, bus):
+        """
+        Args:
+            bus: Open SMBus (or compatible) object
+        """
+        self._bus = bus
+        self.lock = threading.RLock()
+        self.rdwr = True          # Cleared if the adapter rejects I2C_RDWR
+
+    def __getattr__(self, name):
+        attr = getattr(self._bus, name)
+        if not callable(attr):
+            return attr
+
+        lock = self.lock
+
+        def locked(*args, **kwargs):
+            with lock:
+                return attr(*args, **kwargs)
+
+        # Cache the wrapper so later calls skip __getattr__
+        setattr(self, name, locked)
+        return locked
+
+
+class DimmerLinkFleet:
+    """Many DimmerLinks on one or more I2C buses"""
+
+    def __init__(self, bus_factory=SMBus):
+        """
+        Args:
+            bus_factory: Callable opening a bus by number (default SMBus)
+        """
+        self._bus_factory = bus_factory
+        self._lock = threading.Lock()
+        self._buses = {}          # bus number -> LockedBus
+        self._workers = {}        # bus number -> single-thread executor
+        self._devices = {}        # (bus, addr) -> DimmerLink
+        self._bus_of = {}         # DimmerLink -> bus number
+
+    def __enter__(self):
+        """Support for context manager (with statement)"""
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Automatic close on exit from with"""
+        self.close()
+
+    def __len__(self):
+        return len(self._devices)
+
+    def __iter__(self):
+        return iter(list(self._devices.items()))
+
+    def __contains__(self, key):
+        try:
+            self._resolve(key)
+            return True
+        except KeyError:
+            return False
+
+    def __getitem__(self, key):
+        return self._resolve(key)
+
+    def bus(self, bus_number):
+        """
+        Get the shared handle of a bus, opening it on first use
+
+        Args:
+            bus_number: I2C bus number (/dev/i2c-N)
+
+        Returns:
+            LockedBus: Shared bus handle
+        """
+        with self._lock:
+            bus = self._buses.get(bus_number)
+            if bus is None:
+                bus = LockedBus(self._bus_factory(bus_number))
+                self._buses[bus_number] = bus
+                self._workers[bus_number] = ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix=f"dimmerlink-i2c-{bus_number}"
+                )
+            return bus
+
+    def add(self, addr, bus=1):
+        """
+        Register a device
+
+        Args:
+            addr: Device I2C address (0x08-0x77)
+            bus: I2C bus number (default 1)
+
+        Returns:
+            DimmerLink: Device sharing the fleet's bus handle
+
+        Raises:
+            ValueError: If address out of range or already registered
+        """
+        check_address(addr)
+        if (bus, addr) in self._devices:
+            raise ValueError(f"Device 0x{addr:02X} on bus {bus} already registered")
+
+        dimmer = DimmerLink(addr=addr, bus=self.bus(bus))
+        with self._lock:
+            self._devices[(bus, addr)] = dimmer
+            self._bus_of[dimmer] = bus
+        return dimmer
+
+    def remove(self, key):
+        """
+        Unregister a device (the bus stays open)
+
+        Args:
+            key: Address, (bus, address) or DimmerLink
+        """
+        dimmer = self._resolve(key)
+        with self._lock:
+            bus = self._bus_of.pop(dimmer)
+            del self._devices[(bus, dimmer.addr)]
+
+    def _resolve(self, key):
+        """
+        Find a device by address, (bus, address) or DimmerLink
+
+        Raises:
+            KeyError: If not registered, or an address is on several buses
+        """
+        if isinstance(key, DimmerLink):
+            if key not in self._bus_of:
+                raise KeyError(key)
+            return key
+        if isinstance(key, tuple):
+            return self._devices[key]
+        matches = [d for (_, addr), d in self._devices.items() if addr == key]
+        if len(matches) != 1:
+            raise KeyError(f"0x{key:02X} is on {len(matches)} buses, use (bus, addr)"
+                           if matches else key)
+        return matches[0]
+
+    def _run_per_bus(self, items, job):
+        """
+        Run job(bus, [(dimmer, arg), ...]) on every bus worker in parallel
+
+        Returns:
+            list: Results of the per-bus jobs
+        """
+        per_bus = {}
+        for dimmer, arg in items:
+            per_bus.setdefault(self._bus_of[dimmer], []).append((dimmer, arg))
+        futures = [
+            self._workers[bus].submit(job, self._buses[bus], group)
+            for bus, group in per_bus.items()
+        ]
+        return [f.result() for f in futures]
+
+    @staticmethod
+    def _write_group(bus, group):
+        """Worker: write levels to every device of one bus in one lock hold"""
+        failed = {}
+        with bus.lock:
+            if bus.rdwr:
+                try:
+                    write_batch(bus, [(d.addr, REG_LEVEL, lvl) for d, lvl in group])
+                    return failed
+                except OSError as e:
+                    # Adapter is SMBus-only: stop trying. Anything else
+                    # (NACK): retry one by one to find who failed.
+                    if e.errno in (errno.EOPNOTSUPP, errno.EINVAL):
+                        bus.rdwr = False
+            for dimmer, level in group:
+                try:
+                    dimmer.set_level(level)
+                except OSError as e:
+                    failed[dimmer] = e
+        return failed
+
+    @staticmethod
+    def _read_group(bus, group):
+        """Worker: read levels from every device of one bus"""
+        levels = {}
+        with bus.lock:
+            for dimmer, _ in group:
+                try:
+                    levels[dimmer] = dimmer.get_level()
+                except OSError:
+                    levels[dimmer] = None
+        return levels
+
+    def set_levels(self, levels):
+        """
+        Set brightness of many devices, all buses in parallel
+
+        Each bus is written with combined I2C_RDWR transactions; if one
+        fails, that bus falls back to a write per device.
+
+        Args:
+            levels: {key: level}, key being an address, (bus, address)
+                    or DimmerLink
+
+        Returns:
+            dict: {DimmerLink: OSError} for devices that failed (empty
+                  if all writes succeeded)
+
+        Raises:
+            KeyError: If a key is not registered
+            ValueError: If a level not in range 0-100
+        """
+        items = []
+        for key, level in levels.items():
+            check_level(level)
+            items.append((self._resolve(key), level))
+
+        failed = {}
+        for result in self._run_per_bus(items, self._write_group):
+            failed.update(result)
+        return failed
+
+    def get_levels(self, keys=None):
+        """
+        Read brightness of many devices, all buses in parallel
+
+        Args:
+            keys: Devices to read (default: all)
+
+        Returns:
+            dict: {(bus, addr): level or None on error}
+        """
+        dimmers = list(self._bus_of) if keys is None else [self._resolve(k) for k in keys]
+        levels = {}
+        for result in self._run_per_bus([(d, None) for d in dimmers], self._read_group):
+            for dimmer, level in result.items():
+                levels[(self._bus_of[dimmer], dimmer.addr)] = level
+        return levels
+
+    def close(self):
+        """Stop bus workers and close every bus"""
+        with self._lock:
+            for worker in self._workers.values():
+                worker.shutdown(wait=True)
+            for bus in self._buses.values():
+                bus.close()
+            self._workers.clear()
+            self._buses.clear()
+            self._devices.clear()
+            self._bus_of.clear()
+
+
+# =============================================================
+# Usage example
+# =============================================================
+
+def main():
+    import sys
+    import time
+
+    addrs = [int(a, 0) for a in sys.argv[1:]] or [0x50]
+
+    with DimmerLinkFleet() as fleet:
+        for addr in addrs:
+            fleet.add(addr)
+
+        print(f"Fleet of {len(fleet)} dimmer(s)")
+        for level in (0, 50, 100, 0):
+            failed = fleet.set_levels({addr: level for addr in addrs})
+            print(f"  All -> {level}%  ({len(failed)} failed)")
+            time.sleep(1)
+
+        print(fleet.get_levels())
+
+
+if __name__ == "__main__":
+    main()
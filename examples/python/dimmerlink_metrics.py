@@ -0,0 +1,497 @@
+#!/usr/bin/env python3
+"""
+DimmerLink - Transaction hooks, latency histograms and metrics export
+
+Every bus round trip of the Python drivers (an SMBus call on I2C, a
+command frame and its reply on UART) can be reported to a hook:
+
+    hook.before(txn)    # txn.op, txn.reg, txn.data filled in
+    hook.after(txn)     # + txn.reply, txn.elapsed_ns, txn.error
+
+Hooks are registered per driver with add_hook()/remove_hook(). Without
+hooks the drivers run exactly as before: the UART drivers check a
+single attribute per command, and the I2C driver only swaps its bus
+for a HookedBus while a hook is registered.
+
+MetricsHook records an HDR-style latency histogram per operation and
+renders them in the Prometheus text format; serve_metrics() exposes
+that on http://host:port/metrics.
+
+Usage:
+    from i2c_example import DimmerLink
+    from dimmerlink_metrics import MetricsHook, serve_metrics
+
+    metrics = MetricsHook()
+    dimmer = DimmerLink()
+    dimmer.add_hook(metrics)
+    serve_metrics(metrics, port=9464)
+
+    dimmer.set_level(50)
+    print(metrics.latency[("i2c", "write_byte_data")].percentile(99))
+
+    # Batched fleet writes: instrument the shared buses instead
+    #   DimmerLinkFleet(bus_factory=lambda n: HookedBus(SMBus(n), metrics))
+
+⚠️ Hooks run inline on the driver's thread (fleet: on every bus worker):
+   keep them short and don't raise from them.
+
+Documentation: https://rbdimmer.com/docs/
+"""
+
+import threading
+import time
+
+from dimmerlink_protocol import REPLY_LENGTHS, RESP_OK, ERROR_MESSAGES
+
+# Transaction.error of a UART command that got no reply
+TIMEOUT = "timeout"
+
+# smbus2 i2c_msg flag of read segments
+I2C_M_RD = 0x0001
+
+
+class Transaction:
+    """One bus round trip, as seen by hooks"""
+
+    __slots__ = ("transport", "addr", "op", "reg", "data", "reply",
+                 "start_ns", "elapsed_ns", "error")
+
+    def __init__(self, transport, addr, op, reg=None, data=b""):
+        self.transport = transport    # "uart" or "i2c"
+        self.addr = addr              # I2C address, or serial port name
+        self.op = op                  # SMBus method or UART command name
+        self.reg = reg                # Register, or UART command byte
+        self.data = data              # Bytes sent (after the register)
+        self.reply = b""              # Bytes received
+        self.start_ns = 0             # perf_counter_ns() at start
+        self.elapsed_ns = 0           # Round-trip time
+        self.error = None             # Exception, error text or TIMEOUT
+
+    def __repr__(self):
+        reg = "" if self.reg is None else f" reg=0x{self.reg:02X}"
+        return (f"<Transaction {self.transport} {self.addr!r} {self.op}{reg} "
+                f"data={self.data.hex()} reply={self.reply.hex()} "
+                f"{self.elapsed_ns / 1000:.1f}µs error={self.error!r}>")
+
+
+class Hook:
+    """Base class for hooks (both methods optional to override)"""
+
+    def before(self, txn):
+        """Called just before the transaction goes on the bus"""
+
+    def after(self, txn):
+        """Called when the transaction completed or failed"""
+
+
+class HookChain(Hook):
+    """Several hooks registered on one driver, called in order"""
+
+    def __init__(self, hooks):
+        self.hooks = tuple(hooks)
+
+    def before(self, txn):
+        for hook in self.hooks:
+            hook.before(txn)
+
+    def after(self, txn):
+        for hook in self.hooks:
+            hook.after(txn)
+
+
+def chain_hooks(current, hook):
+    """
+    Add a hook to a driver's hook slot
+
+    The chain is rebuilt rather than modified, so threads that already
+    picked up the old value keep a consistent view.
+
+    Returns:
+        New value for the slot
+    """
+    if current is None:
+        return hook
+    hooks = current.hooks if isinstance(current, HookChain) else (current,)
+    return HookChain(hooks + (hook,))
+
+
+def unchain_hooks(current, hook):
+    """
+    Remove a hook from a driver's hook slot
+
+    Returns:
+        New value for the slot (None when no hooks are left)
+
+    Raises:
+        ValueError: If the hook is not registered
+    """
+    hooks = list(current.hooks if isinstance(current, HookChain) else
+                 (current,) if current is not None else ())
+    hooks.remove(hook)
+    if not hooks:
+        return None
+    return hooks[0] if len(hooks) == 1 else HookChain(hooks)
+
+
+def traced(hook, txn, inspect, call, *args, **kwargs):
+    """
+    Run one bus call with before/after hooks and timing
+
+    Args:
+        hook: Hook (or HookChain)
+        txn: Transaction describing the call
+        inspect: inspect(txn, result) fills reply/error (or None)
+        call: The bus call itself
+
+    Returns:
+        Whatever call returned (exceptions are re-raised)
+    """
+    hook.before(txn)
+    clock = time.perf_counter_ns
+    start = txn.start_ns = clock()
+    try:
+        result = call(*args, **kwargs)
+    except Exception as e:
+        txn.elapsed_ns = clock() - start
+        txn.error = e
+        hook.after(txn)
+        raise
+    txn.elapsed_ns = clock() - start
+    if inspect is not None:
+        inspect(txn, result)
+    hook.after(txn)
+    return result
+
+
+def inspect_uart(txn, resp):
+    """inspect() for UART commands: resp is (status, value) or None"""
+    if resp is None:
+        if REPLY_LENGTHS.get(txn.reg):
+            txn.error = TIMEOUT
+        return
+    status, value = resp
+    txn.reply = bytes((status,)) if value is None else bytes((status, value))
+    if status != RESP_OK:
+        txn.error = ERROR_MESSAGES.get(status, f"Unknown error 0x{status:02X}")
+
+
+def _inspect_byte(txn, value):
+    txn.reply = bytes((value,))
+
+
+def _inspect_block(txn, values):
+    txn.reply = bytes(values)
+
+
+class HookedBus:
+    """SMBus proxy reporting every transaction to a hook"""
+
+    def __init__(self, bus, hook=None):
+        """
+        Args:
+            bus: Open SMBus (or LockedBus, FakeSMBus) object
+            hook: Hook receiving the transactions
+        """
+        self.bus = bus
+        self.hook = hook
+
+    def __getattr__(self, name):
+        """Everything that is not a transaction goes straight to the bus"""
+        return getattr(self.bus, name)
+
+    def _run(self, txn, inspect, call, *args, **kwargs):
+        hook = self.hook
+        if hook is None:
+            return call(*args, **kwargs)
+        return traced(hook, txn, inspect, call, *args, **kwargs)
+
+    def write_quick(self, i2c_addr, *args, **kwargs):
+        return self._run(Transaction("i2c", i2c_addr, "write_quick"), None,
+                         self.bus.write_quick, i2c_addr, *args, **kwargs)
+
+    def read_byte(self, i2c_addr, *args, **kwargs):
+        return self._run(Transaction("i2c", i2c_addr, "read_byte"), _inspect_byte,
+                         self.bus.read_byte, i2c_addr, *args, **kwargs)
+
+    def write_byte(self, i2c_addr, value, *args, **kwargs):
+        return self._run(Transaction("i2c", i2c_addr, "write_byte", None, bytes((value,))),
+                         None, self.bus.write_byte, i2c_addr, value, *args, **kwargs)
+
+    def read_byte_data(self, i2c_addr, register, *args, **kwargs):
+        return self._run(Transaction("i2c", i2c_addr, "read_byte_data", register),
+                         _inspect_byte, self.bus.read_byte_data,
+                         i2c_addr, register, *args, **kwargs)
+
+    def write_byte_data(self, i2c_addr, register, value, *args, **kwargs):
+        return self._run(Transaction("i2c", i2c_addr, "write_byte_data", register,
+                                     bytes((value,))),
+                         None, self.bus.write_byte_data,
+                         i2c_addr, register, value, *args, **kwargs)
+
+    def read_i2c_block_data(self, i2c_addr, register, length, *args, **kwargs):
+        return self._run(Transaction("i2c", i2c_addr, "read_i2c_block_data", register),
+                         _inspect_block, self.bus.read_i2c_block_data,
+                         i2c_addr, register, length, *args, **kwargs)
+
+    def write_i2c_block_data(self, i2c_addr, register, data, *args, **kwargs):
+        return self._run(Transaction("i2c", i2c_addr, "write_i2c_block_data", register,
+                                     bytes(data)),
+                         None, self.bus.write_i2c_block_data,
+                         i2c_addr, register, data, *args, **kwargs)
+
+    def i2c_rdwr(self, *msgs):
+        hook = self.hook
+        if hook is None:
+            return self.bus.i2c_rdwr(*msgs)
+        txn = Transaction("i2c", msgs[0].addr if msgs else None, "i2c_rdwr", None,
+                          b"".join(bytes(m) for m in msgs if not m.flags & I2C_M_RD))
+        reads = [m for m in msgs if m.flags & I2C_M_RD]
+
+        def inspect(txn, _):
+            # Read segments are filled in by the call
+            txn.reply = b"".join(bytes(m) for m in reads)
+
+        return traced(hook, txn, inspect, self.bus.i2c_rdwr, *msgs)
+
+
+# =============================================================
+# Latency histogram
+# =============================================================
+
+class LatencyHistogram:
+    """
+    Log-linear histogram of non-negative integers (HDR style)
+
+    Values below 2**sub_bucket_bits are counted exactly; above that each
+    power-of-two range is split into 2**(sub_bucket_bits - 1) equal
+    buckets, so any recorded value is known to within
+    2**-(sub_bucket_bits - 1) (about 6% with the default 5 bits) while
+    the histogram covers nanoseconds to hours in a few hundred buckets.
+    """
+
+    def __init__(self, sub_bucket_bits=5):
+        if sub_bucket_bits < 2:
+            raise ValueError("sub_bucket_bits must be at least 2")
+        self.sub_bucket_bits = sub_bucket_bits
+        self._half = 1 << (sub_bucket_bits - 1)
+        self.counts = []
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def _index(self, value):
+        shift = value.bit_length() - self.sub_bucket_bits
+        if shift <= 0:
+            return value
+        return shift * self._half + (value >> shift)
+
+    def bucket_range(self, index):
+        """
+        Values counted by a bucket
+
+        Returns:
+            tuple: (lowest, highest) value, inclusive
+        """
+        if index < 2 * self._half:
+            return index, index
+        shift = index // self._half - 1
+        mantissa = index - shift * self._half
+        return mantissa << shift, ((mantissa + 1) << shift) - 1
+
+    def record(self, value, count=1):
+        """Add a value (e.g. a latency in ns)"""
+        value = int(value)
+        if value < 0:
+            raise ValueError(f"Value must be >= 0, got {value}")
+        index = self._index(value)
+        counts = self.counts
+        if index >= len(counts):
+            counts.extend([0] * (index + 1 - len(counts)))
+        counts[index] += count
+        self.count += count
+        self.total += value * count
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def percentile(self, p):
+        """
+        Value at or below which p% of the recorded values fall
+
+        Returns the highest value of the matching bucket (capped at the
+        largest recorded value), so the result never under-reports.
+
+        Returns:
+            int: Value, or None if nothing was recorded
+        """
+        if not self.count:
+            return None
+        rank = max(1, -(-self.count * p // 100))
+        seen = 0
+        for index, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return min(self.bucket_range(index)[1], self.max)
+        return self.max
+
+    def buckets(self):
+        """Yield (lowest, highest, count) of every non-empty bucket"""
+        for index, n in enumerate(self.counts):
+            if n:
+                low, high = self.bucket_range(index)
+                yield low, high, n
+
+    def reset(self):
+        """Forget all recorded values"""
+        self.counts = []
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+
+# =============================================================
+# Metrics hook and Prometheus exposition
+# =============================================================
+
+class MetricsHook(Hook):
+    """Latency histograms and outcome counters per (transport, op)"""
+
+    QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+    def __init__(self, sub_bucket_bits=5):
+        """
+        Args:
+            sub_bucket_bits: Histogram precision (see LatencyHistogram)
+        """
+        self.sub_bucket_bits = sub_bucket_bits
+        self._lock = threading.Lock()
+        self.latency = {}         # (transport, op) -> LatencyHistogram (ns)
+        self.outcomes = {}        # (transport, op, outcome) -> count
+        self.bytes = {}           # (transport, "tx"/"rx") -> count
+
+    def after(self, txn):
+        error = txn.error
+        if error is None:
+            outcome = "ok"
+        elif error is TIMEOUT:
+            outcome = "timeout"
+        else:
+            outcome = "error"
+        key = (txn.transport, txn.op)
+        with self._lock:
+            hist = self.latency.get(key)
+            if hist is None:
+                hist = self.latency[key] = LatencyHistogram(self.sub_bucket_bits)
+            hist.record(txn.elapsed_ns)
+            okey = key + (outcome,)
+            self.outcomes[okey] = self.outcomes.get(okey, 0) + 1
+            for direction, n in (("tx", len(txn.data)), ("rx", len(txn.reply))):
+                bkey = (txn.transport, direction)
+                self.bytes[bkey] = self.bytes.get(bkey, 0) + n
+
+    def reset(self):
+        """Forget everything recorded so far"""
+        with self._lock:
+            self.latency.clear()
+            self.outcomes.clear()
+            self.bytes.clear()
+
+    def exposition(self, prefix="dimmerlink"):
+        """
+        Render all metrics in the Prometheus text format (version 0.0.4)
+
+        Returns:
+            str: Text for a /metrics endpoint
+        """
+        lines = []
+        with self._lock:
+            name = f"{prefix}_transaction_seconds"
+            lines += [f"# HELP {name} Bus round-trip time per operation",
+                      f"# TYPE {name} summary"]
+            for (transport, op), hist in sorted(self.latency.items()):
+                labels = f'transport="{transport}",op="{op}"'
+                for q in self.QUANTILES:
+                    lines.append(f'{name}{{{labels},quantile="{q}"}} '
+                                 f"{hist.percentile(q * 100) / 1e9:.9f}")
+                lines.append(f"{name}_sum{{{labels}}} {hist.total / 1e9:.9f}")
+                lines.append(f"{name}_count{{{labels}}} {hist.count}")
+
+            name = f"{prefix}_transactions_total"
+            lines += [f"# HELP {name} Bus transactions by outcome",
+                      f"# TYPE {name} counter"]
+            for (transport, op, outcome), n in sorted(self.outcomes.items()):
+                lines.append(f'{name}{{transport="{transport}",op="{op}",'
+                             f'outcome="{outcome}"}} {n}')
+
+            name = f"{prefix}_bytes_total"
+            lines += [f"# HELP {name} Payload bytes sent and received",
+                      f"# TYPE {name} counter"]
+            for (transport, direction), n in sorted(self.bytes.items()):
+                lines.append(f'{name}{{transport="{transport}",direction="{direction}"}} {n}')
+        return "\n".join(lines) + "\n"
+
+
+def serve_metrics(hook, port=9464, host=""):
+    """
+    Serve hook.exposition() on http://host:port/metrics
+
+    Runs in a daemon thread; stop it with server.shutdown().
+
+    Returns:
+        ThreadingHTTPServer: The running server
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            body = hook.exposition().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="dimmerlink-metrics",
+                     daemon=True).start()
+    return server
+
+
+# =============================================================
+# Usage example
+# =============================================================
+
+def main():
+    import sys
+    from i2c_example import DimmerLink
+
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 9464
+    metrics = MetricsHook()
+    serve_metrics(metrics, port)
+    print(f"Metrics on http://localhost:{port}/metrics (Ctrl+C to stop)")
+
+    with DimmerLink() as dimmer:
+        dimmer.add_hook(metrics)
+        try:
+            while True:
+                for level in range(0, 101, 10):
+                    dimmer.set_level(level)
+                    dimmer.snapshot()
+                    time.sleep(0.1)
+        except KeyboardInterrupt:
+            pass
+
+    print(metrics.exposition())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,486 @@
+"""
+DimmerLink - Protocol core (no I/O)
+
+Everything both interfaces need that does not touch a port: UART
+command and response codes, I2C registers, validation of levels,
+curves, addresses and fade times, the command frames, and a streaming
+response decoder. Drivers call it in their send/receive path; it does
+no I/O and imports nothing, so the same file runs on CPython and on
+MicroPython boards (copy it next to the MicroPython examples, see
+examples/micropython/uart_example.py).
+
+Instead of flushing the input buffer before every command, the driver
+registers each command it sends with the decoder and feeds it whatever
+bytes arrive; the decoder splits the byte stream into replies and
+matches them to commands in the order they were sent.
+
+Reply framing:
+    CMD_SET, CMD_CURVE, CMD_SWITCH_I2C      → 1 byte  (status)
+    CMD_GET, CMD_GETCURVE, CMD_FREQ         → 2 bytes (status, value)
+    CMD_RESET                               → no reply
+    Any error                               → 1 byte  (error code)
+
+Bytes that cannot start a reply (not a known status code) are dropped
+one at a time until the stream lines up again.
+
+RttEstimator turns measured round-trip times into reply timeouts, so a
+driver waits as long as the link needs and no longer.
+
+MicroPython: keep this file free of imports, f-strings with format
+specs, frozenset and slice deletion; they are missing or optional on
+small ports.
+
+Documentation: https://rbdimmer.com/docs/
+"""
+
+# UART commands (all start with 0x02)
+CMD_START       = 0x02    # Start byte (required!)
+CMD_SET         = 0x53    # 'S' - set brightness
+CMD_GET         = 0x47    # 'G' - get brightness
+CMD_CURVE       = 0x43    # 'C' - set curve
+CMD_GETCURVE    = 0x51    # 'Q' - get curve
+CMD_FREQ        = 0x52    # 'R' - get mains frequency
+CMD_RESET       = 0x58    # 'X' - device reset
+CMD_SWITCH_I2C  = 0x5B    # '[' - switch to I2C
+
+# Command names (logs, metrics)
+COMMAND_NAMES = {
+    CMD_SET: "SET",
+    CMD_GET: "GET",
+    CMD_CURVE: "CURVE",
+    CMD_GETCURVE: "GETCURVE",
+    CMD_FREQ: "FREQ",
+    CMD_RESET: "RESET",
+    CMD_SWITCH_I2C: "SWITCH_I2C",
+}
+
+# Response codes
+RESP_OK         = 0x00    # Success
+RESP_ERR_SYNTAX = 0xF9    # Invalid command format
+RESP_ERR_EEPROM = 0xFC    # EEPROM write error
+RESP_ERR_INDEX  = 0xFD    # Invalid dimmer index
+RESP_ERR_PARAM  = 0xFE    # Invalid parameter
+
+# Error descriptions
+ERROR_MESSAGES = {
+    RESP_OK: "OK",
+    RESP_ERR_SYNTAX: "Invalid command format (check START byte 0x02)",
+    RESP_ERR_EEPROM: "EEPROM write error",
+    RESP_ERR_INDEX: "Invalid dimmer index (use 0)",
+    RESP_ERR_PARAM: "Invalid parameter value (level 0-100, curve 0-2)",
+}
+
+# Reply length on success, per command
+REPLY_LENGTHS = {
+    CMD_SET: 1,
+    CMD_GET: 2,
+    CMD_CURVE: 1,
+    CMD_GETCURVE: 2,
+    CMD_FREQ: 2,
+    CMD_RESET: 0,
+    CMD_SWITCH_I2C: 1,
+}
+
+# Bytes that may start a reply
+STATUS_CODES = tuple(ERROR_MESSAGES)
+
+# I2C address of DimmerLink (default 0x50, can be changed)
+DIMMER_ADDR = 0x50
+ADDR_MIN = 0x08       # Valid 7-bit addresses for REG_I2C_ADDR
+ADDR_MAX = 0x77
+
+# I2C registers
+REG_STATUS   = 0x00   # Device status (R)
+REG_COMMAND  = 0x01   # Control commands (W)
+REG_ERROR    = 0x02   # Last error code (R)
+REG_VERSION  = 0x03   # Firmware version (R)
+REG_LEVEL    = 0x10   # Brightness 0-100% (R/W)
+REG_CURVE    = 0x11   # Dimming curve (R/W)
+REG_FADE_TIME = 0x18  # Hardware fade time, 100 ms units (R/W)
+REG_FREQ     = 0x20   # Mains frequency Hz (R)
+REG_PERIOD_L = 0x21   # Mains half-period µs, low byte (R)
+REG_PERIOD_H = 0x22   # Mains half-period µs, high byte (R)
+REG_CALIB    = 0x23   # Calibration done, 1 = yes (R)
+REG_I2C_ADDR = 0x30   # Device I2C address (R/W)
+
+# REG_COMMAND values
+CMD_I2C_RESET       = 0x01
+CMD_I2C_RECALIBRATE = 0x02
+CMD_I2C_SWITCH_UART = 0x03
+
+# REG_STATUS bits
+STATUS_READY = 0x01   # Device ready for commands
+STATUS_ERROR = 0x02   # Error condition (see REG_ERROR)
+
+# Dimming curve types
+CURVE_LINEAR = 0      # Linear (universal)
+CURVE_RMS    = 1      # RMS (incandescent, halogen)
+CURVE_LOG    = 2      # Logarithmic (LED)
+
+# Curve names for output
+CURVE_NAMES = {
+    CURVE_LINEAR: "LINEAR",
+    CURVE_RMS: "RMS",
+    CURVE_LOG: "LOG"
+}
+
+LEVEL_MAX = 100
+
+# Longest hardware fade (REG_FADE_TIME is one byte of 100 ms units)
+FADE_TIME_MAX = 25.5
+
+# Precomputed command frames: every valid command is a shared immutable
+# bytes object, so sending one allocates nothing
+SET_FRAMES = tuple(bytes((CMD_START, CMD_SET, 0x00, level)) for level in range(101))
+CURVE_FRAMES = tuple(bytes((CMD_START, CMD_CURVE, 0x00, curve)) for curve in range(3))
+FRAME_GET = bytes((CMD_START, CMD_GET, 0x00))
+FRAME_GETCURVE = bytes((CMD_START, CMD_GETCURVE, 0x00))
+FRAME_FREQ = bytes((CMD_START, CMD_FREQ))
+FRAME_RESET = bytes((CMD_START, CMD_RESET))
+FRAME_SWITCH_I2C = bytes((CMD_START, CMD_SWITCH_I2C))
+
+
+# =============================================================
+# Validation and encoding
+# =============================================================
+
+def error_message(code):
+    """Description of a response/error code"""
+    msg = ERROR_MESSAGES.get(code)
+    if msg is None:
+        msg = "Unknown error 0x%02X" % code
+    return msg
+
+
+def check_level(level):
+    """
+    Validate a brightness level
+
+    Returns:
+        int: level
+
+    Raises:
+        ValueError: If level not in range 0-100
+    """
+    if not 0 <= level <= LEVEL_MAX:
+        raise ValueError("Level must be 0-100, got %r" % (level,))
+    return level
+
+
+def check_curve(curve_type):
+    """
+    Validate a curve type
+
+    Returns:
+        int: curve_type
+
+    Raises:
+        ValueError: If curve_type not 0, 1 or 2
+    """
+    if curve_type not in CURVE_NAMES:
+        raise ValueError("Curve type must be 0, 1, or 2, got %r" % (curve_type,))
+    return curve_type
+
+
+def check_address(addr):
+    """
+    Validate a 7-bit I2C address for REG_I2C_ADDR
+
+    Returns:
+        int: addr
+
+    Raises:
+        ValueError: If addr not in range 0x08-0x77
+    """
+    if not ADDR_MIN <= addr <= ADDR_MAX:
+        raise ValueError("Address must be 0x08-0x77, got 0x%02X" % addr)
+    return addr
+
+
+def fade_units(seconds):
+    """
+    Convert a fade time to the REG_FADE_TIME value
+
+    Args:
+        seconds: Fade time 0-25.5 s (rounded to 0.1 s)
+
+    Returns:
+        int: 100 ms units, 0-255
+
+    Raises:
+        ValueError: If seconds not in range 0-25.5
+    """
+    units = int(round(seconds * 10))
+    if not 0 <= units <= 255:
+        raise ValueError("Fade time must be 0-%s s, got %r" % (FADE_TIME_MAX, seconds))
+    return units
+
+
+def encode_set(level):
+    """
+    UART frame setting the brightness (shared, never copy or modify it)
+
+    Raises:
+        ValueError: If level not in range 0-100
+    """
+    return SET_FRAMES[check_level(level)]
+
+
+def encode_curve(curve_type):
+    """
+    UART frame setting the dimming curve
+
+    Raises:
+        ValueError: If curve_type not 0, 1 or 2
+    """
+    return CURVE_FRAMES[check_curve(curve_type)]
+
+
+def decode_period(low, high):
+    """Mains half-period in µs from REG_PERIOD_L/REG_PERIOD_H (little-endian)"""
+    return low | (high << 8)
+
+
+class ResponseDecoder:
+    """Match UART replies to outstanding commands in send order"""
+
+    def __init__(self):
+        self._expected = []       # [token, reply_len, expired_at or None]
+        self._buf = bytearray()
+        self._next_token = 0
+        self.garbage = 0          # Bytes dropped while resynchronising
+        self.late = 0             # Replies received after their command expired
+
+    @property
+    def pending(self):
+        """Number of commands still waiting for a reply"""
+        return len(self._expected)
+
+    @property
+    def has_stale(self):
+        """True if an expired command is still waiting for its late reply"""
+        return any(e[2] is not None for e in self._expected)
+
+    def expect(self, cmd, token=None):
+        """
+        Register a command that has been (or is about to be) sent
+
+        Args:
+            cmd: Command byte (CMD_SET, CMD_GET, ...)
+            token: Value returned with the reply (default: sequence number)
+
+        Returns:
+            Token identifying the reply, or None if the command has no reply
+
+        Raises:
+            ValueError: If cmd is not a known command
+        """
+        try:
+            reply_len = REPLY_LENGTHS[cmd]
+        except KeyError:
+            raise ValueError("Unknown command 0x%02X" % cmd)
+        if reply_len == 0:
+            return None
+        if token is None:
+            token = self._next_token
+            self._next_token += 1
+        self._expected.append([token, reply_len, None])
+        return token
+
+    def expire(self, token, now=0.0):
+        """
+        Mark a command as timed out
+
+        The command keeps its place in the queue, so a late reply is
+        absorbed (and counted in `late`) instead of being taken for the
+        reply of the next command.
+
+        Args:
+            token: Token returned by expect()
+            now: Caller's clock, compared against by discard_stale()
+        """
+        for entry in self._expected:
+            if entry[0] == token:
+                entry[2] = now
+                return
+
+    def discard_stale(self, before=None):
+        """
+        Stop waiting for late replies
+
+        Args:
+            before: Only drop commands that expired at or before this
+                    time (default: drop all expired commands at the
+                    head of the queue)
+
+        Returns:
+            int: Number of commands dropped
+        """
+        dropped = 0
+        while self._expected:
+            expired_at = self._expected[0][2]
+            if expired_at is None or (before is not None and expired_at > before):
+                break
+            self._expected.pop(0)
+            dropped += 1
+        if dropped:
+            # A partial reply belonged to a command we gave up on
+            self.garbage += len(self._buf)
+            self._buf = bytearray()
+        return dropped
+
+    def feed(self, data):
+        """
+        Consume received bytes
+
+        Args:
+            data: bytes/bytearray/memoryview received from the port
+
+        Returns:
+            list: (token, status, value) per completed reply, in order;
+                  value is None for 1-byte replies and errors
+        """
+        buf = self._buf
+        buf += data
+        done = []
+        pos = 0
+        end = len(buf)
+        while pos < end:
+            if not self._expected:
+                self.garbage += end - pos   # Nobody asked for these
+                pos = end
+                break
+            status = buf[pos]
+            if status not in STATUS_CODES:
+                self.garbage += 1           # Resynchronise byte by byte
+                pos += 1
+                continue
+            token, reply_len, expired_at = self._expected[0]
+            if status != RESP_OK:
+                reply_len = 1
+            if end - pos < reply_len:
+                break                       # Wait for the rest of the reply
+            value = buf[pos + 1] if reply_len == 2 else None
+            pos += reply_len
+            self._expected.pop(0)
+            if expired_at is None:
+                done.append((token, status, value))
+            else:
+                self.late += 1
+        if pos:
+            buf[:pos] = b""
+        return done
+
+    def reset(self):
+        """Forget all outstanding commands and buffered bytes"""
+        self._expected = []
+        self._buf = bytearray()
+
+
+class RttEstimator:
+    """
+    Reply timeouts from measured round-trip times (TCP RTO style)
+
+    Smoothed RTT and RTT variance are tracked as in RFC 6298 and the
+    timeout is srtt + 4 * rttvar, clamped to [min_timeout, max_timeout]:
+    tens of milliseconds for a DimmerLink on a USB adapter, seconds for
+    one behind a Bluetooth or LoRa bridge.
+
+    Before the first reply the timeout is `initial`. Every timeout
+    doubles the next one (Karn's backoff), but only once the device is
+    known to answer at all. After `fail_after` timeouts in a row the
+    device is presumed gone and commands only wait `probe_timeout`, so a
+    dead port fails in milliseconds; any reply (even a late one) ends
+    that state.
+
+    The caller measures time; this class only does the arithmetic.
+    """
+
+    ALPHA = 0.125             # Gain of srtt
+    BETA = 0.25               # Gain of rttvar
+    K = 4                     # Variance multiplier
+
+    def __init__(self, initial=0.5, min_timeout=0.05, max_timeout=2.0,
+                 fail_after=3, probe_timeout=0.02):
+        """
+        Args:
+            initial: Timeout in seconds until a round trip was measured
+            min_timeout: Lower bound of the timeout
+            max_timeout: Upper bound of the timeout (and of the backoff)
+            fail_after: Consecutive timeouts before the device is
+                        presumed gone
+            probe_timeout: Timeout while presumed gone, if no round trip
+                           was ever measured (else the measured timeout
+                           without backoff is used)
+        """
+        self.initial = initial
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.fail_after = fail_after
+        self.probe_timeout = probe_timeout
+        self.reset()
+
+    def reset(self):
+        """Forget all measurements (e.g. after a device reset)"""
+        self.srtt = None          # Smoothed round-trip time, s
+        self.rttvar = None        # Round-trip time variance, s
+        self.rto = self.initial   # Timeout before backoff, s
+        self.backoff = 1          # Karn backoff multiplier
+        self.failures = 0         # Consecutive timeouts
+        self.alive = False        # Device has answered at least once
+        self.samples = 0          # Round trips measured
+        self.timeouts = 0         # Timeouts reported
+
+    @property
+    def presumed_dead(self):
+        """True after fail_after consecutive timeouts"""
+        return self.failures >= self.fail_after
+
+    @property
+    def timeout(self):
+        """Seconds to wait for the next reply"""
+        if self.presumed_dead:
+            if self.srtt is None:
+                return self.probe_timeout
+            return self.rto
+        return min(self.rto * self.backoff, self.max_timeout)
+
+    def sample(self, rtt):
+        """
+        Report the round-trip time of a command that got its reply
+
+        Args:
+            rtt: Seconds from sending the command to its reply
+        """
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar += self.BETA * (abs(self.srtt - rtt) - self.rttvar)
+            self.srtt += self.ALPHA * (rtt - self.srtt)
+        rto = self.srtt + self.K * self.rttvar
+        self.rto = min(max(rto, self.min_timeout), self.max_timeout)
+        self.backoff = 1
+        self.failures = 0
+        self.alive = True
+        self.samples += 1
+
+    def timed_out(self):
+        """Report a command whose reply did not arrive in time"""
+        self.failures += 1
+        self.timeouts += 1
+        if self.alive and self.rto * self.backoff < self.max_timeout:
+            self.backoff *= 2
+
+    def late_reply(self):
+        """
+        Report a reply that arrived after its command timed out
+
+        The device is alive but slower than the timeout; the backoff
+        stays, so the next commands wait longer. Late replies are not
+        used as samples (Karn's algorithm).
+        """
+        self.failures = 0
+        if not self.alive:
+            self.alive = True
+            self.backoff = 2
@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+"""
+DimmerLink - Binary traffic recorder and replayer
+
+Recorder is a transaction hook (see dimmerlink_metrics.py) that logs
+every UART command/reply and every I2C transaction of a driver to a
+ring file mapped with mmap:
+
+    header   64 bytes   magic, version, record size, capacity,
+                        wall clock / monotonic clock at creation
+    records  48 bytes   fixed size, slot = seq % capacity
+
+Recording a transaction is one struct.pack_into() into the mapping:
+no lock, no system call, no print. Slots are claimed with an atomic
+counter, so several threads (fleet bus workers) can record at once.
+The kernel writes the pages back to the file, so the log survives a
+crash of the recording process. When the ring is full the oldest
+records are overwritten.
+
+Replayer sends recorded traffic to the emulator or to a real device,
+keeping the original spacing between transactions.
+
+Usage:
+    from i2c_example import DimmerLink
+    from dimmerlink_recorder import Recorder
+
+    with Recorder("dimmer.rec") as rec:
+        dimmer = DimmerLink()
+        dimmer.add_hook(rec)
+        ...
+
+Command line:
+    python dimmerlink_recorder.py dump dimmer.rec
+    python dimmerlink_recorder.py replay dimmer.rec                # emulator
+    python dimmerlink_recorder.py replay dimmer.rec --bus 1        # real I2C
+    python dimmerlink_recorder.py replay dimmer.rec --port /dev/ttyUSB0
+
+Documentation: https://rbdimmer.com/docs/
+"""
+
+import itertools
+import mmap
+import os
+import struct
+import time
+from collections import namedtuple
+
+from dimmerlink_metrics import Hook, TIMEOUT
+from dimmerlink_protocol import CMD_START, COMMAND_NAMES, RESP_OK
+
+MAGIC = b"DLREC\x00\x00\x01"
+VERSION = 1
+
+# magic, version, record size, capacity, wall ns, monotonic ns (at creation)
+HEADER = struct.Struct("<8sHHIqq")
+HEADER_SIZE = 64
+
+# seq+1 (0 = empty slot), monotonic start ns, elapsed ns, transport, op,
+# addr, reg, flags, outcome, tx len, rx len, tx data, rx data
+RECORD = struct.Struct("<QqIBBBBBBBB10s10s")
+DATA_MAX = 10                 # Bytes kept per direction (lengths are exact)
+
+DEFAULT_CAPACITY = 65536      # Records (3 MB file)
+
+TRANSPORTS = ("uart", "i2c")
+OUTCOMES = ("ok", "timeout", "error")
+
+# Operation codes: SMBus methods, then UART commands
+OPS = (
+    "write_quick", "read_byte", "write_byte", "read_byte_data",
+    "write_byte_data", "read_i2c_block_data", "write_i2c_block_data",
+    "i2c_rdwr",
+) + tuple(COMMAND_NAMES.values())
+OP_CODES = {name: code for code, name in enumerate(OPS)}
+OP_UNKNOWN = 0xFF
+
+# Record.flags
+FLAG_REG = 0x01               # reg field is valid
+
+Record = namedtuple("Record", (
+    "seq", "t_ns", "elapsed_ns", "transport", "op", "addr", "reg",
+    "outcome", "tx_len", "rx_len", "data", "reply",
+))
+
+
+class Recorder(Hook):
+    """Transaction hook writing fixed-size records to an mmap ring file"""
+
+    def __init__(self, path, capacity=DEFAULT_CAPACITY):
+        """
+        Open or create a ring file
+
+        An existing file with the same layout is appended to; its
+        capacity takes precedence over the argument.
+
+        Args:
+            path: Ring file path
+            capacity: Number of records the ring holds (new files)
+
+        Raises:
+            ValueError: If the file exists but is not a recorder file
+        """
+        self.path = path
+        exists = os.path.exists(path) and os.path.getsize(path) >= HEADER_SIZE
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if exists:
+                head = HEADER.unpack(os.pread(self._fd, HEADER.size, 0))
+                if head[0] != MAGIC or head[2] != RECORD.size:
+                    raise ValueError(f"{path} is not a DimmerLink recorder file")
+                capacity = head[3]
+            else:
+                os.ftruncate(self._fd, HEADER_SIZE + capacity * RECORD.size)
+                os.pwrite(self._fd, HEADER.pack(MAGIC, VERSION, RECORD.size, capacity,
+                                                time.time_ns(), time.monotonic_ns()), 0)
+            self._map = mmap.mmap(self._fd, HEADER_SIZE + capacity * RECORD.size)
+        except Exception:
+            os.close(self._fd)
+            raise
+
+        self.capacity = capacity
+        first = max((r.seq for r in _iter_records(self._map, capacity)), default=-1) + 1
+        self._seq = itertools.count(first)
+        # Transactions are timed with perf_counter_ns(); records use the
+        # system-wide monotonic clock so sessions line up
+        self._offset = time.monotonic_ns() - time.perf_counter_ns()
+
+    def __enter__(self):
+        """Support for context manager (with statement)"""
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Automatic close on exit from with"""
+        self.close()
+
+    def after(self, txn):
+        """Hook: record a completed transaction"""
+        seq = next(self._seq)         # Atomic under the GIL: our own slot
+        error = txn.error
+        outcome = 0 if error is None else 1 if error is TIMEOUT else 2
+        reg = txn.reg
+        data = txn.data
+        reply = txn.reply
+        RECORD.pack_into(
+            self._map, HEADER_SIZE + (seq % self.capacity) * RECORD.size,
+            seq + 1,
+            txn.start_ns + self._offset,
+            min(txn.elapsed_ns, 0xFFFFFFFF),
+            txn.transport == "i2c",
+            OP_CODES.get(txn.op, OP_UNKNOWN),
+            txn.addr if type(txn.addr) is int else 0,
+            0 if reg is None else reg,
+            0 if reg is None else FLAG_REG,
+            outcome,
+            min(len(data), 0xFF),
+            min(len(reply), 0xFF),
+            bytes(data[:DATA_MAX]),
+            bytes(reply[:DATA_MAX]),
+        )
+
+    def records(self):
+        """Records currently in the ring, oldest first"""
+        return sorted(_iter_records(self._map, self.capacity))
+
+    def flush(self):
+        """Write dirty pages back to the file now"""
+        self._map.flush()
+
+    def close(self):
+        """Flush and unmap the file"""
+        if self._map is not None:
+            self._map.flush()
+            self._map.close()
+            os.close(self._fd)
+            self._map = None
+
+
+def _iter_records(buf, capacity):
+    """Decode the non-empty slots of a ring"""
+    for raw in RECORD.iter_unpack(memoryview(buf)[HEADER_SIZE:HEADER_SIZE + capacity * RECORD.size]):
+        if raw[0]:
+            yield _decode(raw)
+
+
+def _decode(raw):
+    (seq, t_ns, elapsed, transport, op, addr, reg, flags, outcome,
+     tx_len, rx_len, data, reply) = raw
+    return Record(
+        seq - 1, t_ns, elapsed, TRANSPORTS[transport],
+        OPS[op] if op < len(OPS) else None, addr,
+        reg if flags & FLAG_REG else None, OUTCOMES[outcome],
+        tx_len, rx_len, data[:min(tx_len, DATA_MAX)], reply[:min(rx_len, DATA_MAX)],
+    )
+
+
+def read_file(path):
+    """
+    Read a ring file (while it is being recorded, too)
+
+    Returns:
+        tuple: (header dict, records oldest first)
+
+    Raises:
+        ValueError: If the file is not a recorder file
+    """
+    with open(path, "rb") as f:
+        buf = f.read()
+    magic, version, size, capacity, wall_ns, mono_ns = HEADER.unpack_from(buf)
+    if magic != MAGIC or size != RECORD.size:
+        raise ValueError(f"{path} is not a DimmerLink recorder file")
+    header = {"version": version, "capacity": capacity,
+              "wall_ns": wall_ns, "monotonic_ns": mono_ns}
+    return header, sorted(_iter_records(buf, capacity))
+
+
+# =============================================================
+# Replay
+# =============================================================
+
+class Replayer:
+    """Send recorded transactions to a device with the recorded timing"""
+
+    def __init__(self, uart=None, bus=None, speed=1.0, max_gap=None,
+                 clock=time.monotonic, sleep=time.sleep):
+        """
+        Args:
+            uart: uart_example.DimmerLink receiving UART records
+            bus: SMBus (or FakeSMBus) receiving I2C records
+            speed: Time scale (2.0 = twice as fast)
+            max_gap: Longest idle wait in seconds (None = exact timing)
+            clock: Monotonic time source in seconds
+            sleep: Sleep function
+        """
+        self.uart = uart
+        self.bus = bus
+        self.speed = speed
+        self.max_gap = max_gap
+        self.clock = clock
+        self.sleep = sleep
+
+        self.sent = 0             # Transactions replayed
+        self.skipped = 0          # No target, or not replayable (i2c_rdwr)
+        self.mismatched = 0       # Reply or outcome differs from the recording
+        self.max_late = 0.0       # Worst start delay vs schedule, seconds
+
+    def replay(self, records):
+        """
+        Replay records (oldest first); blocks until done
+
+        Returns:
+            list: (record, reply, error) for transactions whose result
+                  differs from the recording
+        """
+        diffs = []
+        start = self.clock()
+        offset = 0.0
+        prev_ns = None
+        for rec in records:
+            if prev_ns is not None:
+                gap = (rec.t_ns - prev_ns) / 1e9 / self.speed
+                offset += gap if self.max_gap is None else min(gap, self.max_gap)
+            prev_ns = rec.t_ns
+
+            due = start + offset
+            delay = due - self.clock()
+            if delay > 0:
+                self.sleep(delay)
+            else:
+                self.max_late = max(self.max_late, -delay)
+
+            call = self._uart_call(rec) if rec.transport == "uart" else self._i2c_call(rec)
+            if call is None:
+                self.skipped += 1
+                continue
+            try:
+                reply, error = call()
+            except Exception as e:
+                reply, error = b"", e
+            self.sent += 1
+
+            outcome = ("ok" if error is None else
+                       "timeout" if error is TIMEOUT else "error")
+            if outcome != rec.outcome or (outcome == "ok" and reply[:DATA_MAX] != rec.reply):
+                self.mismatched += 1
+                diffs.append((rec, reply, error))
+        return diffs
+
+    def _uart_call(self, rec):
+        if self.uart is None or rec.tx_len > DATA_MAX:
+            return None
+        cmd = next((c for c, n in COMMAND_NAMES.items() if n == rec.op), None)
+        if cmd is None:
+            return None
+        frame = bytes((CMD_START, cmd)) + rec.data
+
+        def call():
+            resp = self.uart._transact(frame)
+            if resp is None:
+                return b"", TIMEOUT if rec.rx_len else None
+            status, value = resp
+            reply = bytes((status,)) if value is None else bytes((status, value))
+            return reply, None if status == RESP_OK else f"status 0x{status:02X}"
+        return call
+
+    def _i2c_call(self, rec):
+        bus = self.bus
+        if bus is None or rec.tx_len > DATA_MAX:
+            return None
+        addr, reg, data, op = rec.addr, rec.reg, rec.data, rec.op
+        if op == "write_quick":
+            return lambda: _written(bus.write_quick(addr))
+        if op == "read_byte":
+            return lambda: (bytes((bus.read_byte(addr),)), None)
+        if op == "write_byte":
+            return lambda: _written(bus.write_byte(addr, data[0]))
+        if op == "read_byte_data":
+            return lambda: (bytes((bus.read_byte_data(addr, reg),)), None)
+        if op == "write_byte_data":
+            return lambda: _written(bus.write_byte_data(addr, reg, data[0]))
+        if op == "read_i2c_block_data":
+            return lambda: (bytes(bus.read_i2c_block_data(addr, reg, rec.rx_len)), None)
+        if op == "write_i2c_block_data":
+            return lambda: _written(bus.write_i2c_block_data(addr, reg, list(data)))
+        # i2c_rdwr: segment boundaries are not recorded
+        return None
+
+
+def _written(_):
+    """Result of a replayed write: nothing received, no error"""
+    return b"", None
+
+
+# =============================================================
+# Command line
+# =============================================================
+
+def format_record(rec, t0_ns):
+    """One line per record for dump"""
+    reg = "  " if rec.reg is None else f"{rec.reg:02X}"
+    addr = "--" if rec.transport == "uart" else f"{rec.addr:02X}"
+    tx = rec.data.hex() + ("…" if rec.tx_len > DATA_MAX else "")
+    rx = rec.reply.hex() + ("…" if rec.rx_len > DATA_MAX else "")
+    return (f"{rec.seq:>8} {(rec.t_ns - t0_ns) / 1e6:>12.3f} ms {rec.elapsed_ns / 1000:>9.1f} µs "
+            f"{rec.transport:<4} {addr} {rec.op or '?':<20} {reg} "
+            f"tx={tx or '-':<22} rx={rx or '-':<22} {rec.outcome}")
+
+
+def main():
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="DimmerLink traffic recorder tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("dump", help="print a ring file")
+    p.add_argument("file")
+    p = sub.add_parser("replay", help="replay a ring file")
+    p.add_argument("file")
+    p.add_argument("--port", help="real UART port (default: emulator)")
+    p.add_argument("--bus", type=int, help="real I2C bus (default: emulator)")
+    p.add_argument("--speed", type=float, default=1.0, help="time scale")
+    p.add_argument("--max-gap", type=float, help="cap idle waits, s")
+    args = parser.parse_args()
+
+    header, records = read_file(args.file)
+    if args.command == "dump":
+        t0 = records[0].t_ns if records else 0
+        start = time.localtime((header["wall_ns"] + t0 - header["monotonic_ns"]) / 1e9)
+        print(f"{args.file}: {len(records)} record(s), capacity {header['capacity']}, "
+              f"first at {time.strftime('%Y-%m-%d %H:%M:%S', start)}")
+        for rec in records:
+            print(format_record(rec, t0))
+        return
+
+    import contextlib
+    from dimmerlink_emulator import UartEmulator, FakeSMBus, DeviceModel
+
+    with contextlib.ExitStack() as stack:
+        uart = bus = None
+        if any(r.transport == "uart" for r in records):
+            from uart_example import DimmerLink
+            port = args.port or stack.enter_context(UartEmulator()).port
+            uart = stack.enter_context(DimmerLink(port))
+        if any(r.transport == "i2c" for r in records):
+            if args.bus is not None:
+                from smbus2 import SMBus
+                bus = stack.enter_context(SMBus(args.bus))
+            else:
+                addrs = sorted({r.addr for r in records if r.transport == "i2c"})
+                bus = FakeSMBus(devices=[DeviceModel(i2c_addr=a) for a in addrs])
+
+        replayer = Replayer(uart, bus, speed=args.speed, max_gap=args.max_gap)
+        diffs = replayer.replay(records)
+
+    t0 = records[0].t_ns if records else 0
+    for rec, reply, error in diffs:
+        print(f"{format_record(rec, t0)}\n{'':>8} replayed: rx={reply.hex() or '-'} "
+              f"error={error!r}")
+    print(f"Replayed {replayer.sent}, skipped {replayer.skipped}, "
+          f"mismatched {replayer.mismatched}, worst lateness "
+          f"{replayer.max_late * 1000:.2f} ms", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+DimmerLink - I2C bus scanner
+
+Replaces running `i2cdetect` by hand: every /dev/i2c-N bus is scanned
+in parallel (one thread per bus), each address 0x08-0x77 that ACKs is
+fingerprinted with the status/version/level/frequency registers, and
+the result is an inventory that can be turned into a DimmerLinkFleet
+directly. A full scan of an idle bus takes a few tens of milliseconds,
+so it can run at every service start.
+
+Addresses are probed like `i2cdetect` does by default: a read byte in
+the EEPROM ranges 0x30-0x37 and 0x50-0x5F (where a quick write could
+change a write-protect bit), a quick write elsewhere.
+
+Usage:
+    from dimmerlink_scan import scan, fleet_from_scan
+
+    inventory = scan()
+    for found in inventory.dimmers:
+        print(found.bus, hex(found.addr), found.state.frequency)
+
+    fleet = fleet_from_scan(inventory)
+
+Command line:
+    python dimmerlink_scan.py               # all buses
+    python dimmerlink_scan.py --bus 1 --json
+
+Documentation: https://rbdimmer.com/docs/
+"""
+
+import glob
+import re
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from smbus2 import SMBus
+
+from dimmerlink_protocol import ADDR_MIN, ADDR_MAX, CURVE_NAMES, STATUS_READY, STATUS_ERROR
+from i2c_example import read_state
+
+# Valid 7-bit addresses (same range as REG_I2C_ADDR accepts)
+ADDR_FIRST = ADDR_MIN
+ADDR_LAST = ADDR_MAX
+
+# Ranges where i2cdetect probes with a read instead of a quick write
+READ_PROBE_RANGES = ((0x30, 0x37), (0x50, 0x5F))
+
+FoundDimmer = namedtuple("FoundDimmer", ("bus", "addr", "state"))
+Inventory = namedtuple("Inventory", ("dimmers", "other", "buses", "errors", "seconds"))
+Inventory.__doc__ = """Result of scan()
+
+dimmers: FoundDimmer list, sorted by (bus, addr)
+other:   (bus, addr) of devices that ACK but are not DimmerLinks
+buses:   Bus numbers scanned
+errors:  {bus: OSError} for buses that could not be opened
+seconds: Scan duration
+"""
+
+
+def list_buses():
+    """
+    I2C bus numbers present on this system
+
+    Returns:
+        list: Sorted bus numbers from /dev/i2c-*
+    """
+    buses = []
+    for path in glob.glob("/dev/i2c-*"):
+        match = re.fullmatch(r"/dev/i2c-(\d+)", path)
+        if match:
+            buses.append(int(match.group(1)))
+    return sorted(buses)
+
+
+def probe(bus, addr):
+    """
+    Check whether a device ACKs at addr (i2cdetect auto mode)
+
+    Returns:
+        bool: True if something answered
+    """
+    try:
+        if any(lo <= addr <= hi for lo, hi in READ_PROBE_RANGES):
+            bus.read_byte(addr)
+        else:
+            bus.write_quick(addr)
+        return True
+    except OSError:
+        return False
+
+
+def looks_like_dimmerlink(state):
+    """
+    Plausibility check of a register snapshot
+
+    Other chips answer the same block reads with arbitrary data; a
+    DimmerLink has only the READY/ERROR status bits, level 0-100,
+    curve 0-2, and 50/60 Hz mains (0 while still calibrating).
+    """
+    if state.status & ~(STATUS_READY | STATUS_ERROR):
+        return False
+    if state.level > 100 or state.curve not in CURVE_NAMES:
+        return False
+    if state.frequency in (50, 60):
+        return True
+    return state.frequency == 0 and not state.calibrated
+
+
+def scan_bus(bus, bus_number=None, addrs=None):
+    """
+    Scan one open bus
+
+    Args:
+        bus: Open SMBus (or compatible) object
+        bus_number: Reported in the results
+        addrs: Addresses to probe (default 0x08-0x77)
+
+    Returns:
+        tuple: (FoundDimmer list, list of other ACKing addresses)
+    """
+    dimmers = []
+    other = []
+    for addr in addrs if addrs is not None else range(ADDR_FIRST, ADDR_LAST + 1):
+        if not probe(bus, addr):
+            continue
+        try:
+            state = read_state(bus, addr)
+        except OSError:
+            state = None
+        if state is not None and looks_like_dimmerlink(state):
+            dimmers.append(FoundDimmer(bus_number, addr, state))
+        else:
+            other.append(addr)
+    return dimmers, other
+
+
+def scan(buses=None, addrs=None, bus_factory=SMBus):
+    """
+    Scan I2C buses in parallel for DimmerLinks
+
+    Args:
+        buses: Bus numbers (default: every /dev/i2c-N)
+        addrs: Addresses to probe on each bus (default 0x08-0x77)
+        bus_factory: Callable opening a bus by number (default SMBus)
+
+    Returns:
+        Inventory: Found dimmers, other devices, per-bus errors, duration
+    """
+    start = time.monotonic()
+    buses = list_buses() if buses is None else list(buses)
+
+    def job(number):
+        try:
+            bus = bus_factory(number)
+        except OSError as e:
+            return number, None, e
+        try:
+            return number, scan_bus(bus, number, addrs), None
+        finally:
+            bus.close()
+
+    dimmers, other, errors = [], [], {}
+    if buses:
+        with ThreadPoolExecutor(max_workers=len(buses),
+                                thread_name_prefix="dimmerlink-scan") as pool:
+            for number, result, error in pool.map(job, buses):
+                if error is not None:
+                    errors[number] = error
+                    continue
+                found, others = result
+                dimmers += found
+                other += [(number, addr) for addr in others]
+
+    return Inventory(sorted(dimmers), sorted(other), buses, errors,
+                     time.monotonic() - start)
+
+
+def fleet_from_scan(inventory, fleet=None):
+    """
+    Register every DimmerLink of an inventory in a fleet
+
+    Args:
+        inventory: Result of scan()
+        fleet: DimmerLinkFleet to add to (default: a new one)
+
+    Returns:
+        DimmerLinkFleet: The fleet
+    """
+    if fleet is None:
+        from dimmerlink_fleet import DimmerLinkFleet
+        fleet = DimmerLinkFleet()
+    for found in inventory.dimmers:
+        if (found.bus, found.addr) not in fleet:
+            fleet.add(found.addr, bus=found.bus)
+    return fleet
+
+
+# =============================================================
+# Command line
+# =============================================================
+
+def main(argv=None):
+    import argparse
+    import json
+    import sys
+
+    parser = argparse.ArgumentParser(description="Find DimmerLinks on the I2C buses")
+    parser.add_argument("--bus", type=int, action="append",
+                        help="bus number (repeatable, default: all /dev/i2c-*)")
+    parser.add_argument("--json", action="store_true", help="machine-readable output")
+    args = parser.parse_args(argv)
+
+    inventory = scan(args.bus)
+
+    if args.json:
+        print(json.dumps({
+            "dimmers": [dict(bus=d.bus, addr=d.addr, **d.state._asdict())
+                        for d in inventory.dimmers],
+            "other": [{"bus": b, "addr": a} for b, a in inventory.other],
+            "buses": inventory.buses,
+            "errors": {str(b): str(e) for b, e in inventory.errors.items()},
+            "seconds": round(inventory.seconds, 4),
+        }, indent=2))
+    else:
+        print(f"Scanned bus(es) {', '.join(map(str, inventory.buses)) or 'none'} "
+              f"in {inventory.seconds * 1000:.0f} ms")
+        for bus, error in inventory.errors.items():
+            print(f"  bus {bus}: {error}")
+        for d in inventory.dimmers:
+            s = d.state
+            print(f"  bus {d.bus} 0x{d.addr:02X}  DimmerLink v{s.version}  "
+                  f"{s.frequency} Hz  level {s.level}%  "
+                  f"{CURVE_NAMES.get(s.curve, '?')}"
+                  f"{'' if s.ready else '  (not ready)'}"
+                  f"{'  ERROR' if s.has_error else ''}")
+        for bus, addr in inventory.other:
+            print(f"  bus {bus} 0x{addr:02X}  other device")
+
+    sys.exit(0 if inventory.dimmers else 1)
+
+
+if __name__ == "__main__":
+    main()
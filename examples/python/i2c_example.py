@@ -28,53 +28,96 @@ Pull-up resistors: Raspberry Pi has built-in 1.8kΩ — usually sufficient.
 Documentation: https://rbdimmer.com/docs/
 """
 
-from smbus2 import SMBus
+from smbus2 import SMBus, i2c_msg
+from collections import namedtuple
+import errno
 import time
 import sys
 
-# I2C address of DimmerLink (default 0x50, can be changed)
-DIMMER_ADDR = 0x50
+from dimmerlink_fade import run_fade
+from dimmerlink_metrics import HookedBus, chain_hooks, unchain_hooks
 
-# Registers
-REG_STATUS   = 0x00   # Device status (R)
-REG_COMMAND  = 0x01   # Control commands (W)
-REG_ERROR    = 0x02   # Last error code (R)
-REG_VERSION  = 0x03   # Firmware version (R)
-REG_LEVEL    = 0x10   # Brightness 0-100% (R/W)
-REG_CURVE    = 0x11   # Dimming curve (R/W)
-REG_FREQ     = 0x20   # Mains frequency Hz (R)
-REG_I2C_ADDR = 0x30   # Device I2C address (R/W)
+# Registers, status bits and curve types (see dimmerlink_protocol.py)
+from dimmerlink_protocol import (
+    DIMMER_ADDR, REG_STATUS, REG_COMMAND, REG_ERROR, REG_VERSION, REG_LEVEL,
+    REG_CURVE, REG_FADE_TIME, REG_FREQ, REG_I2C_ADDR, CMD_I2C_RESET, CMD_I2C_SWITCH_UART,
+    STATUS_READY, STATUS_ERROR, CURVE_LINEAR, CURVE_RMS, CURVE_LOG,
+    CURVE_NAMES, FADE_TIME_MAX,
+    check_level, check_curve, check_address, fade_units, decode_period,
+)
 
-# Dimming curve types
-CURVE_LINEAR = 0      # Linear (universal)
-CURVE_RMS    = 1      # RMS (incandescent, halogen)
-CURVE_LOG    = 2      # Logarithmic (LED)
 
-# Curve names for output
-CURVE_NAMES = {
-    CURVE_LINEAR: "LINEAR",
-    CURVE_RMS: "RMS",
-    CURVE_LOG: "LOG"
-}
+class DimmerState(namedtuple("DimmerState", (
+        "status", "error", "version", "level", "curve",
+        "frequency", "ac_period", "calibrated"))):
+    """Immutable snapshot of the device registers (see DimmerLink.snapshot)"""
+
+    __slots__ = ()
+
+    @property
+    def ready(self):
+        """True if the device is ready for commands"""
+        return bool(self.status & STATUS_READY)
+
+    @property
+    def has_error(self):
+        """True if the device reports an error condition"""
+        return bool(self.status & STATUS_ERROR)
+
+
+def read_state(bus, addr):
+    """
+    Read the device state of the DimmerLink at addr in three block reads
+
+    Args:
+        bus: Open SMBus (or compatible) object
+        addr: Device I2C address
+
+    Returns:
+        DimmerState: See DimmerLink.snapshot()
+
+    Raises:
+        OSError: If the device does not respond
+    """
+    info = bus.read_i2c_block_data(addr, REG_STATUS, 4)
+    dim = bus.read_i2c_block_data(addr, REG_LEVEL, 2)
+    ac = bus.read_i2c_block_data(addr, REG_FREQ, 4)
+    return DimmerState(
+        status=info[0],
+        error=info[2],
+        version=info[3],
+        level=dim[0],
+        curve=dim[1],
+        frequency=ac[0],
+        ac_period=decode_period(ac[1], ac[2]),
+        calibrated=ac[3] == 1,
+    )
 
 
 class DimmerLink:
     """Class for controlling DimmerLink via I2C (smbus2)"""
 
-    def __init__(self, bus_number=1, addr=DIMMER_ADDR):
+    def __init__(self, bus_number=1, addr=DIMMER_ADDR, bus=None):
         """
         Initialize I2C connection
 
         Args:
             bus_number: I2C bus number (usually 1 for Raspberry Pi)
             addr: Device I2C address (default 0x50)
+            bus: Already open SMBus to share with other devices
+                 (bus_number is then ignored and close() leaves it open)
 
         Raises:
             OSError: If unable to open I2C bus
         """
         self.addr = addr
+        self._fade_time = None    # Last programmed REG_FADE_TIME value
+        self._hw_fade = None      # Fade register supported? (None = unknown)
+        self._owns_bus = bus is None
+        self._level_writes = None # Prebuilt i2c_msg per level (i2c_rdwr buses)
+        self._rdwr = True         # Cleared if the adapter rejects I2C_RDWR
         try:
-            self.bus = SMBus(bus_number)
+            self.bus = SMBus(bus_number) if bus is None else bus
         except OSError as e:
             print(f"Error opening I2C bus {bus_number}: {e}")
             print("\nCheck:")
@@ -91,6 +134,34 @@ class DimmerLink:
             print(f"Warning: Device 0x{self.addr:02X} not responding")
             print("   Run: i2cdetect -y 1")
 
+    def add_hook(self, hook):
+        """
+        Report every bus transaction to a hook
+
+        The bus is wrapped in a HookedBus only while hooks are
+        registered, so an uninstrumented DimmerLink pays nothing.
+
+        Args:
+            hook: Object with before(txn)/after(txn) (see dimmerlink_metrics.Hook)
+        """
+        bus = self.bus if isinstance(self.bus, HookedBus) else HookedBus(self.bus)
+        bus.hook = chain_hooks(bus.hook, hook)
+        self.bus = bus
+
+    def remove_hook(self, hook):
+        """
+        Stop reporting to a hook
+
+        Raises:
+            ValueError: If the hook is not registered
+        """
+        bus = self.bus
+        if not isinstance(bus, HookedBus):
+            raise ValueError("No hooks registered")
+        bus.hook = unchain_hooks(bus.hook, hook)
+        if bus.hook is None:
+            self.bus = bus.bus
+
     def set_level(self, level):
         """
         Set brightness
@@ -102,13 +173,34 @@ class DimmerLink:
             ValueError: If level not in range 0-100
 
         Note:
-            I2C is fast — can be called frequently for smooth transitions
+            I2C is fast — can be called frequently for smooth transitions.
+            On buses with i2c_rdwr each level is written with a message
+            built once and reused, so fade loops allocate little per step.
         """
-        if not 0 <= level <= 100:
-            raise ValueError(f"Level must be 0-100, got {level}")
-
+        check_level(level)
+
+        # Hooked buses keep write_byte_data, so traces and recordings
+        # show (and replay) a register write
+        if self._rdwr and not isinstance(self.bus, HookedBus) and hasattr(self.bus, "i2c_rdwr"):
+            try:
+                self.bus.i2c_rdwr(self._level_write(level))
+                return
+            except OSError as e:
+                if e.errno not in (errno.EOPNOTSUPP, errno.EINVAL):
+                    raise
+                self._rdwr = False    # SMBus-only adapter
         self.bus.write_byte_data(self.addr, REG_LEVEL, level)
 
+    def _level_write(self, level):
+        """i2c_msg writing REG_LEVEL = level, built on first use"""
+        writes = self._level_writes
+        if writes is None:
+            writes = self._level_writes = [None] * 101
+        msg = writes[level]
+        if msg is None:
+            msg = writes[level] = i2c_msg.write(self.addr, (REG_LEVEL, level))
+        return msg
+
     def get_level(self):
         """
         Get current brightness
@@ -128,10 +220,7 @@ class DimmerLink:
         Raises:
             ValueError: If curve_type not 0, 1 or 2
         """
-        if curve_type not in (0, 1, 2):
-            raise ValueError(f"Curve type must be 0, 1, or 2, got {curve_type}")
-
-        self.bus.write_byte_data(self.addr, REG_CURVE, curve_type)
+        self.bus.write_byte_data(self.addr, REG_CURVE, check_curve(curve_type))
 
     def get_curve(self):
         """
@@ -169,13 +258,27 @@ class DimmerLink:
         """
         return self.bus.read_byte_data(self.addr, REG_ERROR)
 
+    def snapshot(self):
+        """
+        Read the whole device state in three block reads
+
+        Reads the contiguous register ranges 0x00-0x03 (status, error,
+        version), 0x10-0x11 (level, curve) and 0x20-0x23 (frequency,
+        period, calibration) instead of one transaction per register.
+
+        Returns:
+            DimmerState: Status, error, version, level, curve,
+                         frequency (Hz), ac_period (µs), calibrated
+        """
+        return read_state(self.bus, self.addr)
+
     def reset(self):
         """
         Software device reset
 
         ⚠️ After reset, device will reboot (~3 sec)
         """
-        self.bus.write_byte_data(self.addr, REG_COMMAND, 0x01)
+        self.bus.write_byte_data(self.addr, REG_COMMAND, CMD_I2C_RESET)
         print("Device reset, wait 3 seconds...")
 
     def switch_to_uart(self):
@@ -184,7 +287,7 @@ class DimmerLink:
 
         ⚠️ After switching, I2C will no longer work!
         """
-        self.bus.write_byte_data(self.addr, REG_COMMAND, 0x03)
+        self.bus.write_byte_data(self.addr, REG_COMMAND, CMD_I2C_SWITCH_UART)
         print("Switched to UART mode (115200, 8N1)")
 
     def change_address(self, new_addr):
@@ -196,44 +299,110 @@ class DimmerLink:
 
         ⚠️ After change, device immediately responds on new address!
         """
-        if not 0x08 <= new_addr <= 0x77:
-            raise ValueError(f"Address must be 0x08-0x77, got 0x{new_addr:02X}")
+        check_address(new_addr)
 
         self.bus.write_byte_data(self.addr, REG_I2C_ADDR, new_addr)
         print(f"Address changed from 0x{self.addr:02X} to 0x{new_addr:02X}")
         self.addr = new_addr
+        self._level_writes = None
+
+    def set_fade_time(self, seconds):
+        """
+        Set hardware fade time
+
+        The device then fades to every new level on its own, so a
+        transition costs one bus write instead of one per percent.
+
+        Args:
+            seconds: Fade time 0-25.5 s, 0.1 s resolution (0 = instant)
+
+        Returns:
+            bool: True if set, False if the firmware lacks REG_FADE_TIME
+
+        Raises:
+            ValueError: If seconds not in range 0-25.5
+
+        ⚠️ The fade time stays active for all following set_level calls
+           until it is set back to 0!
+        """
+        units = fade_units(seconds)
+
+        if self._hw_fade is False:
+            return False
+        if units == self._fade_time:
+            return True
 
-    def fade_to(self, target, duration=1.0):
+        try:
+            self.bus.write_byte_data(self.addr, REG_FADE_TIME, units)
+            if self._hw_fade is None and units:
+                # First nonzero use: older firmware NACKs or ignores the
+                # register (and reads back 0, so writing 0 proves nothing)
+                self._hw_fade = self.bus.read_byte_data(self.addr, REG_FADE_TIME) == units
+        except OSError:
+            if self._hw_fade is None:
+                self._hw_fade = False
+            else:
+                raise
+
+        if self._hw_fade is False:
+            print("Hardware fade not supported by firmware, using host fade")
+            return False
+
+        self._fade_time = units
+        return True
+
+    def get_fade_time(self):
+        """
+        Get hardware fade time
+
+        Returns:
+            float: Fade time in seconds, or None if not supported
+        """
+        if self._hw_fade is False:
+            return None
+        try:
+            units = self.bus.read_byte_data(self.addr, REG_FADE_TIME)
+        except OSError:
+            self._hw_fade = False
+            return None
+        self._fade_time = units
+        return units / 10
+
+    def fade_to(self, target, duration=1.0, hardware=False, wait=True):
         """
         Smooth brightness change to target level
 
         Args:
             target: Target brightness 0-100%
             duration: Transition time in seconds
+            hardware: Let the device fade (one write) if the firmware
+                      supports REG_FADE_TIME and duration <= 25.5 s;
+                      otherwise step the level from the host
+            wait: For hardware fades, return only after `duration`
+
+        Host fades compute each step from a monotonic deadline and skip
+        levels when the bus is slow, so they always end on time. Use
+        FadeEngine (dimmerlink_fade.py) to cancel or retarget a fade.
         """
-        if not 0 <= target <= 100:
-            raise ValueError(f"Target must be 0-100, got {target}")
-
-        current = self.get_level()
-        steps = abs(target - current)
+        check_level(target)
 
-        if steps == 0:
+        if hardware and duration <= FADE_TIME_MAX and self.set_fade_time(duration):
+            self.set_level(target)
+            if wait:
+                time.sleep(duration)
             return
 
-        delay = duration / steps
-        direction = 1 if target > current else -1
+        # Host stepping needs every write to take effect immediately
+        if self._fade_time:
+            self.set_fade_time(0)
 
-        level = current
-        while True:
-            self.set_level(level)
-            if level == target:
-                break
-            level += direction
-            time.sleep(delay)
+        # Steps follow a deadline, so bus latency doesn't stretch the fade
+        run_fade(self, target, duration)
 
     def close(self):
-        """Close I2C connection"""
-        self.bus.close()
+        """Close I2C connection (a shared bus is left open)"""
+        if self._owns_bus:
+            self.bus.close()
 
     def __enter__(self):
         """Support for context manager (with statement)"""
@@ -244,7 +413,7 @@ class DimmerLink:
         self.close()
 
 
-def smooth_fade(dimmer, start, end, duration=2.0):
+def smooth_fade(dimmer, start, end, duration=2.0, hardware=False):
     """
     Smooth brightness change between two levels
 
@@ -253,24 +422,17 @@ def smooth_fade(dimmer, start, end, duration=2.0):
         start: Start brightness (0-100)
         end: End brightness (0-100)
         duration: Transition time in seconds
+        hardware: Use the device fade register when available
     """
     if not 0 <= start <= 100 or not 0 <= end <= 100:
         raise ValueError("Start and end must be 0-100")
 
-    steps = abs(end - start)
-    if steps == 0:
+    if hardware and duration <= FADE_TIME_MAX and dimmer.set_fade_time(0):
+        dimmer.set_level(start)
+        dimmer.fade_to(end, duration, hardware=True)
         return
 
-    delay = duration / steps
-    direction = 1 if end > start else -1
-
-    level = start
-    while True:
-        dimmer.set_level(level)
-        if level == end:
-            break
-        level += direction
-        time.sleep(delay)
+    run_fade(dimmer, end, duration, start=start)
 
 
 # =============================================================
@@ -287,14 +449,13 @@ def main():
     try:
         with DimmerLink(bus_number=1) as dimmer:
 
-            # Device info
-            freq = dimmer.get_frequency()
-            version = dimmer.get_version()
-            curve = dimmer.get_curve()
+            # Device info (one snapshot instead of a read per register)
+            state = dimmer.snapshot()
 
-            print(f"Firmware version: {version}")
-            print(f"AC frequency: {freq} Hz")
-            print(f"Current curve: {CURVE_NAMES.get(curve, 'Unknown')}")
+            print(f"Firmware version: {state.version}")
+            print(f"AC frequency: {state.frequency} Hz ({state.ac_period} µs)")
+            print(f"Current curve: {CURVE_NAMES.get(state.curve, 'Unknown')}")
+            print(f"Ready: {state.ready}, calibrated: {state.calibrated}")
             print()
 
             # === Demo 1: Smooth transitions ===
@@ -305,8 +466,9 @@ def main():
 
             time.sleep(0.5)
 
-            print("Fading down 100% -> 0%...")
-            smooth_fade(dimmer, 100, 0, duration=2.0)
+            print("Fading down 100% -> 0% (hardware fade, a few bus writes)...")
+            smooth_fade(dimmer, 100, 0, duration=2.0, hardware=True)
+            dimmer.set_fade_time(0)
 
             time.sleep(1)
 
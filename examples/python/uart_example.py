@@ -31,52 +31,35 @@ Documentation: https://rbdimmer.com/docs/
 """
 
 import serial
-import serial.tools.list_ports
+import os
+import select
 import time
 import sys
 
-# UART commands (all start with 0x02)
-CMD_START       = 0x02    # Start byte (required!)
-CMD_SET         = 0x53    # 'S' - set brightness
-CMD_GET         = 0x47    # 'G' - get brightness
-CMD_CURVE       = 0x43    # 'C' - set curve
-CMD_GETCURVE    = 0x51    # 'Q' - get curve
-CMD_FREQ        = 0x52    # 'R' - get mains frequency
-CMD_RESET       = 0x58    # 'X' - device reset
-CMD_SWITCH_I2C  = 0x5B    # '[' - switch to I2C
-
-# Response codes
-RESP_OK         = 0x00    # Success
-RESP_ERR_SYNTAX = 0xF9    # Invalid command format
-RESP_ERR_EEPROM = 0xFC    # EEPROM write error
-RESP_ERR_INDEX  = 0xFD    # Invalid dimmer index
-RESP_ERR_PARAM  = 0xFE    # Invalid parameter
-
-# Error descriptions
-ERROR_MESSAGES = {
-    RESP_OK: "OK",
-    RESP_ERR_SYNTAX: "Invalid command format (check START byte 0x02)",
-    RESP_ERR_EEPROM: "EEPROM write error",
-    RESP_ERR_INDEX: "Invalid dimmer index (use 0)",
-    RESP_ERR_PARAM: "Invalid parameter value (level 0-100, curve 0-2)",
-}
-
-# Curve types
-CURVE_LINEAR = 0
-CURVE_RMS    = 1
-CURVE_LOG    = 2
-
-CURVE_NAMES = {
-    CURVE_LINEAR: "LINEAR",
-    CURVE_RMS: "RMS",
-    CURVE_LOG: "LOG"
-}
+# Response codes, curve types and prebuilt frames (see dimmerlink_protocol.py)
+from dimmerlink_protocol import (
+    RESP_OK, COMMAND_NAMES, ResponseDecoder, RttEstimator,
+    CURVE_LINEAR, CURVE_RMS, CURVE_LOG, CURVE_NAMES,
+    error_message, encode_set, encode_curve,
+    FRAME_GET, FRAME_GETCURVE, FRAME_FREQ, FRAME_RESET, FRAME_SWITCH_I2C,
+)
+# Not used here: re-exported because this module used to define them,
+# so `from uart_example import CMD_SET` keeps working
+from dimmerlink_protocol import (
+    CMD_START, CMD_SET, CMD_GET, CMD_CURVE, CMD_GETCURVE, CMD_FREQ,
+    CMD_RESET, CMD_SWITCH_I2C,
+    RESP_ERR_SYNTAX, RESP_ERR_EEPROM, RESP_ERR_INDEX, RESP_ERR_PARAM,
+    ERROR_MESSAGES,
+)
+from dimmerlink_metrics import (
+    Transaction, chain_hooks, unchain_hooks, traced, inspect_uart,
+)
 
 
 class DimmerLink:
     """Class for controlling DimmerLink via UART (pyserial)"""
 
-    def __init__(self, port, baudrate=115200, timeout=0.5):
+    def __init__(self, port, baudrate=115200, timeout=0.5, adaptive=True):
         """
         Initialize UART connection
 
@@ -86,7 +69,12 @@ class DimmerLink:
                   Linux: '/dev/ttyUSB0', '/dev/ttyACM0', '/dev/serial0'
                   macOS: '/dev/tty.usbserial-...'
             baudrate: Speed (always 115200 for DimmerLink)
-            timeout: Read timeout in seconds
+            timeout: Reply timeout in seconds (adaptive: until the first
+                     round trip was measured)
+            adaptive: Derive reply timeouts from measured round-trip
+                      times (see RttEstimator in dimmerlink_protocol.py);
+                      slow links (Bluetooth, LoRa) may need up to
+                      4 x timeout
 
         Raises:
             serial.SerialException: If unable to open port
@@ -97,21 +85,147 @@ class DimmerLink:
         except serial.SerialException as e:
             print(f"Error opening {port}: {e}")
             print("\nAvailable ports:")
-            for p in serial.tools.list_ports.comports():
+            from serial.tools.list_ports import comports
+            for p in comports():
                 print(f"  - {p.device}: {p.description}")
             raise
 
-        # Clear buffers
+        # Clear buffers once; afterwards replies are framed by the decoder
         self.ser.reset_input_buffer()
         self.ser.reset_output_buffer()
+        self._decoder = ResponseDecoder()
+        self.timeout = timeout    # Configured reply timeout (ser.timeout varies)
+        self.rtt = RttEstimator(initial=timeout, max_timeout=max(2.0, 4 * timeout)) if adaptive else None
+        try:
+            self._fd = self.ser.fileno()     # select() + readv() (POSIX)
+        except (AttributeError, OSError):
+            self._fd = None
+        self._rx = bytearray(256)            # Reused receive buffer
+        self._rx_view = memoryview(self._rx)
+        self._hook = None         # Transaction hook(s), see dimmerlink_metrics.py
+
+    def add_hook(self, hook):
+        """
+        Report every command round trip to a hook
 
-    def _clear_buffer(self):
-        """Clear input buffer from old data"""
-        self.ser.reset_input_buffer()
+        Args:
+            hook: Object with before(txn)/after(txn) (see dimmerlink_metrics.Hook)
+        """
+        self._hook = chain_hooks(self._hook, hook)
+
+    def remove_hook(self, hook):
+        """
+        Stop reporting to a hook
+
+        Raises:
+            ValueError: If the hook is not registered
+        """
+        self._hook = unchain_hooks(self._hook, hook)
+
+    def _transact(self, cmd):
+        """
+        Send a command and wait for its reply (reported to hooks, if any)
+
+        Args:
+            cmd: Command frame (starting with CMD_START)
+
+        Returns:
+            tuple: (status, value) of the reply, or None on timeout
+        """
+        hook = self._hook
+        if hook is None:
+            return self._exchange(cmd)
+        txn = Transaction("uart", self.ser.port, COMMAND_NAMES.get(cmd[1]), cmd[1], bytes(cmd[2:]))
+        return traced(hook, txn, inspect_uart, self._exchange, cmd)
+
+    def _exchange(self, cmd):
+        """
+        Write a command frame and read its reply
+
+        Bytes left over from earlier commands (late replies, noise) are
+        consumed by the decoder instead of being flushed, so
+        back-to-back commands never lose data.
+
+        Args:
+            cmd: Command frame (starting with CMD_START)
+
+        Returns:
+            tuple: (status, value) of the reply, or None on timeout
+        """
+        decoder = self._decoder
+        rtt = self.rtt
+        late = decoder.late
+        timeout = rtt.timeout if rtt is not None else self.timeout
+        if decoder.has_stale:
+            # Give a late reply to the previous command one last chance
+            if self.ser.in_waiting:
+                decoder.feed(self._read())
+            decoder.discard_stale()
+
+        token = decoder.expect(cmd[1])
+        start = time.monotonic()
+        self.ser.write(cmd)
+        if token is None:
+            return None
+
+        deadline = start + timeout
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    decoder.expire(token)
+                    if rtt is not None:
+                        rtt.timed_out()
+                    return None
+                if not self._wait_readable(remaining):
+                    continue
+                for tok, status, value in decoder.feed(self._read()):
+                    if tok == token:
+                        if rtt is not None:
+                            rtt.sample(time.monotonic() - start)
+                        return status, value
+        finally:
+            if rtt is not None and decoder.late != late:
+                rtt.late_reply()
+
+    def _read(self):
+        """
+        Read the bytes that have arrived (at least one)
+
+        On POSIX they land in a reused buffer, so polling the port
+        allocates nothing; the returned view is valid until the next read.
+        """
+        if self._fd is None:
+            return self.ser.read(self.ser.in_waiting or 1)
+        try:
+            n = os.readv(self._fd, (self._rx,))
+        except BlockingIOError:
+            return b""
+        except OSError as e:
+            raise serial.SerialException(f"read failed: {e}")
+        if not n:
+            raise serial.SerialException("device reports readiness to read but returned no data")
+        return self._rx_view[:n]
+
+    def _wait_readable(self, timeout):
+        """
+        Wait up to timeout seconds for received bytes
+
+        Returns:
+            bool: True if a read will not block
+        """
+        if self.ser.in_waiting:
+            return True
+        if self._fd is not None:
+            return bool(select.select([self._fd], [], [], timeout)[0])
+        # No selectable handle (Windows): let the read itself time out;
+        # only the port's read timeout changes, not self.timeout
+        self.ser.timeout = timeout
+        return True
 
     def _get_error_message(self, code):
         """Get error description by code"""
-        return ERROR_MESSAGES.get(code, f"Unknown error 0x{code:02X}")
+        return error_message(code)
 
     def set_level(self, level):
         """
@@ -128,16 +242,11 @@ class DimmerLink:
 
         Note:
             ⚠️ Don't call more than 5-10 times per second!
+               For UI-driven updates use CoalescingWriter
+               (dimmerlink_coalesce.py).
         """
-        if not 0 <= level <= 100:
-            raise ValueError(f"Level must be 0-100, got {level}")
-
-        self._clear_buffer()
-        cmd = bytes([CMD_START, CMD_SET, 0x00, level])
-        self.ser.write(cmd)
-
-        resp = self.ser.read(1)
-        if len(resp) == 0:
+        resp = self._transact(encode_set(level))
+        if resp is None:
             print("Error: No response (check TX→RX connection)")
             return False
 
@@ -154,12 +263,8 @@ class DimmerLink:
         Returns:
             int: Brightness 0-100%, or None on error
         """
-        self._clear_buffer()
-        cmd = bytes([CMD_START, CMD_GET, 0x00])
-        self.ser.write(cmd)
-
-        resp = self.ser.read(2)
-        if len(resp) < 2:
+        resp = self._transact(FRAME_GET)
+        if resp is None:
             return None
 
         if resp[0] == RESP_OK:
@@ -181,15 +286,8 @@ class DimmerLink:
         Raises:
             ValueError: If curve_type not 0, 1 or 2
         """
-        if curve_type not in (0, 1, 2):
-            raise ValueError(f"Curve type must be 0, 1, or 2, got {curve_type}")
-
-        self._clear_buffer()
-        cmd = bytes([CMD_START, CMD_CURVE, 0x00, curve_type])
-        self.ser.write(cmd)
-
-        resp = self.ser.read(1)
-        if len(resp) == 0:
+        resp = self._transact(encode_curve(curve_type))
+        if resp is None:
             return False
 
         if resp[0] != RESP_OK:
@@ -205,12 +303,8 @@ class DimmerLink:
         Returns:
             int: 0=LINEAR, 1=RMS, 2=LOG, or None on error
         """
-        self._clear_buffer()
-        cmd = bytes([CMD_START, CMD_GETCURVE, 0x00])
-        self.ser.write(cmd)
-
-        resp = self.ser.read(2)
-        if len(resp) == 2 and resp[0] == RESP_OK:
+        resp = self._transact(FRAME_GETCURVE)
+        if resp is not None and resp[0] == RESP_OK:
             return resp[1]
         return None
 
@@ -221,12 +315,8 @@ class DimmerLink:
         Returns:
             int: 50 or 60 Hz, or None on error
         """
-        self._clear_buffer()
-        cmd = bytes([CMD_START, CMD_FREQ])
-        self.ser.write(cmd)
-
-        resp = self.ser.read(2)
-        if len(resp) == 2 and resp[0] == RESP_OK:
+        resp = self._transact(FRAME_FREQ)
+        if resp is not None and resp[0] == RESP_OK:
             return resp[1]
         return None
 
@@ -236,9 +326,10 @@ class DimmerLink:
 
         ⚠️ After reset, device will reboot (~3 sec)
         """
-        self._clear_buffer()
-        cmd = bytes([CMD_START, CMD_RESET])
-        self.ser.write(cmd)
+        self._transact(FRAME_RESET)
+        self._decoder.reset()
+        if self.rtt is not None:
+            self.rtt.reset()
         print("Device reset command sent, wait 3 seconds...")
 
     def switch_to_i2c(self):
@@ -251,12 +342,8 @@ class DimmerLink:
         ⚠️ After switching, UART will no longer work!
            Use I2C at address 0x50.
         """
-        self._clear_buffer()
-        cmd = bytes([CMD_START, CMD_SWITCH_I2C])
-        self.ser.write(cmd)
-
-        resp = self.ser.read(1)
-        if len(resp) > 0 and resp[0] == RESP_OK:
+        resp = self._transact(FRAME_SWITCH_I2C)
+        if resp is not None and resp[0] == RESP_OK:
             print("Switched to I2C mode")
             print("  UART is now disabled")
             print("  Use I2C at address 0x50")
@@ -280,7 +367,8 @@ class DimmerLink:
 
 def list_ports():
     """Show list of available ports"""
-    ports = serial.tools.list_ports.comports()
+    from serial.tools.list_ports import comports    # Slow to import; only needed here
+    ports = comports()
     if not ports:
         print("No serial ports found")
         return []
@@ -291,41 +379,38 @@ def list_ports():
     return [p.device for p in ports]
 
 
-def auto_detect_port():
+def auto_detect_port(timeout=0.3, refresh=False):
     """
     Attempt automatic port detection
 
+    Candidate ports are probed in parallel and only a port that answers
+    like a DimmerLink is returned; results are cached per USB adapter
+    (see dimmerlink_discovery.py).
+
+    Args:
+        timeout: Seconds each port gets to answer the probe
+        refresh: Ignore the cache and probe every port again
+
     Returns:
         str: Port name or None
     """
-    ports = serial.tools.list_ports.comports()
-
-    # Search by known VID/PID (CH340, CP2102, FT232)
-    known_adapters = [
-        (0x1A86, 0x7523, "CH340"),      # CH340
-        (0x10C4, 0xEA60, "CP2102"),     # CP2102
-        (0x0403, 0x6001, "FT232"),      # FT232RL
-        (0x0403, 0x6015, "FT231X"),     # FT231X
-    ]
-
-    for port in ports:
-        for vid, pid, name in known_adapters:
-            if port.vid == vid and port.pid == pid:
-                print(f"Auto-detected {name} on {port.device}")
-                return port.device
-
-    # Fallback: first USB-Serial port
-    for port in ports:
-        if "USB" in port.device.upper() or "ACM" in port.device.upper():
-            print(f"Found USB serial: {port.device}")
-            return port.device
-
-    # Raspberry Pi built-in UART
-    if sys.platform.startswith('linux'):
-        import os
-        if os.path.exists('/dev/serial0'):
-            print("Found Raspberry Pi UART: /dev/serial0")
-            return '/dev/serial0'
+    from dimmerlink_discovery import find_dimmerlinks, candidate_ports
+
+    found = find_dimmerlinks(timeout, refresh)
+    if found:
+        port = found[0]
+        print(f"Auto-detected DimmerLink on {port.device} ({port.frequency} Hz)")
+        if len(found) > 1:
+            print(f"  (also on: {', '.join(p.device for p in found[1:])})")
+        return port.device
+
+    # Nothing answered: fall back to the most likely port, so the wiring
+    # hints below are shown for it
+    candidates = candidate_ports()
+    if candidates:
+        port = getattr(candidates[0], "device", candidates[0])
+        print(f"No DimmerLink answered; trying {port}")
+        return port
 
     return None
 